@@ -1,18 +1,13 @@
+import asyncio
+import logging
 import os
 import sys
+import time
 
 import boto3
 
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
-from bedrock_agentcore.memory.integrations.strands.config import (
-    AgentCoreMemoryConfig,
-    RetrievalConfig,
-)
-from bedrock_agentcore.memory.integrations.strands.session_manager import (
-    AgentCoreMemorySessionManager,
-)
 from strands import Agent
-from strands.models import BedrockModel
 from strands.telemetry import StrandsTelemetry
 from opentelemetry import trace as otel_trace
 
@@ -28,9 +23,40 @@ for root in candidate_roots:
             sys.path.append(root)
         break
 
-from core.config import BEDROCK_INFERENCE_PROFILE_ARN, BEDROCK_MODEL_ID, BEDROCK_REGION
+from core import memory_writer, metrics, prefilter
+from core.answer_cache import (
+    answer_cache,
+    depends_on_memory,
+    embed_question,
+    generation_key,
+)
+from core.config import (
+    ANSWER_CACHE_ENABLED,
+    BEDROCK_INFERENCE_PROFILE_ARN,
+    BEDROCK_MODEL_ID,
+    BEDROCK_REGION,
+    DEADLINE_MIN_SECONDS,
+    ROUTER_ENABLED,
+    ROUTER_LIGHT_MODEL_ID,
+)
+from core.conversation import build_conversation_manager
+from core.failover import health_snapshot
+from core.idempotency import IdempotencyStore
 from core.langfuse_client import get_system_prompt
-from core.tools import search_knowledge_base
+from core.limiter import LimiterTimeout, ModelConcurrencyHook
+from core.memory import build_session_manager
+from core.models import build_bedrock_model, build_system_prompt
+from core.observability import record_usage
+from core.request_context import remaining_seconds, start_request
+from core.router import classify, log_decision, needs_escalation
+from core.singleflight import AsyncSingleFlight
+from core.text import normalize_text
+from core.tools import (
+    search_knowledge_base,
+    settle_prefetch,
+    start_chunk_memo,
+    start_prefetch,
+)
 
 RUNTIME_REGION = os.getenv("AWS_REGION") or boto3.session.Session().region_name
 MODEL_REGION = BEDROCK_REGION or RUNTIME_REGION
@@ -39,13 +65,37 @@ MODEL_ID = BEDROCK_INFERENCE_PROFILE_ARN or "us.amazon.nova-2-lite-v1:0"
 
 app = BedrockAgentCoreApp()
 
+# Emit the JSON usage/router records logged by core modules at INFO level
+logging.basicConfig(level=logging.WARNING)
+logging.getLogger("core").setLevel(logging.INFO)
+logger = logging.getLogger(__name__)
+
 # Initialize Strands telemetry for Langfuse observability
 strands_telemetry = StrandsTelemetry()
 strands_telemetry.setup_otlp_exporter()
 
+# Concurrent identical stateless prompts share one agent run
+_agent_runs = AsyncSingleFlight("agent_run")
+_idempotent = IdempotencyStore()
+
+
+def _record_shared_turn(agent, session_manager, user_input: str, answer: str) -> None:
+    """Persist a turn answered without running this agent (answer cache hit or
+    coalesced run) so follow-up questions keep their history."""
+    for message in (
+        {"role": "user", "content": [{"text": user_input}]},
+        {"role": "assistant", "content": [{"text": answer}]},
+    ):
+        agent.messages.append(message)
+        session_manager.append_message(message, agent)
+    memory_writer.buffer.request_flush()
+
 
 @app.entrypoint
 async def invoke(payload, context=None):
+    if payload.get("action") == "metrics":
+        return {**metrics.snapshot(), "failover": health_snapshot()}
+
     user_input = payload.get("prompt", "")
     actor_id = payload.get("actor_id", "customer_001")
     session_id = context.session_id if context else None
@@ -61,38 +111,158 @@ async def invoke(payload, context=None):
         current_span.set_attribute("langfuse.session.id", str(session_id))
         current_span.set_attribute("langfuse.user.id", actor_id)
 
-    model = BedrockModel(
-        model_id=MODEL_ID,
-        temperature=0.3,
-        region_name=MODEL_REGION,
+    # Re-submissions of the same user message (client retries, hedges,
+    # Streamlit reruns) share one run and its stored answer
+    idempotency_key = payload.get("idempotency_key")
+    if not idempotency_key or not session_id:
+        return await _answer(payload, user_input, actor_id, session_id, memory_id, current_span)
+    return await _idempotent.do(
+        (session_id, idempotency_key),
+        lambda: _answer(payload, user_input, actor_id, session_id, memory_id, current_span),
+        keep=lambda answer: not answer.startswith("Error:"),
     )
 
+
+async def _answer(payload, user_input: str, actor_id: str, session_id, memory_id: str, current_span) -> str:
+    prefilter_decision = prefilter.check(user_input)
+    if prefilter_decision:
+        if current_span and current_span.is_recording():
+            current_span.set_attribute("prefilter.label", prefilter_decision.label)
+            current_span.set_attribute("prefilter.confidence", prefilter_decision.confidence)
+        if prefilter_decision.answer:
+            return prefilter_decision.answer
+
+    # Optional Unix timestamp after which the caller stops waiting
+    request_ctx = start_request(session_id, actor_id, payload.get("deadline"))
+    budget = remaining_seconds()
+    if budget is not None and budget < DEADLINE_MIN_SECONDS:
+        metrics.incr("deadline.rejected")
+        return "Error: request deadline too close to start processing"
+
+    model = build_bedrock_model(MODEL_ID, MODEL_REGION, read_timeout=budget, failover=True)
+
     tools = [search_knowledge_base]
-    sys_prompt = get_system_prompt()
-
-    memory_config = AgentCoreMemoryConfig(
-        memory_id=memory_id,
-        session_id=str(session_id),
-        actor_id=actor_id,
-        retrieval_config={
-            "support/customer/{actorId}/semantic/": RetrievalConfig(
-                top_k=3, relevance_score=0.2
-            ),
-            "support/customer/{actorId}/preferences/": RetrievalConfig(
-                top_k=3, relevance_score=0.2
-            ),
-        },
-    )
+    prompt_text = get_system_prompt()
+    sys_prompt = build_system_prompt(prompt_text, MODEL_ID)
 
+    session_manager = build_session_manager(memory_id, session_id, actor_id, RUNTIME_REGION)
     agent = Agent(
         model=model,
         tools=tools,
         system_prompt=sys_prompt,
-        session_manager=AgentCoreMemorySessionManager(memory_config, RUNTIME_REGION),
+        session_manager=session_manager,
+        conversation_manager=build_conversation_manager(session_manager),
+        hooks=[ModelConcurrencyHook()],
     )
+    start_chunk_memo(agent.messages)
+
+    # First turns of non-personal questions do not depend on history or actor
+    # memory, so they can be served from the answer cache or share a run.
+    stateless = not agent.messages and not depends_on_memory(user_input)
+
+    cache_vector = None
+    if ANSWER_CACHE_ENABLED and stateless:
+        try:
+            generation = generation_key(prompt_text)
+            cache_vector = embed_question(user_input)
+            cached = answer_cache.lookup(cache_vector, generation)
+        except Exception as e:
+            logger.warning("Answer cache lookup failed: %s", e)
+            cached = None
+        if cached:
+            metrics.incr("answer_cache.hits")
+            if current_span and current_span.is_recording():
+                current_span.set_attribute("answer_cache.hit", True)
+                current_span.set_attribute("answer_cache.score", cached.score)
+                current_span.set_attribute("answer_cache.sources", cached.sources)
+            _record_shared_turn(agent, session_manager, user_input, cached.answer)
+            return cached.answer
+        metrics.incr("answer_cache.misses")
+
+    async def answer_with_model() -> str:
+        decision = classify(user_input) if ROUTER_ENABLED else None
+        light_latency_ms, light_tokens = 0.0, 0
+
+        if decision and decision.route == "light":
+            # Ephemeral agent without session manager: its turn is only
+            # persisted if the answer is kept, not when escalating.
+            light_agent = Agent(
+                model=build_bedrock_model(ROUTER_LIGHT_MODEL_ID, MODEL_REGION, read_timeout=budget),
+                tools=tools,
+                system_prompt=build_system_prompt(prompt_text, ROUTER_LIGHT_MODEL_ID),
+                messages=list(agent.messages),
+                hooks=[ModelConcurrencyHook()],
+            )
+            started = time.perf_counter()
+            light_response = await light_agent.invoke_async(user_input)
+            light_latency_ms = (time.perf_counter() - started) * 1000
+            light_usage = record_usage(light_response)
+            light_tokens = light_usage["input_tokens"] + light_usage["output_tokens"]
+            answer = light_response.message["content"][0]["text"]
+
+            if not needs_escalation(decision, answer):
+                log_decision(user_input, decision, False, light_latency_ms, 0.0, light_tokens, 0)
+                _record_shared_turn(agent, session_manager, user_input, answer)
+                if cache_vector is not None and request_ctx.sources:
+                    answer_cache.store(user_input, cache_vector, generation, answer, request_ctx.sources)
+                return answer
+            # The light agent's tool results are discarded with it
+            request_ctx.sources.clear()
+            start_chunk_memo(agent.messages)
 
-    response = agent(user_input)
-    return response.message["content"][0]["text"]
+        started = time.perf_counter()
+        response = await agent.invoke_async(user_input)
+        default_latency_ms = (time.perf_counter() - started) * 1000
+        usage = record_usage(response)
+        answer = response.message["content"][0]["text"]
+
+        if decision:
+            log_decision(
+                user_input,
+                decision,
+                decision.route == "light",
+                light_latency_ms,
+                default_latency_ms,
+                light_tokens,
+                usage["input_tokens"] + usage["output_tokens"],
+            )
+        if cache_vector is not None and request_ctx.sources:
+            answer_cache.store(user_input, cache_vector, generation, answer, request_ctx.sources)
+        return answer
+
+    async def run() -> str:
+        # Overlap the first KB retrieve with the model's first round trip
+        start_prefetch(user_input)
+        try:
+            return await answer_with_model()
+        finally:
+            settle_prefetch()
+            # Write this turn's buffered memory events off the response path
+            memory_writer.buffer.request_flush()
+
+    async def bounded(coro):
+        # Stop waiting at the deadline; the caller has already given up
+        try:
+            return await asyncio.wait_for(coro, timeout=remaining_seconds())
+        except (asyncio.TimeoutError, LimiterTimeout):
+            # LimiterTimeout: no model slot freed up before the deadline
+            metrics.incr("deadline.exceeded")
+            logger.warning("Request for session %s ran past its deadline", session_id)
+            return None
+
+    if not stateless:
+        answer = await bounded(run())
+        return answer if answer is not None else "Error: request deadline exceeded"
+
+    answer = await bounded(
+        _agent_runs.do((MODEL_ID, prompt_text, normalize_text(user_input)), run)
+    )
+    if answer is None:
+        return "Error: request deadline exceeded"
+    if not agent.messages:
+        # Another invocation ran the model; persist the shared answer in this session
+        _record_shared_turn(agent, session_manager, user_input, answer)
+    return answer
 
 
 if __name__ == "__main__":
@@ -5,11 +5,12 @@ from datetime import datetime, timedelta, timezone
 import streamlit as st
 
 from core.agent import run_agent
-from core.agentcore_runtime_client import invoke_agentcore_runtime
+from core.agentcore_runtime_client import client_stats, invoke_agentcore_runtime
 from core.cognito_auth import (
     authenticate_user,
     get_or_create_cognito_config,
 )
+from core import domains, preprocess
 from core.config import (
     AGENTCORE_ENABLED,
     BEDROCK_KB_ID,
@@ -18,6 +19,7 @@ from core.config import (
     COGNITO_USERNAME,
     KB_DATA_BUCKET_NAME,
     KB_DATA_SOURCE_ID,
+    KB_PREPROCESS_ENABLED,
 )
 from core.langfuse_client import get_langfuse_client
 
@@ -100,11 +102,46 @@ if KB_DATA_BUCKET_NAME and BEDROCK_KB_ID and KB_DATA_SOURCE_ID and _app_version
             accept_multiple_files=True,
             type=["pdf", "txt", "docx", "csv", "md"],
         )
+        upload_domain = st.selectbox("Domain", ["auto"] + domains.DOMAINS + [domains.GENERAL])
+        keep_near_duplicates = KB_PREPROCESS_ENABLED and st.checkbox(
+            "Upload near-duplicates too",
+            help="Revised versions of a document are usually near-duplicates of the old one and are skipped otherwise.",
+        )
         if uploaded_files and st.button("Upload to KB"):
             for f in uploaded_files:
                 try:
-                    _s3.upload_fileobj(f, KB_DATA_BUCKET_NAME, f.name)
-                    st.success(f"Uploaded {f.name}")
+                    data = f.getvalue()
+                    key, body, text, result = f.name, data, "", None
+                    if KB_PREPROCESS_ENABLED:
+                        index = preprocess.bucket_index(_s3, KB_DATA_BUCKET_NAME)
+                        result = index.preprocess(f.name, data, keep_near_duplicates)
+                        if result.status == "near_duplicate":
+                            st.warning(
+                                f"{result.summary()}. If it is a revised version, tick "
+                                "\"Upload near-duplicates too\" and upload it again, then delete the old one."
+                            )
+                            continue
+                        if result.skipped:
+                            st.warning(result.summary())
+                            continue
+                        key, body, text = result.key, result.body, result.text
+                    if not text and f.name.lower().endswith((".txt", ".md", ".csv")):
+                        text = data.decode("utf-8", "ignore")
+                    domain = upload_domain if upload_domain != "auto" else domains.document_domain(f.name, text)
+                    _s3.put_object(Bucket=KB_DATA_BUCKET_NAME, Key=key, Body=body)
+                    # Metadata sidecar read by the next ingestion job
+                    _s3.put_object(
+                        Bucket=KB_DATA_BUCKET_NAME,
+                        Key=domains.sidecar_key(key),
+                        Body=domains.sidecar_body(domain),
+                    )
+                    if result is not None and result.status == "new":
+                        index.add(key, result.text)
+                    st.success(f"Uploaded {key} (domain: {domain})")
+                    if result is not None and result.duplicate_of:
+                        st.warning(result.summary())
+                    elif result is not None:
+                        st.caption(result.summary())
                 except Exception as e:
                     st.error(f"Failed to upload {f.name}: {e}")
 
@@ -120,14 +157,19 @@ if KB_DATA_BUCKET_NAME and BEDROCK_KB_ID and KB_DATA_SOURCE_ID and _app_version
             st.error(f"Failed to list documents: {e}")
 
         if objects:
-            doc_keys = [obj["Key"] for obj in objects]
+            doc_keys = [obj["Key"] for obj in objects if not domains.is_sidecar(obj["Key"])]
             selected = st.multiselect("Select documents to delete", doc_keys)
             if selected and st.button("Delete selected"):
                 try:
+                    keys = selected + [domains.sidecar_key(k) for k in selected]
                     _s3.delete_objects(
                         Bucket=KB_DATA_BUCKET_NAME,
-                        Delete={"Objects": [{"Key": k} for k in selected]},
+                        Delete={"Objects": [{"Key": k} for k in keys]},
                     )
+                    if KB_PREPROCESS_ENABLED:
+                        index = preprocess.bucket_index(_s3, KB_DATA_BUCKET_NAME)
+                        for k in selected:
+                            index.remove(k)
                     st.success(f"Deleted {len(selected)} document(s)")
                     st.rerun()
                 except Exception as e:
@@ -149,6 +191,10 @@ if KB_DATA_BUCKET_NAME and BEDROCK_KB_ID and KB_DATA_SOURCE_ID and _app_version
             except Exception as e:
                 st.error(f"Sync failed: {e}")
 
+if AGENTCORE_ENABLED and _app_version != "prod":
+    with st.sidebar.expander("AgentCore runtime client"):
+        st.json(client_stats())
+
 
 # Display chat history
 for msg in st.session_state.messages:
@@ -299,6 +345,8 @@ if prompt := st.chat_input("Ask a question..."):
 
     st.session_state.last_prompt = prompt
     st.session_state.last_request_time = datetime.now(timezone.utc)
+    # One key per user message: client retries and hedges reuse it
+    idempotency_key = str(uuid.uuid4())
 
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
@@ -309,6 +357,7 @@ if prompt := st.chat_input("Ask a question..."):
                         bearer_token=st.session_state.auth_token,
                         session_id=st.session_state.session_id,
                         actor_id=st.session_state.actor_id,
+                        idempotency_key=idempotency_key,
                     )
                 except Exception as exc:
                     st.error(f"AgentCore runtime call failed: {exc}")
@@ -1,25 +1,22 @@
 import uuid
 
 from strands import Agent
-from strands.models import BedrockModel
-
-from bedrock_agentcore.memory.integrations.strands.config import (
-    AgentCoreMemoryConfig,
-    RetrievalConfig,
-)
-from bedrock_agentcore.memory.integrations.strands.session_manager import (
-    AgentCoreMemorySessionManager,
-)
 
+from core import prefilter
 from core.config import (
     BEDROCK_INFERENCE_PROFILE_ARN,
     BEDROCK_MODEL_ID,
     BEDROCK_REGION,
     MEMORY_ID,
 )
+from core.conversation import build_conversation_manager
 from core.langfuse_client import get_system_prompt
-from core.observability import configure_langfuse_otel
-from core.tools import search_knowledge_base
+from core.limiter import LimiterTimeout, ModelConcurrencyHook
+from core.memory import build_session_manager
+from core.models import build_bedrock_model, build_system_prompt
+from core.observability import configure_langfuse_otel, record_usage
+from core.request_context import start_request
+from core.tools import search_knowledge_base, start_chunk_memo
 
 
 def create_agent(session_id: str, actor_id: str):
@@ -28,43 +25,44 @@ def create_agent(session_id: str, actor_id: str):
 
     model_id = BEDROCK_INFERENCE_PROFILE_ARN or BEDROCK_MODEL_ID
 
-    model = BedrockModel(
-        model_id=model_id,
-        temperature=0.3,
-        region_name=BEDROCK_REGION,
-    )
+    model = build_bedrock_model(model_id, BEDROCK_REGION, failover=True)
 
     tools = [search_knowledge_base]
 
     if MEMORY_ID:
-        memory_config = AgentCoreMemoryConfig(
-            memory_id=MEMORY_ID,
-            session_id=str(session_id),
-            actor_id=actor_id,
-            retrieval_config={
-                "support/customer/{actorId}/semantic/": RetrievalConfig(
-                    top_k=3, relevance_score=0.2
-                ),
-                "support/customer/{actorId}/preferences/": RetrievalConfig(
-                    top_k=3, relevance_score=0.2
-                ),
-            },
-        )
-        session_manager = AgentCoreMemorySessionManager(memory_config, BEDROCK_REGION)
+        session_manager = build_session_manager(MEMORY_ID, session_id, actor_id, BEDROCK_REGION)
     else:
         session_manager = None
 
     return Agent(
         model=model,
         tools=tools,
-        system_prompt=get_system_prompt(),
+        system_prompt=build_system_prompt(get_system_prompt(), model_id),
         session_manager=session_manager,
+        conversation_manager=build_conversation_manager(session_manager),
+        hooks=[ModelConcurrencyHook()],
     )
 
 
-def run_agent(prompt: str, session_id: str | None = None, actor_id: str | None = None) -> str:
+def run_agent(
+    prompt: str,
+    session_id: str | None = None,
+    actor_id: str | None = None,
+    deadline: float | None = None,
+) -> str:
+    decision = prefilter.check(prompt)
+    if decision and decision.answer:
+        return decision.answer
+
     session_id = session_id or str(uuid.uuid4())
     actor_id = actor_id or "customer_001"
+    start_request(session_id, actor_id, deadline)
     agent = create_agent(session_id=session_id, actor_id=actor_id)
-    response = agent(prompt)
+    start_chunk_memo(agent.messages)
+    try:
+        response = agent(prompt)
+    except LimiterTimeout:
+        # No model slot freed up before the deadline
+        return "Error: request deadline exceeded"
+    record_usage(response)
     return response.message["content"][0]["text"]
@@ -1,9 +1,166 @@
+"""Streamlit-side client for the AgentCore runtime.
+
+Every call carries an idempotency key (one per user message) and a
+``deadline`` derived from ``RUNTIME_CLIENT_TIMEOUT_SECONDS``. Transient
+failures (timeouts, connection errors, 429/5xx) are retried with the same
+key, so the runtime can hand back the stored or in-progress result instead
+of running the agent again.
+
+A circuit breaker per runtime ARN opens after ``RUNTIME_BREAKER_FAILURES``
+consecutive transient failures: calls then fail fast with
+``CircuitOpenError`` until ``RUNTIME_BREAKER_COOLDOWN_SECONDS`` have passed,
+after which a single probe call decides whether it closes again.
+
+With ``RUNTIME_HEDGE_ENABLED`` a call that has not answered within the p95
+of recent latencies for its ARN is sent a second time (same session, same
+key) and the first answer wins. The runtime dedupes the pair, so a hedge
+only helps when the first connection is the slow part, not the agent run.
+Breaker state, latencies and hedge win rates are returned by
+``client_stats()`` and counted under ``runtime_client.*`` metrics.
+"""
+
+import logging
 import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
 import boto3
 
 from bedrock_agentcore_starter_toolkit.services.runtime import HttpBedrockAgentCoreClient
 
-from core.config import AWS_REGION
+from core import metrics
+from core.config import (
+    AWS_REGION,
+    RUNTIME_BREAKER_COOLDOWN_SECONDS,
+    RUNTIME_BREAKER_FAILURES,
+    RUNTIME_CLIENT_MAX_ATTEMPTS,
+    RUNTIME_CLIENT_TIMEOUT_SECONDS,
+    RUNTIME_HEDGE_ENABLED,
+    RUNTIME_HEDGE_MIN_SAMPLES,
+)
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 200
+RETRY_BACKOFF_SECONDS = 1.0
+
+# Abandoned hedges keep their thread until the HTTP call returns
+_invoke_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="runtime-invoke")
+
+
+class CircuitOpenError(Exception):
+    """The runtime failed repeatedly and is not being called for now."""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = RUNTIME_BREAKER_FAILURES,
+                 cooldown: float = RUNTIME_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+        metrics.incr("runtime_client.rejected")
+        raise CircuitOpenError(f"AgentCore runtime unavailable, retry in {retry_in:.0f}s")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("AgentCore runtime circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.incr("runtime_client.breaker_opened")
+                    logger.warning("AgentCore runtime circuit open after %d failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+# Per runtime ARN, for the lifetime of the Streamlit process
+_breakers: dict[str, CircuitBreaker] = {}
+_latencies: dict[str, deque] = {}
+_state_lock = threading.Lock()
+
+
+def _breaker(runtime_arn: str) -> CircuitBreaker:
+    with _state_lock:
+        return _breakers.setdefault(runtime_arn, CircuitBreaker())
+
+
+def _record_latency(runtime_arn: str, seconds: float) -> None:
+    with _state_lock:
+        _latencies.setdefault(runtime_arn, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def _p95(runtime_arn: str) -> Optional[float]:
+    with _state_lock:
+        samples = sorted(_latencies.get(runtime_arn, ()))
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def _hedge_delay(runtime_arn: str) -> Optional[float]:
+    if not RUNTIME_HEDGE_ENABLED:
+        return None
+    with _state_lock:
+        samples = len(_latencies.get(runtime_arn, ()))
+    return _p95(runtime_arn) if samples >= RUNTIME_HEDGE_MIN_SAMPLES else None
+
+
+def client_stats() -> dict:
+    hedges = metrics.counter("runtime_client.hedges")
+    wins = metrics.counter("runtime_client.hedge_wins")
+    runtimes = {}
+    for arn, breaker in list(_breakers.items()):
+        p95 = _p95(arn)
+        runtimes[arn] = {
+            "breaker": breaker.state,
+            "failures": breaker.failures,
+            "p95_ms": p95 and round(p95 * 1000),
+            "samples": len(_latencies.get(arn, ())),
+        }
+    return {
+        "runtimes": runtimes,
+        "hedges": hedges,
+        "hedge_wins": wins,
+        "hedge_win_rate": round(wins / hedges, 3) if hedges else None,
+    }
+
+
+def is_transient(exc: BaseException) -> bool:
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # requests' ConnectionError/Timeout are OSErrors
+    return isinstance(exc, (TimeoutError, OSError))
 
 
 def _resolve_region() -> str:
@@ -24,21 +181,94 @@ def get_runtime_arn() -> str:
     return _get_ssm_parameter("/app/customersupport/agentcore/runtime_arn")
 
 
+def _invoke_once(region: str, runtime_arn: str, payload: dict, session_id: str, bearer_token: str) -> tuple:
+    started = time.monotonic()
+    client = HttpBedrockAgentCoreClient(region)
+    response = client.invoke_endpoint(
+        agent_arn=runtime_arn,
+        payload=payload,
+        session_id=session_id,
+        bearer_token=bearer_token,
+        custom_headers={"Accept": "application/json"},
+    )
+    return response, time.monotonic() - started
+
+
+def _invoke_hedged(region: str, runtime_arn: str, payload: dict, session_id: str,
+                   bearer_token: str, timeout: float) -> dict:
+    """One attempt, plus a hedge if the first call outlives the p95."""
+    args = (region, runtime_arn, payload, session_id, bearer_token)
+    deadline = time.monotonic() + timeout
+    pending = {_invoke_pool.submit(_invoke_once, *args)}
+    primary = next(iter(pending))
+
+    delay = _hedge_delay(runtime_arn)
+    if delay is not None and delay < timeout:
+        done, _ = wait(pending, timeout=delay)
+        if not done:
+            metrics.incr("runtime_client.hedges")
+            logger.info("No runtime answer after %.1fs (p95), hedging", delay)
+            pending.add(_invoke_pool.submit(_invoke_once, *args))
+
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            try:
+                response, latency = future.result()
+            except Exception as e:
+                error = e
+                continue
+            _record_latency(runtime_arn, latency)
+            if future is not primary:
+                metrics.incr("runtime_client.hedge_wins")
+            return response
+
+    if pending:
+        metrics.incr("runtime_client.timeouts")
+        raise TimeoutError("No AgentCore runtime response before the deadline")
+    raise error
+
+
 def invoke_agentcore_runtime(
     prompt: str,
     bearer_token: str,
     session_id: str,
     actor_id: str,
+    idempotency_key: Optional[str] = None,
+    timeout: float = RUNTIME_CLIENT_TIMEOUT_SECONDS,
 ) -> str:
     runtime_arn = get_runtime_arn()
     region = _resolve_region()
+    breaker = _breaker(runtime_arn)
 
-    client = HttpBedrockAgentCoreClient(region)
-    response = client.invoke_endpoint(
-        agent_arn=runtime_arn,
-        payload={"prompt": prompt, "actor_id": actor_id},
-        session_id=session_id,
-        bearer_token=bearer_token,
-        custom_headers={"Accept": "application/json"},
-    )
-    return response.get("response", "")
+    deadline = time.monotonic() + timeout
+    payload = {
+        "prompt": prompt,
+        "actor_id": actor_id,
+        "idempotency_key": idempotency_key or str(uuid.uuid4()),
+        "deadline": time.time() + timeout,
+    }
+    for attempt in range(1, RUNTIME_CLIENT_MAX_ATTEMPTS + 1):
+        breaker.before_call()
+        try:
+            response = _invoke_hedged(
+                region, runtime_arn, payload, session_id, bearer_token, deadline - time.monotonic()
+            )
+        except Exception as e:
+            if not is_transient(e):
+                # The runtime answered; the request itself was rejected
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            left = deadline - time.monotonic()
+            if attempt == RUNTIME_CLIENT_MAX_ATTEMPTS or left <= RETRY_BACKOFF_SECONDS:
+                raise
+            logger.warning("AgentCore runtime call failed (%s), retrying with the same idempotency key", e)
+            metrics.incr("runtime_client.retries")
+            time.sleep(RETRY_BACKOFF_SECONDS)
+            continue
+        breaker.record_success()
+        return response.get("response", "")
@@ -0,0 +1,193 @@
+"""Semantic cache of final answers for recurring, stateless legal questions.
+
+Questions are normalized and embedded, then compared against a local index of
+unit vectors; only matches above a strict cosine threshold are returned.
+Every entry carries a generation key built from the system prompt text and the
+latest completed KB ingestion job, so a prompt change or a new ingestion makes
+older entries unreachable.
+
+AgentCore runs each session in its own microVM, so an in-process index alone
+would never see other users' questions. When ``ANSWER_CACHE_S3_URI`` is set,
+entries are also written as one S3 object each under ``<uri>/<generation>/``
+and the local index is periodically hydrated from that prefix.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import boto3
+
+from core.config import (
+    ANSWER_CACHE_S3_URI,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+from core.embeddings import embed_text
+from core.kb_version import latest_ingestion_job
+from core.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIMENSIONS = 512
+MAX_ENTRIES = 2000
+S3_REFRESH_SECONDS = 300
+
+# First-person and anaphoric markers: the answer depends on who is asking or
+# on what was said before, so a shared cached answer would be wrong.
+_PERSONAL_MARKERS = re.compile(
+    r"\b(io|mio|mia|miei|mie|noi|nostro|nostra|nostri|nostre|ho|abbiamo|siamo|"
+    r"come (ti )?dicevo|hai detto|dicevi|questo caso|quanto sopra)\b",
+    re.IGNORECASE,
+)
+
+_s3_client = None
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: list
+    generation: str
+    vector: tuple
+    created_at: float = field(default_factory=time.time)
+    score: float = 0.0
+
+
+def depends_on_memory(prompt: str) -> bool:
+    return bool(_PERSONAL_MARKERS.search(prompt or ""))
+
+
+def embed_question(question: str) -> tuple:
+    return embed_text(normalize_text(question), EMBEDDING_DIMENSIONS)
+
+
+def _get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client("s3")
+    return _s3_client
+
+
+def generation_key(system_prompt: str) -> str:
+    prompt_version = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:12]
+    return f"{prompt_version}-{latest_ingestion_job()}"
+
+
+def _dot(a, b) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+def _parse_s3_uri(uri: str) -> tuple:
+    bucket, _, prefix = uri.removeprefix("s3://").partition("/")
+    return bucket, prefix.strip("/")
+
+
+class AnswerCache:
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, s3_uri: Optional[str] = ANSWER_CACHE_S3_URI):
+        self.threshold = threshold
+        self.s3_uri = s3_uri
+        self._entries: dict[str, CachedAnswer] = {}
+        self._hydrated_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, vector: tuple, generation: str) -> Optional[CachedAnswer]:
+        self._hydrate(generation)
+        cutoff = time.time() - ANSWER_CACHE_TTL_SECONDS
+        best, best_score = None, self.threshold
+        with self._lock:
+            candidates = list(self._entries.values())
+        for entry in candidates:
+            if entry.generation != generation or entry.created_at < cutoff:
+                continue
+            score = _dot(vector, entry.vector)
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is None:
+            return None
+        best.score = best_score
+        return best
+
+    def store(self, question: str, vector: tuple, generation: str, answer: str, sources: list) -> None:
+        entry = CachedAnswer(
+            question=normalize_text(question),
+            answer=answer,
+            sources=sorted(set(sources)),
+            generation=generation,
+            vector=tuple(vector),
+        )
+        key = self._key(entry.question, generation)
+        self._add(key, entry)
+
+        if self.s3_uri:
+            bucket, prefix = _parse_s3_uri(self.s3_uri)
+            body = {
+                "question": entry.question,
+                "answer": entry.answer,
+                "sources": entry.sources,
+                "vector": list(entry.vector),
+                "created_at": entry.created_at,
+            }
+            try:
+                _get_s3_client().put_object(
+                    Bucket=bucket,
+                    Key=f"{prefix}/{generation}/{key}.json".lstrip("/"),
+                    Body=json.dumps(body).encode("utf-8"),
+                    ContentType="application/json",
+                )
+            except Exception as e:
+                logger.warning(f"Could not persist answer cache entry: {e}")
+
+    @staticmethod
+    def _key(question: str, generation: str) -> str:
+        return hashlib.sha256(f"{generation}:{question}".encode("utf-8")).hexdigest()[:24]
+
+    def _add(self, key: str, entry: CachedAnswer) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > MAX_ENTRIES:
+                oldest = min(self._entries, key=lambda k: self._entries[k].created_at)
+                del self._entries[oldest]
+
+    def _hydrate(self, generation: str) -> None:
+        """Load entries other sessions wrote under this generation's S3 prefix."""
+        if not self.s3_uri:
+            return
+        with self._lock:
+            if time.time() - self._hydrated_at.get(generation, 0.0) < S3_REFRESH_SECONDS:
+                return
+            self._hydrated_at[generation] = time.time()
+            known = set(self._entries)
+
+        bucket, prefix = _parse_s3_uri(self.s3_uri)
+        s3 = _get_s3_client()
+        try:
+            paginator = s3.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}/{generation}/".lstrip("/")):
+                for obj in page.get("Contents", []):
+                    key = obj["Key"].rsplit("/", 1)[-1].removesuffix(".json")
+                    if key in known:
+                        continue
+                    data = json.loads(s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read())
+                    self._add(
+                        key,
+                        CachedAnswer(
+                            question=data["question"],
+                            answer=data["answer"],
+                            sources=data.get("sources", []),
+                            generation=generation,
+                            vector=tuple(data["vector"]),
+                            created_at=data.get("created_at", time.time()),
+                        ),
+                    )
+        except Exception as e:
+            logger.warning(f"Could not load answer cache from S3: {e}")
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,164 @@
+"""Local approximations of the knowledge base chunking strategies.
+
+``infra/knowledge_base_stack.py`` lets Bedrock chunk documents with the
+strategy named in ``knowledgeBase.chunkingStrategy`` of
+``config/environments.json``. This module reproduces those strategies
+closely enough to compare them offline (``scripts/bench_chunking.py``)
+before paying for a re-ingestion:
+
+    FIXED_SIZE    windows of ``chunkMaxTokens`` with ``chunkOverlapPercent`` overlap
+    HIERARCHICAL  child chunks are searched, their parent chunk is returned
+    SEMANTIC      sentence groups split where the embedding distance jumps
+    ARTICLE       one chunk per Codice Civile article (long ones windowed);
+                  deployable as pre-split files with ``NONE`` chunking
+
+Tokens are estimated from words, since Bedrock's tokenizer is not available
+locally; boundaries therefore differ slightly from the ingested ones.
+"""
+
+import math
+import os
+import re
+from dataclasses import dataclass
+
+from core.embeddings import embed_texts
+
+TOKENS_PER_WORD = 1.3  # Titan tokens per word of Italian legal prose, roughly
+
+STRATEGIES = ("FIXED_SIZE", "HIERARCHICAL", "SEMANTIC", "ARTICLE")  # values of chunkingStrategy
+TEXT_SUFFIXES = (".txt", ".md")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+(?=[A-ZÀ-Ý«\"(])")
+ARTICLE_HEADING = re.compile(r"^\s*art(?:icolo|\.)\s*\d+[\w-]*\b", re.IGNORECASE | re.MULTILINE)
+
+
+@dataclass
+class Chunk:
+    text: str  # what is embedded and searched
+    context: str  # what retrieval returns (the parent chunk for HIERARCHICAL)
+
+
+def read_corpus(directory: str) -> dict:
+    """Text of every .txt/.md file under ``directory``, by relative path."""
+    documents = {}
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(TEXT_SUFFIXES):
+                path = os.path.join(root, name)
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    documents[os.path.relpath(path, directory)] = f.read()
+    return documents
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text.split()) * TOKENS_PER_WORD)
+
+
+def _words_for(tokens: int) -> int:
+    return max(1, int(tokens / TOKENS_PER_WORD))
+
+
+def _windows(words: list, size: int, overlap: int) -> list:
+    step = max(1, size - overlap)
+    windows = []
+    for start in range(0, len(words), step):
+        windows.append(" ".join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+    return windows
+
+
+def fixed_size(text: str, max_tokens: int = 512, overlap_percent: int = 20) -> list:
+    size = _words_for(max_tokens)
+    return [Chunk(w, w) for w in _windows(text.split(), size, size * overlap_percent // 100)]
+
+
+def hierarchical(
+    text: str, parent_max_tokens: int = 1500, child_max_tokens: int = 300, overlap_tokens: int = 60
+) -> list:
+    overlap = _words_for(overlap_tokens) if overlap_tokens else 0
+    chunks = []
+    for parent in _windows(text.split(), _words_for(parent_max_tokens), overlap):
+        for child in _windows(parent.split(), _words_for(child_max_tokens), overlap):
+            chunks.append(Chunk(child, parent))
+    return chunks
+
+
+def sentences(text: str) -> list:
+    return [s for s in (p.strip() for p in _SENTENCE_END.split(" ".join(text.split()))) if s]
+
+
+def semantic(
+    text: str,
+    max_tokens: int = 300,
+    buffer_size: int = 0,
+    breakpoint_percentile: int = 95,
+    dimensions: int = 1024,
+) -> list:
+    """Split between sentences whose neighbourhoods are least similar.
+
+    Each sentence is embedded together with ``buffer_size`` sentences on
+    either side; a boundary is placed where the cosine distance to the next
+    group exceeds the ``breakpoint_percentile`` of all such distances, or
+    where the chunk would exceed ``max_tokens``.
+    """
+    parts = sentences(text)
+    if len(parts) < 2:
+        return fixed_size(text, max_tokens, 0) if parts else []
+    groups = [" ".join(parts[max(0, i - buffer_size):i + buffer_size + 1]) for i in range(len(parts))]
+    vectors = embed_texts(groups, dimensions)
+    distances = [1.0 - sum(a * b for a, b in zip(u, v)) for u, v in zip(vectors, vectors[1:])]
+    ordered = sorted(distances)
+    threshold = ordered[min(len(ordered) - 1, int(len(ordered) * breakpoint_percentile / 100))]
+
+    chunks, current, current_tokens = [], [], 0
+    for i, sentence in enumerate(parts):
+        tokens = estimate_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+        if i < len(distances) and distances[i] >= threshold:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    # A single sentence longer than max_tokens is still windowed
+    return [c for chunk in chunks for c in fixed_size(chunk, max_tokens, 0)]
+
+
+def by_article(text: str, max_tokens: int = 512) -> list:
+    """One chunk per article heading; text before the first one is its own chunk."""
+    starts = [m.start() for m in ARTICLE_HEADING.finditer(text)]
+    if not starts or starts[0] > 0:
+        starts.insert(0, 0)
+    sections = [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+    return [c for section in sections if section.strip() for c in fixed_size(section, max_tokens, 0)]
+
+
+def chunk_document(text: str, kb_config: dict, dimensions: int = 1024) -> list:
+    """Chunk ``text`` the way a ``knowledgeBase`` config block would."""
+    strategy = kb_config.get("chunkingStrategy", "FIXED_SIZE").upper()
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+    if strategy == "FIXED_SIZE":
+        return fixed_size(text, kb_config.get("chunkMaxTokens", 512), kb_config.get("chunkOverlapPercent", 20))
+    if strategy == "HIERARCHICAL":
+        settings = kb_config.get("hierarchical", {})
+        return hierarchical(
+            text,
+            settings.get("parentMaxTokens", 1500),
+            settings.get("childMaxTokens", 300),
+            settings.get("overlapTokens", 60),
+        )
+    if strategy == "SEMANTIC":
+        settings = kb_config.get("semantic", {})
+        return semantic(
+            text,
+            settings.get("maxTokens", 300),
+            settings.get("bufferSize", 0),
+            settings.get("breakpointPercentileThreshold", 95),
+            dimensions,
+        )
+    return by_article(text, kb_config.get("chunkMaxTokens", 512))
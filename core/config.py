@@ -31,3 +31,138 @@ COGNITO_ENABLED = os.getenv("COGNITO_ENABLED", "true").lower() == "true"
 COGNITO_USERNAME = os.getenv("COGNITO_USERNAME")
 COGNITO_PASSWORD = os.getenv("COGNITO_PASSWORD")
 COGNITO_CONFIG_SECRET = os.getenv("COGNITO_CONFIG_SECRET", "awslegalpoc/cognito-config")
+
+# Bedrock prompt caching: "auto" enables cache points for model families that
+# support them, "true"/"false" force the behaviour regardless of model id
+BEDROCK_PROMPT_CACHING = os.getenv("BEDROCK_PROMPT_CACHING", "auto").lower()
+
+# Titan embeddings used to compare user questions. EMBEDDING_BACKEND is
+# "bedrock" or "local" (hashed bag-of-words stand-in for offline runs);
+# vectors are cached on disk under EMBEDDING_CACHE_PATH (empty disables), in
+# files that start over once they would exceed EMBEDDING_CACHE_MAX_MB
+EMBEDDING_MODEL_ID = os.getenv("EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v2:0")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "bedrock").lower()
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "/tmp/embedding_cache")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+
+# Semantic answer cache in front of the runtime (opt-in). Entries are shared
+# across AgentCore sessions through ANSWER_CACHE_S3_URI when it is set.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.93"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_S3_URI = os.getenv("ANSWER_CACHE_S3_URI")
+
+# Cheap-model router (opt-in): simple questions go to ROUTER_LIGHT_MODEL_ID
+# first and are escalated to the configured inference profile when needed
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "false").lower() == "true"
+ROUTER_LIGHT_MODEL_ID = os.getenv(
+    "ROUTER_LIGHT_MODEL_ID", "global.anthropic.claude-haiku-4-5-20251001-v1:0"
+)
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", "0.5"))
+
+# Local out-of-domain prefilter: "off", "shadow" (log only) or "enforce";
+# enforce needs a model from scripts/train_prefilter.py at PREFILTER_MODEL_PATH
+PREFILTER_MODE = os.getenv("PREFILTER_MODE", "shadow").lower()
+PREFILTER_THRESHOLD = float(os.getenv("PREFILTER_THRESHOLD", "0.9"))
+PREFILTER_MODEL_PATH = os.getenv(
+    "PREFILTER_MODEL_PATH", str(Path(__file__).resolve().parent / "prefilter_model.json")
+)
+
+# Speculative KB retrieve on the raw prompt while the model plans its first turn
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_MIN_SIMILARITY = float(os.getenv("PREFETCH_MIN_SIMILARITY", "0.5"))
+
+# Long-term memory retrieval: per-namespace time budget and per-actor cache TTL
+LTM_TIMEOUT_SECONDS = float(os.getenv("LTM_TIMEOUT_SECONDS", "1.5"))
+LTM_CACHE_TTL_SECONDS = int(os.getenv("LTM_CACHE_TTL_SECONDS", "60"))
+
+# Write-behind buffer for Memory conversation events. MEMORY_WRITE_BACKEND is
+# "agentcore" or "local" (in-process store for offline runs)
+MEMORY_WRITE_BEHIND = os.getenv("MEMORY_WRITE_BEHIND", "true").lower() == "true"
+MEMORY_WRITE_BACKEND = os.getenv("MEMORY_WRITE_BACKEND", "agentcore").lower()
+MEMORY_WRITE_LOCAL_PATH = os.getenv("MEMORY_WRITE_LOCAL_PATH")
+MEMORY_WRITE_FLUSH_SECONDS = float(os.getenv("MEMORY_WRITE_FLUSH_SECONDS", "0.5"))
+MEMORY_WRITE_MAX_RETRIES = int(os.getenv("MEMORY_WRITE_MAX_RETRIES", "3"))
+
+# Conversation windowing: user turns kept verbatim (0 disables) before older
+# turns are folded into a rolling summary written by the summary model
+CONVERSATION_WINDOW_TURNS = int(os.getenv("CONVERSATION_WINDOW_TURNS", "6"))
+CONVERSATION_SUMMARY_MODEL_ID = os.getenv(
+    "CONVERSATION_SUMMARY_MODEL_ID", "global.anthropic.claude-haiku-4-5-20251001-v1:0"
+)
+
+# Replace KB chunks already present in the conversation with back-references
+KB_CHUNK_MEMO_ENABLED = os.getenv("KB_CHUNK_MEMO_ENABLED", "true").lower() == "true"
+
+# Rendering of KB search results for the model: "compact" (source alias
+# table), "json" or "verbose" (the original per-result blocks)
+KB_RESULT_FORMAT = os.getenv("KB_RESULT_FORMAT", "compact").lower()
+
+# Request deadlines (``deadline`` in the invoke payload): requests with less
+# than DEADLINE_MIN_SECONDS left are refused, and memory/KB lookups only run
+# while DEADLINE_MODEL_RESERVE_SECONDS would still remain for the model
+DEADLINE_MIN_SECONDS = float(os.getenv("DEADLINE_MIN_SECONDS", "5"))
+DEADLINE_MODEL_RESERVE_SECONDS = float(os.getenv("DEADLINE_MODEL_RESERVE_SECONDS", "15"))
+
+# Adaptive (AIMD) concurrency limits for Bedrock model and KB retrieve calls
+LIMITER_ENABLED = os.getenv("LIMITER_ENABLED", "true").lower() == "true"
+LIMITER_MODEL_MAX = int(os.getenv("LIMITER_MODEL_MAX", "16"))
+LIMITER_KB_MAX = int(os.getenv("LIMITER_KB_MAX", "16"))
+
+# Cross-region failover for the main model: comma-separated
+# "region=model_or_profile_id" alternatives, and the delay after which a slow
+# first token is hedged on the next target (0 disables hedging)
+BEDROCK_FAILOVER_TARGETS = os.getenv("BEDROCK_FAILOVER_TARGETS", "")
+BEDROCK_HEDGE_DELAY_MS = int(os.getenv("BEDROCK_HEDGE_DELAY_MS", "0"))
+
+# Streamlit -> AgentCore runtime client: per-call timeout and attempts, circuit
+# breaker per runtime ARN, and hedging after the observed p95 latency
+RUNTIME_CLIENT_TIMEOUT_SECONDS = float(os.getenv("RUNTIME_CLIENT_TIMEOUT_SECONDS", "120"))
+RUNTIME_CLIENT_MAX_ATTEMPTS = int(os.getenv("RUNTIME_CLIENT_MAX_ATTEMPTS", "2"))
+RUNTIME_BREAKER_FAILURES = int(os.getenv("RUNTIME_BREAKER_FAILURES", "5"))
+RUNTIME_BREAKER_COOLDOWN_SECONDS = float(os.getenv("RUNTIME_BREAKER_COOLDOWN_SECONDS", "30"))
+RUNTIME_HEDGE_ENABLED = os.getenv("RUNTIME_HEDGE_ENABLED", "false").lower() == "true"
+RUNTIME_HEDGE_MIN_SAMPLES = int(os.getenv("RUNTIME_HEDGE_MIN_SAMPLES", "20"))
+
+# Runtime idempotency: answers kept per (session, idempotency key) so
+# re-submitted messages are not run twice
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "1000"))
+
+# Hybrid reranking of KB results: over-fetch KB_RERANK_CANDIDATES from the
+# vector index, fuse BM25 with the vector score (KB_RERANK_ALPHA is the vector
+# weight) and return the best KB_TOP_K by default
+KB_RERANK_ENABLED = os.getenv("KB_RERANK_ENABLED", "true").lower() == "true"
+KB_RERANK_CANDIDATES = int(os.getenv("KB_RERANK_CANDIDATES", "20"))
+KB_RERANK_ALPHA = float(os.getenv("KB_RERANK_ALPHA", "0.5"))
+KB_TOP_K = int(os.getenv("KB_TOP_K", "3"))
+
+# MMR diversification of the selected KB results: KB_MMR_LAMBDA weighs
+# relevance against similarity to the results already picked (1.0 keeps the
+# relevance order, the default until scripts/bench_mmr.py justifies a lower
+# value); KB_MMR_SIMILARITY is "shingles" or "embeddings"
+KB_MMR_ENABLED = os.getenv("KB_MMR_ENABLED", "true").lower() == "true"
+KB_MMR_LAMBDA = float(os.getenv("KB_MMR_LAMBDA", "1.0"))
+KB_MMR_SIMILARITY = os.getenv("KB_MMR_SIMILARITY", "shingles").lower()
+
+# Domain filters on KB searches: queries classified into one domain with at
+# least KB_DOMAIN_MIN_CONFIDENCE of the evidence and KB_DOMAIN_MIN_EVIDENCE
+# points (a term hit is 1, an article reference 2) only search that domain.
+# Off until the bucket is tagged (scripts/tag_kb_documents.py): untagged
+# documents never match the filter.
+KB_DOMAIN_FILTER_ENABLED = os.getenv("KB_DOMAIN_FILTER_ENABLED", "false").lower() == "true"
+KB_DOMAIN_MIN_CONFIDENCE = float(os.getenv("KB_DOMAIN_MIN_CONFIDENCE", "0.6"))
+KB_DOMAIN_MIN_EVIDENCE = float(os.getenv("KB_DOMAIN_MIN_EVIDENCE", "2"))
+
+# Local mirror of the KB vector index (scripts/export_kb_mirror.py), searched
+# instead of Bedrock while it matches the latest ingestion job. Needs numpy
+KB_MIRROR_ENABLED = os.getenv("KB_MIRROR_ENABLED", "false").lower() == "true"
+KB_MIRROR_PATH = os.getenv("KB_MIRROR_PATH", "/tmp/kb_mirror")
+KB_MIRROR_S3_URI = os.getenv("KB_MIRROR_S3_URI")
+KB_MIRROR_MAX_AGE_SECONDS = int(os.getenv("KB_MIRROR_MAX_AGE_SECONDS", "86400"))
+
+# Local preprocessing of KB uploads (core/preprocess.py): text extraction,
+# boilerplate stripping and MinHash duplicate detection above the threshold
+KB_PREPROCESS_ENABLED = os.getenv("KB_PREPROCESS_ENABLED", "true").lower() == "true"
+KB_NEAR_DUPLICATE_THRESHOLD = float(os.getenv("KB_NEAR_DUPLICATE_THRESHOLD", "0.9"))
@@ -0,0 +1,206 @@
+"""Conversation windowing with a rolling summary of older turns.
+
+The agent resends its whole history on every model call, so long
+consultations get slower and more expensive turn after turn. This manager
+keeps the last ``CONVERSATION_WINDOW_TURNS`` user turns verbatim and folds
+everything older into a single summary message at the head of the history.
+
+Summaries are written by ``CONVERSATION_SUMMARY_MODEL_ID`` on a background
+thread after the turn that overflowed the window has been answered; until
+one is ready the window is simply a few turns longer. A finished summary is
+stored with the session (conversation manager state plus the offset of the
+messages it replaces), so the next invocation loads the summary and only the
+recent messages.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from strands import Agent
+from strands.agent.conversation_manager import ConversationManager, SlidingWindowConversationManager
+from strands.hooks import BeforeInvocationEvent, HookRegistry
+
+from core.config import (
+    BEDROCK_REGION,
+    CONVERSATION_SUMMARY_MODEL_ID,
+    CONVERSATION_WINDOW_TURNS,
+)
+from core.limiter import ModelConcurrencyHook
+from core.models import build_bedrock_model
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TAG = "conversation_summary"
+USER_CONTEXT_PREFIX = "<user_context>"
+MAX_TOOL_INPUT_CHARS = 200
+
+SUMMARY_PROMPT = """Sei un assistente che riassume consulenze notarili in corso.
+Ricevi l'eventuale riassunto precedente e i turni successivi della conversazione.
+Scrivi un unico riassunto aggiornato, in italiano e in terza persona, con elenchi puntati:
+- fatti del caso riferiti dall'utente (persone, beni, date, importi, regime patrimoniale)
+- domande poste e conclusioni date, con gli articoli e le fonti citate
+- punti ancora aperti
+Non aggiungere valutazioni nuove e non rivolgerti all'utente."""
+
+_summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+
+
+def _text(message: dict) -> str:
+    return "\n".join(block["text"] for block in message.get("content", []) if "text" in block)
+
+
+def _is_summary(message: dict) -> bool:
+    return _text(message).startswith(f"<{SUMMARY_TAG}>")
+
+
+def _is_user_context(message: dict) -> bool:
+    # Long-term memory injected by the session manager; never persisted
+    return message.get("role") == "assistant" and _text(message).startswith(USER_CONTEXT_PREFIX)
+
+
+def _is_user_turn(message: dict) -> bool:
+    content = message.get("content", [])
+    return (
+        message.get("role") == "user"
+        and any("text" in block for block in content)
+        and not any("toolResult" in block for block in content)
+        and not _is_summary(message)
+    )
+
+
+def render_transcript(messages: list) -> str:
+    lines = []
+    for message in messages:
+        if _is_summary(message) or _is_user_context(message):
+            continue
+        speaker = "Utente" if message.get("role") == "user" else "Assistente"
+        for block in message.get("content", []):
+            if block.get("text", "").strip():
+                lines.append(f"{speaker}: {block['text'].strip()}")
+            elif "toolUse" in block:
+                query = str(block["toolUse"].get("input", ""))[:MAX_TOOL_INPUT_CHARS]
+                lines.append(f"[Ricerca nella knowledge base: {query}]")
+    return "\n".join(lines)
+
+
+def summarize(previous: Optional[str], messages: list, model_id: str = CONVERSATION_SUMMARY_MODEL_ID,
+              region: Optional[str] = BEDROCK_REGION) -> str:
+    summarizer = Agent(
+        model=build_bedrock_model(model_id, region, temperature=0.0),
+        system_prompt=SUMMARY_PROMPT,
+        callback_handler=None,
+        hooks=[ModelConcurrencyHook()],
+    )
+    prompt = ""
+    if previous:
+        prompt += f"Riassunto precedente:\n{previous}\n\n"
+    prompt += f"Nuovi turni:\n{render_transcript(messages)}"
+    result = summarizer(prompt)
+    return _text(result.message).strip()
+
+
+class RollingSummaryConversationManager(ConversationManager):
+    def __init__(self, window_turns: int = CONVERSATION_WINDOW_TURNS, session_manager=None,
+                 summary_model_id: str = CONVERSATION_SUMMARY_MODEL_ID):
+        super().__init__()
+        self.window_turns = window_turns
+        self.session_manager = session_manager
+        self.summary_model_id = summary_model_id
+        self.summary: Optional[str] = None
+        self._lock = threading.Lock()
+        self._in_flight = False
+        # (summary, last message it replaces) waiting to be applied to agent.messages
+        self._ready: Optional[tuple] = None
+        # Overflow fallback once the summary itself no longer fits
+        self._fallback = SlidingWindowConversationManager(should_truncate_results=True)
+
+    def summary_message(self) -> Optional[dict]:
+        if not self.summary:
+            return None
+        return {"role": "user", "content": [{"text": f"<{SUMMARY_TAG}>\n{self.summary}\n</{SUMMARY_TAG}>"}]}
+
+    def restore_from_session(self, state: dict[str, Any]) -> Optional[list]:
+        if state.get("__name__") != self.__class__.__name__:
+            # Saved by another manager (SlidingWindowConversationManager before
+            # summaries, or with CONVERSATION_WINDOW_TURNS <= 0): load the whole
+            # stored history and let the window fold it into a summary
+            logger.info("Restoring a %s session without a summary", state.get("__name__"))
+            self.removed_message_count = 0
+            self.summary = None
+            return None
+        super().restore_from_session(state)
+        self.summary = state.get("summary")
+        message = self.summary_message()
+        return [message] if message else None
+
+    def get_state(self) -> dict[str, Any]:
+        with self._lock:
+            return {"summary": self.summary, **super().get_state()}
+
+    def apply_management(self, agent: Agent, **kwargs: Any) -> None:
+        self._apply_ready(agent)
+        messages = agent.messages
+        turn_starts = [i for i, message in enumerate(messages) if _is_user_turn(message)]
+        with self._lock:
+            if len(turn_starts) <= self.window_turns or self._in_flight:
+                return
+            self._in_flight = True
+            previous = self.summary
+
+        first = 1 if messages and _is_summary(messages[0]) else 0
+        split = turn_starts[-self.window_turns]
+        evicted = list(messages[first:split])
+        _summary_pool.submit(self._summarize, agent, previous, evicted)
+
+    def register_hooks(self, registry: HookRegistry, **kwargs: Any) -> None:
+        super().register_hooks(registry, **kwargs)
+        registry.add_callback(BeforeInvocationEvent, lambda event: self._apply_ready(event.agent))
+
+    def reduce_context(self, agent: Agent, e: Optional[Exception] = None, **kwargs: Any) -> None:
+        removed = self._fallback.removed_message_count
+        self._fallback.reduce_context(agent, e, **kwargs)
+        with self._lock:
+            self.removed_message_count += self._fallback.removed_message_count - removed
+
+    def _summarize(self, agent: Agent, previous: Optional[str], evicted: list) -> None:
+        try:
+            summary = summarize(previous, evicted, self.summary_model_id)
+        except Exception as e:
+            logger.error("Conversation summary failed, keeping full history: %s", e)
+            with self._lock:
+                self._in_flight = False
+            return
+
+        persisted = sum(1 for m in evicted if not _is_summary(m) and not _is_user_context(m))
+        with self._lock:
+            self.summary = summary
+            self.removed_message_count += persisted
+            self._ready = (summary, evicted[-1])
+            self._in_flight = False
+        logger.info("Folded %d messages into the conversation summary", persisted)
+
+        if self.session_manager is not None:
+            try:
+                self.session_manager.sync_agent(agent)
+            except Exception as e:
+                logger.error("Could not store the conversation summary with the session: %s", e)
+
+    def _apply_ready(self, agent: Agent) -> None:
+        """Swap the summarized messages for the summary in an agent that is still in use."""
+        with self._lock:
+            ready, self._ready = self._ready, None
+        if ready is None:
+            return
+        _, last_replaced = ready
+        for index, message in enumerate(agent.messages):
+            if message is last_replaced:
+                agent.messages[:] = [self.summary_message()] + agent.messages[index + 1:]
+                return
+
+
+def build_conversation_manager(session_manager=None) -> ConversationManager:
+    if CONVERSATION_WINDOW_TURNS <= 0:
+        return SlidingWindowConversationManager()
+    return RollingSummaryConversationManager(session_manager=session_manager)
@@ -0,0 +1,71 @@
+"""Maximal-marginal-relevance selection of knowledge base results.
+
+With overlapping fixed-size chunks and popular topics, the best-scoring
+candidates are often near-copies of the same passage. ``select`` picks the
+results one at a time, each maximizing
+
+    lambda * relevance - (1 - lambda) * max similarity to the ones already picked
+
+so ``KB_MMR_LAMBDA`` = 1.0 keeps the relevance order and lower values trade
+relevance for coverage. Similarity is the Jaccard overlap of word trigrams
+(local, microseconds) or, with ``KB_MMR_SIMILARITY=embeddings``, the cosine
+of the chunks' embeddings from ``core/embeddings.py`` (cached, but the first
+sight of a chunk costs an embedding call).
+"""
+
+import time
+
+from core import metrics
+from core.config import KB_MMR_LAMBDA, KB_MMR_SIMILARITY
+from core.embeddings import embed_texts
+from core.text import tokenize
+
+SHINGLE_WORDS = 3
+EMBEDDING_DIMENSIONS = 256  # enough to tell near-copies apart
+
+
+def _text(result: dict) -> str:
+    return result.get("content", {}).get("text", "")
+
+
+def _shingles(text: str) -> set:
+    words = tokenize(text)
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+
+
+def similarity_matrix(texts: list, method: str = KB_MMR_SIMILARITY) -> list:
+    """Pairwise similarity of ``texts`` in [0, 1]."""
+    if method == "embeddings":
+        vectors = embed_texts(texts, EMBEDDING_DIMENSIONS)
+        return [[max(0.0, sum(a * b for a, b in zip(u, v))) for v in vectors] for u in vectors]
+    sets = [_shingles(t) for t in texts]
+    return [[len(a & b) / len(a | b) if a | b else 0.0 for b in sets] for a in sets]
+
+
+def select(
+    results: list,
+    relevance: list,
+    max_results: int,
+    lambda_: float = KB_MMR_LAMBDA,
+    method: str = KB_MMR_SIMILARITY,
+) -> list:
+    """Up to ``max_results`` of ``results``, picked by maximal marginal relevance."""
+    by_relevance = sorted(range(len(results)), key=lambda i: relevance[i], reverse=True)
+    if lambda_ >= 1.0 or len(results) <= 1:
+        return [results[i] for i in by_relevance[:max_results]]
+
+    started = time.perf_counter()
+    similarity = similarity_matrix([_text(r) for r in results], method)
+    picked = []
+    remaining = list(by_relevance)
+    while remaining and len(picked) < max_results:
+        best = max(
+            remaining,
+            key=lambda i: lambda_ * relevance[i] - (1 - lambda_) * max((similarity[i][j] for j in picked), default=0.0),
+        )
+        picked.append(best)
+        remaining.remove(best)
+    metrics.set_gauge("kb_mmr.ms", (time.perf_counter() - started) * 1000)
+    if picked != by_relevance[:len(picked)]:
+        metrics.incr("kb_mmr.reordered")
+    return [results[i] for i in picked]
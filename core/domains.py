@@ -0,0 +1,146 @@
+"""Legal domains of the knowledge base and a local classifier for them.
+
+Documents are tagged with a ``domain`` metadata attribute through Bedrock KB
+sidecar files (``<key>.metadata.json`` next to the object in S3), written at
+upload (Streamlit sidebar) or backfilled with ``scripts/tag_kb_documents.py``.
+Documents that fit no single domain are tagged ``generale``.
+
+The same classifier labels the tool's search queries: keyword stems typical
+of each domain plus the Codice Civile article ranges that govern it. When
+one domain clearly wins on enough evidence (two term hits or an article
+reference, so a single incidental word is not enough),
+``search_knowledge_base`` restricts the vector search to that domain and
+``generale`` documents.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from core.config import KB_DOMAIN_MIN_CONFIDENCE, KB_DOMAIN_MIN_EVIDENCE
+from core.retrieval_eval import article_refs
+from core.text import normalize_text
+
+METADATA_KEY = "domain"
+GENERAL = "generale"
+SIDECAR_SUFFIX = ".metadata.json"
+MAX_DOCUMENT_CHARS = 200_000
+ARTICLE_WEIGHT = 2.0
+
+DOMAIN_TERMS = {
+    "regime_patrimoniale": (
+        r"comunione (legale|de residuo|convenzionale)|separazione dei beni|regime patrimonial\w*|"
+        r"fondo patrimonial\w*|convenzion\w* matrimonial\w*|impresa familiare|coniug\w*|"
+        r"matrimoni\w*|beni personali|acquisti in comunione"
+    ),
+    "successioni": (
+        r"successio\w*|successor\w*|ered\w*|testament\w*|legittima|legittimari\w*|legatari\w*|"
+        r"legat[oi] (di|in|obbligatori\w*|ereditari\w*)|prelegat\w*|donazion\w*|"
+        r"don\w+ (indirett\w*|modal\w*)|collazione|azione di riduzione|de cuius|"
+        r"patt\w* successori\w*|rinunzi\w* all eredita|accettazione (con beneficio|dell eredita)"
+    ),
+    "contratti": (
+        r"contratt\w*|proposta|accettazione della proposta|caparra|clausol\w*|nullit\w*|"
+        r"annullabil\w*|rescissione|risoluzione|preliminare|simulazione|rappresentanza|"
+        r"recesso|vendita|compravendita|mutuo|locazione|appalto"
+    ),
+    "obbligazioni": (
+        r"obbligazion\w*|adempimento|inadempimento|creditor\w*|debitor\w*|mora|"
+        r"risarcimento|solidal\w*|novazione|compensazione|remissione|surrogazione|"
+        r"cessione del credito|prescrizione|decadenza|garanzi\w*|fideiussione|ipoteca"
+    ),
+}
+
+# Notarial vocabulary outside any single domain; with DOMAIN_TERMS it marks a prompt as legal
+NOTARIAL_TERMS = (
+    r"notai\w*|notaril\w*|rogit\w*|atto pubblico|scrittura privata|autentica\w*|procura|"
+    r"immobil\w*|catast\w*|trascrizion\w*|usufrutto|nuda proprieta|servitu|condomini\w*|"
+    r"societa|codice civile|giuridic\w*|legge|diritt\w*"
+)
+
+# Drafting requests ("scrivi una lettera di disdetta") often cite no statute at all
+DRAFTING_TERMS = (
+    r"redig\w*|redazion\w*|stipul\w*|sottoscri\w*|firm\w*|intest\w*|voltur\w*|registrar\w*|"
+    r"letter[ae]|disdett\w*|recedere|diffid\w*|messa in mora|bozz\w*|fac ?simile|modul\w*|"
+    r"dichiarazion\w*|deleg\w*|locazion\w*|affitt\w*|inquilin\w*|locator\w*|sfratt\w*"
+)
+
+# Codice Civile articles by domain (book I title VI, book II, book IV titles I-II)
+ARTICLE_RANGES = {
+    "regime_patrimoniale": [(159, 230)],
+    "successioni": [(456, 809)],
+    "obbligazioni": [(1173, 1320), (1936, 1957), (2740, 2969)],
+    "contratti": [(1321, 1935)],
+}
+
+DOMAINS = list(DOMAIN_TERMS)
+_PATTERNS = {domain: re.compile(rf"\b({terms})\b") for domain, terms in DOMAIN_TERMS.items()}
+_LEGAL_LEXICON = re.compile(rf"\b({'|'.join([*DOMAIN_TERMS.values(), NOTARIAL_TERMS, DRAFTING_TERMS])})\b")
+
+
+@dataclass
+class DomainDecision:
+    domain: Optional[str]  # None when no domain is clear enough to filter on
+    confidence: float
+    scores: dict
+
+
+def _article_domain(ref: str) -> Optional[str]:
+    number = int(re.match(r"\d+", ref).group())
+    for domain, ranges in ARTICLE_RANGES.items():
+        if any(low <= number <= high for low, high in ranges):
+            return domain
+    return None
+
+
+def domain_scores(text: str) -> dict:
+    normalized = normalize_text(text[:MAX_DOCUMENT_CHARS])
+    scores = {domain: float(len(pattern.findall(normalized))) for domain, pattern in _PATTERNS.items()}
+    for ref in article_refs(text[:MAX_DOCUMENT_CHARS]):
+        domain = _article_domain(ref)
+        if domain:
+            scores[domain] += ARTICLE_WEIGHT
+    return scores
+
+
+def mentions_legal_terms(text: str) -> bool:
+    """Whether ``text`` uses any domain, notarial or drafting term ("eredità", "rogito", "disdetta")."""
+    return bool(_LEGAL_LEXICON.search(normalize_text(text)))
+
+
+def classify(
+    text: str,
+    min_confidence: float = KB_DOMAIN_MIN_CONFIDENCE,
+    min_evidence: float = KB_DOMAIN_MIN_EVIDENCE,
+) -> DomainDecision:
+    """Domain holding at least ``min_confidence`` and ``min_evidence`` of the evidence, if any."""
+    scores = domain_scores(text)
+    total = sum(scores.values())
+    if not total:
+        return DomainDecision(None, 0.0, scores)
+    domain = max(scores, key=scores.get)
+    confidence = scores[domain] / total
+    clear = confidence >= min_confidence and scores[domain] >= min_evidence
+    return DomainDecision(domain if clear else None, confidence, scores)
+
+
+def document_domain(name: str, text: str = "") -> str:
+    """Domain to tag a document with; ``generale`` when it spans several."""
+    return classify(f"{name.replace('_', ' ')}\n{text}").domain or GENERAL
+
+
+def sidecar_key(key: str) -> str:
+    return f"{key}{SIDECAR_SUFFIX}"
+
+
+def is_sidecar(key: str) -> bool:
+    return key.endswith(SIDECAR_SUFFIX)
+
+
+def sidecar_body(domain: str) -> bytes:
+    return json.dumps({"metadataAttributes": {METADATA_KEY: domain}}).encode("utf-8")
+
+
+def retrieval_filter(domain: str) -> dict:
+    return {"in": {"key": METADATA_KEY, "value": [domain, GENERAL]}}
@@ -0,0 +1,301 @@
+"""Text embeddings shared by the answer cache, the KB mirror and scripts.
+
+Every vector is looked up, in order, in an in-process LRU, in an on-disk
+cache and only then computed. Concurrent requests for the same text share
+one computation. ``embed_texts`` resolves a whole batch in one pass and
+embeds the distinct misses concurrently (at most
+``EMBEDDING_MAX_CONCURRENCY`` at a time), since Titan takes one input text
+per call.
+
+The disk cache keeps one append-only file per model and dimension under
+``EMBEDDING_CACHE_PATH``: fixed-size records of a 4-byte marker, a 16-byte
+content hash, the float32 vector and a CRC32 of the hash and vector, so it is
+compact, cheap to index at start-up and safe to share between processes of
+the same host. Records that fail the check (a write torn by a crash) are
+skipped and indexing resumes at the next marker. A file that would grow past
+``EMBEDDING_CACHE_MAX_MB`` is started over.
+
+``EMBEDDING_BACKEND=local`` replaces Titan with a deterministic hashed
+bag-of-words model for offline runs. Its vectors only resemble each other,
+not Titan's, so it must not be mixed with a Titan-built KB mirror.
+"""
+
+import array
+import contextlib
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import boto3
+
+from core import metrics
+from core.config import (
+    BEDROCK_REGION,
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_MAX_MB,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MODEL_ID,
+)
+from core.singleflight import SingleFlight
+from core.text import tokenize
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CACHE_SIZE = 4096
+KEY_BYTES = 16
+RECORD_MARKER = b"EMB1"
+CRC_BYTES = 4
+INDEX_READ_BYTES = 1 << 20
+LOCAL_MODEL_ID = "local-hashed-bow"
+
+_bedrock_runtime_client = None
+_embeddings = SingleFlight("embedding")
+_embed_pool = ThreadPoolExecutor(max_workers=EMBEDDING_MAX_CONCURRENCY, thread_name_prefix="embedding")
+
+
+def _get_client():
+    global _bedrock_runtime_client
+    if _bedrock_runtime_client is None:
+        region = BEDROCK_REGION or os.getenv("AWS_REGION", "us-east-2")
+        _bedrock_runtime_client = boto3.client("bedrock-runtime", region_name=region)
+    return _bedrock_runtime_client
+
+
+def _titan_embedding(text: str, dimensions: int) -> tuple:
+    response = _get_client().invoke_model(
+        modelId=EMBEDDING_MODEL_ID,
+        body=json.dumps({"inputText": text, "dimensions": dimensions, "normalize": True}),
+        contentType="application/json",
+        accept="application/json",
+    )
+    return tuple(json.loads(response["body"].read())["embedding"])
+
+
+def _local_embedding(text: str, dimensions: int) -> tuple:
+    """Unit-length feature-hashed unigrams and bigrams."""
+    tokens = tokenize(text)
+    vector = [0.0] * dimensions
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return tuple(v / norm for v in vector)
+
+
+def model_id() -> str:
+    return LOCAL_MODEL_ID if EMBEDDING_BACKEND == "local" else EMBEDDING_MODEL_ID
+
+
+def _compute(text: str, dimensions: int) -> tuple:
+    metrics.incr("embeddings.computed")
+    if EMBEDDING_BACKEND == "local":
+        return _local_embedding(text, dimensions)
+    return _titan_embedding(text, dimensions)
+
+
+def _key(text: str, dimensions: int) -> bytes:
+    return hashlib.sha256(f"{model_id()}\n{dimensions}\n{text}".encode("utf-8")).digest()[:KEY_BYTES]
+
+
+class _DiskCache:
+    """Append-only file of (marker, content hash, float32 vector, CRC32) records."""
+
+    def __init__(self, directory: str, dimensions: int, max_bytes: float = EMBEDDING_CACHE_MAX_MB * 1024 * 1024):
+        safe_model = re.sub(r"[^\w.-]", "_", model_id())
+        self.path = os.path.join(directory, f"{safe_model}-{dimensions}.emb")
+        self.dimensions = dimensions
+        self.record_size = len(RECORD_MARKER) + KEY_BYTES + 4 * dimensions + CRC_BYTES
+        self.max_records = max(1, int(max_bytes // self.record_size))
+        self._offsets: dict[bytes, int] = {}  # key -> record offset
+        self._indexed_size = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _record(self, key: bytes, vector: tuple) -> bytes:
+        body = key + array.array("f", vector).tobytes()
+        return RECORD_MARKER + body + zlib.crc32(body).to_bytes(CRC_BYTES, "little")
+
+    @staticmethod
+    def _record_key(record: bytes) -> bytes:
+        return record[len(RECORD_MARKER):len(RECORD_MARKER) + KEY_BYTES]
+
+    def _valid(self, record: bytes) -> bool:
+        body = record[len(RECORD_MARKER):-CRC_BYTES]
+        return (
+            record.startswith(RECORD_MARKER)
+            and zlib.crc32(body).to_bytes(CRC_BYTES, "little") == record[-CRC_BYTES:]
+        )
+
+    def _reset(self) -> None:
+        self._offsets.clear()
+        self._indexed_size = 0
+
+    def _index(self) -> None:
+        # Pick up records appended by other processes since the last look
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < self._indexed_size:
+            self._reset()  # another process started the file over
+        if size - self._indexed_size < self.record_size:
+            return
+        offset, pending = self._indexed_size, b""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while True:
+                block = f.read(INDEX_READ_BYTES)
+                if not block:
+                    break
+                pending += block
+                pos = 0
+                while len(pending) - pos >= self.record_size:
+                    record = pending[pos:pos + self.record_size]
+                    if self._valid(record):
+                        self._offsets[self._record_key(record)] = offset + pos
+                        pos += self.record_size
+                        continue
+                    metrics.incr("embeddings.disk_corrupt_records")
+                    resync = pending.find(RECORD_MARKER, pos + 1)
+                    pos = resync if resync >= 0 else len(pending) - len(RECORD_MARKER) + 1
+                offset += pos
+                pending = pending[pos:]
+        # A partial record at the end may still be being written; look again next time
+        self._indexed_size = offset
+
+    def get(self, key: bytes) -> Optional[tuple]:
+        with self._lock:
+            offset = self._offsets.get(key)
+            if offset is None:
+                self._index()
+                offset = self._offsets.get(key)
+        if offset is None:
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                record = f.read(self.record_size)
+        except FileNotFoundError:
+            record = b""
+        if len(record) != self.record_size or not self._valid(record) or self._record_key(record) != key:
+            # The file was started over by another process since it was indexed
+            with self._lock:
+                self._reset()
+            return None
+        values = array.array("f")
+        values.frombytes(record[len(RECORD_MARKER) + KEY_BYTES:-CRC_BYTES])
+        return tuple(values)
+
+    def put(self, key: bytes, vector: tuple) -> None:
+        record = self._record(key, vector)
+        with self._lock:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if size + len(record) > self.max_records * self.record_size:
+                # Bounded size: start over instead of growing
+                metrics.incr("embeddings.disk_restarts")
+                logger.info("Embedding disk cache %s is full, starting it over", self.path)
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self.path)
+                self._reset()
+            # One write per record with O_APPEND keeps concurrent writers from interleaving
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, record)
+            finally:
+                os.close(fd)
+
+
+_memory: OrderedDict = OrderedDict()
+_disk: dict[int, _DiskCache] = {}
+_cache_lock = threading.Lock()
+
+
+def _disk_cache(dimensions: int) -> Optional[_DiskCache]:
+    if not EMBEDDING_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if dimensions not in _disk:
+            try:
+                _disk[dimensions] = _DiskCache(EMBEDDING_CACHE_PATH, dimensions)
+            except OSError as e:
+                logger.warning("Embedding disk cache unavailable: %s", e)
+                return None
+        return _disk[dimensions]
+
+
+def _remember(key: bytes, vector: tuple) -> None:
+    with _cache_lock:
+        _memory[key] = vector
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+def _cached(key: bytes, dimensions: int) -> Optional[tuple]:
+    with _cache_lock:
+        vector = _memory.get(key)
+        if vector is not None:
+            _memory.move_to_end(key)
+            metrics.incr("embeddings.memory_hits")
+            return vector
+    disk = _disk_cache(dimensions)
+    vector = disk.get(key) if disk else None
+    if vector is not None:
+        metrics.incr("embeddings.disk_hits")
+        _remember(key, vector)
+    return vector
+
+
+def _embed_missing(key: bytes, text: str, dimensions: int) -> tuple:
+    def compute():
+        # Another caller may have finished it while this one waited
+        vector = _cached(key, dimensions)
+        if vector is None:
+            vector = _compute(text, dimensions)
+            _remember(key, vector)
+            disk = _disk_cache(dimensions)
+            if disk:
+                try:
+                    disk.put(key, vector)
+                except OSError as e:
+                    logger.warning("Could not write embedding to disk cache: %s", e)
+        return vector
+
+    return _embeddings.do(key, compute)
+
+
+def embed_texts(texts: list, dimensions: int = 1024) -> list:
+    """Unit-length embeddings of ``texts``, in order."""
+    keys = [_key(text, dimensions) for text in texts]
+    vectors = {}
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key in vectors or key in missing:
+            continue
+        vector = _cached(key, dimensions)
+        if vector is None:
+            missing[key] = text
+        else:
+            vectors[key] = vector
+
+    if len(missing) == 1:
+        key, text = next(iter(missing.items()))
+        vectors[key] = _embed_missing(key, text, dimensions)
+    elif missing:
+        metrics.set_gauge("embeddings.batch_misses", len(missing))
+        futures = {key: _embed_pool.submit(_embed_missing, key, text, dimensions) for key, text in missing.items()}
+        for key, future in futures.items():
+            vectors[key] = future.result()
+    return [vectors[key] for key in keys]
+
+
+def embed_text(text: str, dimensions: int = 1024) -> tuple:
+    """Return the unit-length embedding of ``text``."""
+    return embed_texts([text], dimensions)[0]
@@ -0,0 +1,242 @@
+"""Bedrock model that spreads calls over several regions or inference profiles.
+
+``BEDROCK_FAILOVER_TARGETS`` lists alternatives for the main model as
+comma-separated ``region=model_or_profile_id`` pairs. Each target keeps an
+EWMA of its time to first stream event and a health state. Every call starts
+on the fastest healthy target. Throttling, 5xx and connection errors raised
+before the first event mark the target unhealthy for an exponentially
+growing cooldown and move the call to the next target; throttles also
+shrink ``model_limiter``, which would otherwise never see them. When
+``BEDROCK_HEDGE_DELAY_MS`` is set and no event has arrived by then, the
+next target is started too and the first one to answer wins.
+
+Once a stream has produced events it is never switched, so the agent never
+sees a mix of two responses.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Optional
+
+from botocore.exceptions import ClientError, ConnectionError as BotocoreConnectionError
+from botocore.exceptions import ReadTimeoutError
+from strands.models import Model
+from strands.types.exceptions import ModelThrottledException
+
+from core import metrics
+from core.limiter import AdaptiveLimiter, is_throttle, model_limiter
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.2
+BASE_COOLDOWN_SECONDS = 5.0
+MAX_COOLDOWN_SECONDS = 120.0
+SERVER_ERROR_CODES = {
+    "InternalServerException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+}
+
+
+def parse_targets(spec: str) -> list:
+    """``"eu-west-1=eu.amazon.nova-2-lite-v1:0,..."`` -> [(region, model_id), ...]"""
+    targets = []
+    for entry in (spec or "").split(","):
+        region, sep, model_id = entry.strip().partition("=")
+        if sep and region and model_id:
+            targets.append((region.strip(), model_id.strip()))
+    return targets
+
+
+def should_fail_over(exc: BaseException) -> bool:
+    if isinstance(exc, (ModelThrottledException, BotocoreConnectionError, ReadTimeoutError)):
+        return True
+    if isinstance(exc, ClientError):
+        error = exc.response.get("Error", {})
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return error.get("Code") in SERVER_ERROR_CODES or status >= 500
+    return False
+
+
+@dataclass
+class TargetHealth:
+    label: str
+    ttft_ewma: Optional[float] = None  # seconds
+    failures: int = 0
+    unhealthy_until: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def record_success(self, ttft: float) -> None:
+        self.failures = 0
+        self.unhealthy_until = 0.0
+        self.observe(ttft)
+
+    def observe(self, ttft: float) -> None:
+        self.ttft_ewma = ttft if self.ttft_ewma is None else (
+            EWMA_ALPHA * ttft + (1 - EWMA_ALPHA) * self.ttft_ewma
+        )
+        metrics.set_gauge(f"failover.{self.label}.ttft_ms", self.ttft_ewma * 1000)
+
+    def record_failure(self, exc: BaseException) -> None:
+        self.failures += 1
+        cooldown = min(MAX_COOLDOWN_SECONDS, BASE_COOLDOWN_SECONDS * 2 ** (self.failures - 1))
+        self.unhealthy_until = time.monotonic() + cooldown
+        metrics.incr(f"failover.{self.label}.failures")
+        logger.warning("Bedrock target %s failed (%s), cooling down for %.0fs",
+                       self.label, type(exc).__name__, cooldown)
+
+
+# Scores outlive the per-request models, keyed by target label
+_health: dict[str, TargetHealth] = {}
+
+
+@dataclass
+class Target:
+    label: str
+    model: Model
+
+    @property
+    def health(self) -> TargetHealth:
+        return _health.setdefault(self.label, TargetHealth(self.label))
+
+
+def health_snapshot() -> dict:
+    return {
+        label: {"healthy": h.healthy, "ttft_ms": h.ttft_ewma and round(h.ttft_ewma * 1000, 1), "failures": h.failures}
+        for label, h in _health.items()
+    }
+
+
+class FailoverModel(Model):
+    def __init__(self, targets: list, hedge_delay: float = 0.0, limiter: AdaptiveLimiter = model_limiter):
+        if not targets:
+            raise ValueError("FailoverModel needs at least one target")
+        self.targets = targets
+        self.hedge_delay = hedge_delay
+        # Throttles recovered from by failing over never reach ModelConcurrencyHook
+        self.limiter = limiter
+
+    @property
+    def config(self) -> dict:
+        # Read by Strands tracing; report the primary target
+        return self.targets[0].model.config
+
+    def update_config(self, **model_config: Any) -> None:
+        for target in self.targets:
+            target.model.update_config(**model_config)
+
+    def get_config(self) -> Any:
+        return self.targets[0].model.get_config()
+
+    def ranked(self) -> list:
+        """Healthy targets by observed latency, then unmeasured healthy ones in configured order, then the rest."""
+        order = {id(t): i for i, t in enumerate(self.targets)}
+        return sorted(
+            self.targets,
+            key=lambda t: (
+                not t.health.healthy,
+                t.health.ttft_ewma is None,
+                t.health.ttft_ewma or 0.0,
+                order[id(t)],
+            ),
+        )
+
+    def structured_output(self, *args: Any, **kwargs: Any):
+        return self.ranked()[0].model.structured_output(*args, **kwargs)
+
+    async def stream(self, *args: Any, **kwargs: Any) -> AsyncGenerator[Any, None]:
+        candidates = self.ranked()
+        last_error = None
+        while candidates:
+            target = candidates.pop(0)
+            started = time.monotonic()
+            stream = target.model.stream(*args, **kwargs)
+            first = asyncio.ensure_future(stream.__anext__())
+            hedge = None
+            if self.hedge_delay > 0 and candidates:
+                try:
+                    done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+                except asyncio.CancelledError:
+                    first.cancel()
+                    raise
+                if not done:
+                    hedge = candidates.pop(0)
+                    metrics.incr("failover.hedges")
+                    logger.info("No first event from %s after %.1fs, hedging on %s",
+                                target.label, self.hedge_delay, hedge.label)
+
+            winning_stream, first_event, error = await self._first_event(
+                target, stream, first, started, hedge, args, kwargs
+            )
+            if winning_stream is None:
+                last_error = error
+                metrics.incr("failover.switches")
+                continue
+
+            if first_event is not None:
+                yield first_event
+            async for event in winning_stream:
+                yield event
+            return
+
+        raise last_error
+
+    async def _first_event(self, target, stream, first, started, hedge, args, kwargs) -> tuple:
+        """Race the primary (and hedge) to a first event.
+
+        Returns (stream, first event, None), or (None, None, error) when every
+        racer failed with an error worth failing over on.
+        """
+        racers = {first: (target, stream, started)}
+        if hedge is not None:
+            hedge_stream = hedge.model.stream(*args, **kwargs)
+            racers[asyncio.ensure_future(hedge_stream.__anext__())] = (hedge, hedge_stream, time.monotonic())
+
+        error = None
+        try:
+            while racers:
+                done, _ = await asyncio.wait(racers, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    racer, racer_stream, racer_started = racers.pop(future)
+                    try:
+                        event = future.result()
+                    except StopAsyncIteration:
+                        racer.health.record_success(time.monotonic() - racer_started)
+                        return _empty(), None, None
+                    except Exception as e:
+                        if not should_fail_over(e):
+                            raise
+                        if is_throttle(e):
+                            self.limiter.record_throttle()
+                        racer.health.record_failure(e)
+                        error = e
+                        continue
+                    racer.health.record_success(time.monotonic() - racer_started)
+                    if hedge is not None and racer is hedge:
+                        metrics.incr("failover.hedge_wins")
+                    return racer_stream, event, None
+            return None, None, error
+        finally:
+            for future, (racer, racer_stream, racer_started) in racers.items():
+                # A racer that lost a hedge took at least this long
+                racer.health.observe(time.monotonic() - racer_started)
+                future.cancel()
+                asyncio.ensure_future(_close(racer_stream))
+
+
+async def _empty():
+    return
+    yield
+
+
+async def _close(stream) -> None:
+    try:
+        await stream.aclose()
+    except Exception:
+        pass
@@ -0,0 +1,62 @@
+"""Short-lived results of runtime invocations, keyed by session and idempotency key.
+
+Client retries, Streamlit reruns and hedged calls re-send the same user
+message with the same ``idempotency_key``. The first invocation runs the
+agent; a duplicate arriving while it is still running waits for the same
+run, and one arriving afterwards gets the stored answer for
+``IDEMPOTENCY_TTL_SECONDS``. Either way the model runs and the memory events
+are written once.
+
+The store is per process, which matches AgentCore routing every call of a
+session to the same microVM. Counts are exported as
+``idempotency.{runs,replayed}``; duplicates that joined a running call show
+up as ``singleflight.idempotency.coalesced``.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from core import metrics
+from core.config import IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_TTL_SECONDS
+from core.singleflight import AsyncSingleFlight
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_SECONDS, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._results: OrderedDict = OrderedDict()  # key -> (expires_at, result)
+        self._runs = AsyncSingleFlight("idempotency")
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._results[key]
+            return None
+        return entry[1]
+
+    def put(self, key: Hashable, result: Any) -> None:
+        self._results[key] = (time.monotonic() + self.ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                 keep: Callable[[Any], bool] = lambda result: True) -> Any:
+        """Run ``fn`` once per key; store results accepted by ``keep``."""
+        stored = self.get(key)
+        if stored is not None:
+            metrics.incr("idempotency.replayed")
+            return stored
+
+        async def run_and_store():
+            metrics.incr("idempotency.runs")
+            result = await fn()
+            if result is not None and keep(result):
+                self.put(key, result)
+            return result
+
+        return await self._runs.do(key, run_and_store)
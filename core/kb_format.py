@@ -0,0 +1,113 @@
+"""Rendering of knowledge base search results for the model.
+
+``KB_RESULT_FORMAT`` selects one of three renderings of the same hits:
+
+``compact`` (default): one source table per response, then each hit as a
+header line with its source alias and relevance, the ``Chunk:`` tag and the
+text::
+
+    Fonti: S1=manuali/successioni.pdf; S2=codice_civile.txt
+
+    [1] S1 0.87
+    Chunk: 3f2a9c0b1d2e
+    <testo>
+
+    [2] S1 0.80 già riportato (Chunk 5be01d7a9c44)
+
+``json``: the same fields as one compact JSON object, for models that read
+structured tool output more reliably.
+
+``verbose``: the original English-labelled blocks with the full S3 URI
+repeated per hit, kept for comparison (``scripts/bench_tool_format.py``).
+
+Sources are shown as their key inside the bucket: the bucket is the same for
+every hit, while ``ctx.sources`` still records the full URIs. The chunk tags
+of every format are what ``chunk_refs`` finds again in the conversation.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from core.config import KB_RESULT_FORMAT
+
+FORMATS = ("compact", "json", "verbose")
+
+_CHUNK_TAGS = re.compile(r'^Chunk: ([0-9a-f]{12})$|"chunk":"([0-9a-f]{12})"', re.MULTILINE)
+
+
+@dataclass
+class Hit:
+    source: str
+    score: float
+    ref: str
+    content: Optional[str]  # None when the chunk is already in the conversation
+
+
+def chunk_refs(text: str) -> set:
+    """Refs of the chunks whose text a rendered result carries."""
+    return {a or b for a, b in _CHUNK_TAGS.findall(text or "")}
+
+
+def source_label(source: str) -> str:
+    """``s3://bucket/dir/file.pdf`` -> ``dir/file.pdf``."""
+    if source.startswith("s3://"):
+        return source[len("s3://"):].partition("/")[2] or source
+    return source
+
+
+def _aliases(hits: list) -> dict:
+    aliases = {}
+    for hit in hits:
+        aliases.setdefault(hit.source, f"S{len(aliases) + 1}")
+    return aliases
+
+
+def _verbose(hits: list) -> str:
+    blocks = []
+    for i, hit in enumerate(hits, 1):
+        text = f"Result {i} (Relevance: {hit.score:.2f})\n"
+        text += f"Source: {hit.source}\n"
+        if hit.content is None:
+            text += f"Content: già riportato in un risultato precedente di questa conversazione (Chunk {hit.ref})\n"
+        else:
+            text += f"Chunk: {hit.ref}\n"
+            text += f"Content: {hit.content}\n"
+        blocks.append(text)
+    return "\n---\n".join(blocks)
+
+
+def _compact(hits: list) -> str:
+    aliases = _aliases(hits)
+    lines = ["Fonti: " + "; ".join(f"{alias}={source_label(source)}" for source, alias in aliases.items())]
+    for i, hit in enumerate(hits, 1):
+        header = f"[{i}] {aliases[hit.source]} {hit.score:.2f}"
+        if hit.content is None:
+            lines.append(f"\n{header} già riportato (Chunk {hit.ref})")
+        else:
+            lines.append(f"\n{header}\nChunk: {hit.ref}\n{hit.content}")
+    return "\n".join(lines)
+
+
+def _json(hits: list) -> str:
+    aliases = _aliases(hits)
+    results = []
+    for hit in hits:
+        result = {"src": aliases[hit.source], "score": round(hit.score, 2)}
+        if hit.content is None:
+            result["seen"] = hit.ref
+        else:
+            result["chunk"] = hit.ref
+            result["text"] = hit.content
+        results.append(result)
+    body = {"sources": {alias: source_label(source) for source, alias in aliases.items()}, "results": results}
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":"))
+
+
+def render(hits: list, fmt: str = KB_RESULT_FORMAT) -> str:
+    if fmt == "json":
+        return _json(hits)
+    if fmt == "verbose":
+        return _verbose(hits)
+    return _compact(hits)
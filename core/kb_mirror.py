@@ -0,0 +1,210 @@
+"""Local, memory-mapped mirror of the knowledge base vector index.
+
+``scripts/export_kb_mirror.py`` snapshots every chunk of the KB's S3 Vectors
+index (text, source, domain and embedding) into a directory:
+
+    manifest.json   export id, ingestion job, dimension, dtype, count
+    vectors.npy     unit-length embeddings, float32 or int8
+    scales.npy      per-row dequantization scales (int8 only)
+    chunks.jsonl    one {"key", "text", "source", "domain"} object per row
+
+With ``KB_MIRROR_ENABLED`` the knowledge base tool searches this matrix with
+a NumPy brute-force cosine scan (a few milliseconds for tens of thousands of
+chunks) instead of calling Bedrock, so only the query embedding goes over
+the network. The mirror is used only while its ingestion job is still the
+latest completed one and it is younger than ``KB_MIRROR_MAX_AGE_SECONDS``;
+otherwise searches fall back to Bedrock. When ``KB_MIRROR_S3_URI`` is set,
+runtimes download the snapshot from there into ``KB_MIRROR_PATH``. Loading,
+downloading and reading the latest ingestion job happen on a background
+thread every ``S3_REFRESH_SECONDS``; searches only read what it found last
+and use Bedrock until it has found a mirror.
+
+Domain filters match like Bedrock's ``in`` filter: chunks without a domain
+tag only match unfiltered searches.
+
+NumPy is an optional dependency (``pip install .[mirror]``); without it the
+mirror is disabled.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+import boto3
+
+from core import metrics
+from core.config import (
+    KB_MIRROR_ENABLED,
+    KB_MIRROR_MAX_AGE_SECONDS,
+    KB_MIRROR_PATH,
+    KB_MIRROR_S3_URI,
+)
+from core.domains import GENERAL
+from core.kb_version import latest_ingestion_job
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+VECTORS = "vectors.npy"
+SCALES = "scales.npy"
+CHUNKS = "chunks.jsonl"
+FILES = (MANIFEST, VECTORS, SCALES, CHUNKS)
+S3_REFRESH_SECONDS = 300
+SCAN_BLOCK_ROWS = 16384  # int8 rows dequantized at a time
+UNTAGGED = ""  # domain of chunks without a tag; no filter value matches it
+
+_s3_client = None
+_mirror = None
+_ingestion_job: Optional[str] = None  # latest completed ingestion job, read by the refresh thread
+_checked_at: Optional[float] = None
+_refresh_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def _get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client("s3")
+    return _s3_client
+
+
+class KBMirror:
+    def __init__(self, path: str):
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.vectors = np.load(os.path.join(path, VECTORS), mmap_mode="r")
+        self.scales = None
+        if self.manifest["dtype"] == "int8":
+            self.scales = np.load(os.path.join(path, SCALES))
+        with open(os.path.join(path, CHUNKS)) as f:
+            self.chunks = [json.loads(line) for line in f]
+        self.domains = np.array([c.get("domain") or UNTAGGED for c in self.chunks])
+        if len(self.chunks) != self.vectors.shape[0]:
+            raise ValueError(f"Mirror at {path} has {self.vectors.shape[0]} vectors but {len(self.chunks)} chunks")
+
+    @property
+    def fresh(self) -> bool:
+        age = time.time() - self.manifest["exported_at"]
+        return age <= KB_MIRROR_MAX_AGE_SECONDS and self.manifest["ingestion_job"] == _ingestion_job
+
+    def scores(self, query_vector) -> "np.ndarray":
+        query = np.asarray(query_vector, dtype=np.float32)
+        if self.scales is None:
+            return self.vectors @ query
+        out = np.empty(self.vectors.shape[0], dtype=np.float32)
+        for start in range(0, len(out), SCAN_BLOCK_ROWS):
+            block = self.vectors[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            out[start:start + len(block)] = block @ query
+        return out * self.scales
+
+    def search(self, query_vector, max_results: int, domain: Optional[str] = None) -> list:
+        """Top results in the shape of a Bedrock ``retrieve`` response."""
+        scores = self.scores(query_vector)
+        if domain:
+            scores = np.where(np.isin(self.domains, [domain, GENERAL]), scores, -np.inf)
+        k = min(max_results, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k else []
+        results = []
+        for i in sorted(top, key=lambda i: -scores[i]):
+            if not np.isfinite(scores[i]):
+                continue
+            chunk = self.chunks[i]
+            results.append({
+                "content": {"text": chunk["text"]},
+                "score": float(scores[i]),
+                "location": {"type": "S3", "s3Location": {"uri": chunk["source"]}},
+                "metadata": {"domain": chunk.get("domain")},
+            })
+        return results
+
+
+def quantize_int8(matrix) -> tuple:
+    """Per-row-scaled int8 copy of a float32 matrix, and its scales."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def _download(s3_uri: str, path: str) -> None:
+    """Fetch a newer snapshot from S3 into ``path``."""
+    bucket, _, prefix = s3_uri.removeprefix("s3://").partition("/")
+    prefix = prefix.rstrip("/")
+    s3 = _get_s3_client()
+    remote = json.loads(s3.get_object(Bucket=bucket, Key=f"{prefix}/{MANIFEST}")["Body"].read())
+    local_manifest = os.path.join(path, MANIFEST)
+    if os.path.exists(local_manifest):
+        with open(local_manifest) as f:
+            if json.load(f).get("export_id") == remote["export_id"]:
+                return
+    staging = f"{path}.{remote['export_id']}"
+    os.makedirs(staging, exist_ok=True)
+    for name in FILES:
+        if name == SCALES and remote["dtype"] != "int8":
+            continue
+        s3.download_file(bucket, f"{prefix}/{name}", os.path.join(staging, name))
+    # Swap the whole directory so a loaded memmap never sees a partial snapshot
+    shutil.rmtree(f"{path}.old", ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, f"{path}.old")
+    os.rename(staging, path)
+    logger.info("Downloaded KB mirror %s (%d chunks)", remote["export_id"], remote["count"])
+
+
+def _load(current: Optional[KBMirror]) -> Optional[KBMirror]:
+    """The snapshot in ``KB_MIRROR_PATH``, reusing ``current`` when unchanged."""
+    if KB_MIRROR_S3_URI:
+        try:
+            _download(KB_MIRROR_S3_URI, KB_MIRROR_PATH)
+        except Exception as e:
+            logger.warning("Could not refresh the KB mirror from %s: %s", KB_MIRROR_S3_URI, e)
+    manifest_path = os.path.join(KB_MIRROR_PATH, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return current
+    with open(manifest_path) as f:
+        export_id = json.load(f)["export_id"]
+    if current is not None and current.manifest["export_id"] == export_id:
+        return current
+    return KBMirror(KB_MIRROR_PATH)
+
+
+def _refresh() -> None:
+    global _mirror, _ingestion_job
+    _ingestion_job = latest_ingestion_job()
+    try:
+        _mirror = _load(_mirror)
+    except Exception as e:
+        logger.error("Could not load the KB mirror: %s", e)
+
+
+def _ensure_refresh() -> None:
+    """Start a background refresh when the last one is older than ``S3_REFRESH_SECONDS``."""
+    global _checked_at, _refresh_thread
+    with _lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return
+        if _checked_at is not None and time.monotonic() - _checked_at <= S3_REFRESH_SECONDS:
+            return
+        _checked_at = time.monotonic()
+        _refresh_thread = threading.Thread(target=_refresh, name="kb-mirror-refresh", daemon=True)
+        _refresh_thread.start()
+
+
+def get_mirror() -> Optional[KBMirror]:
+    """The mirror when it is enabled, loaded and fresh, else None."""
+    if not KB_MIRROR_ENABLED or np is None:
+        return None
+    _ensure_refresh()
+    mirror = _mirror
+    if mirror is None or not mirror.fresh:
+        metrics.incr("kb_mirror.stale")
+        return None
+    return mirror
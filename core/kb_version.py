@@ -0,0 +1,55 @@
+"""Version of the knowledge base content: its latest completed ingestion job.
+
+Caches that hold KB-derived data (the answer cache, the local KB mirror)
+compare against this id, so a new ingestion makes their older data stale.
+"""
+
+import logging
+import os
+import time
+
+import boto3
+
+from core.config import BEDROCK_KB_ID, BEDROCK_REGION, KB_DATA_SOURCE_ID
+
+logger = logging.getLogger(__name__)
+
+KB_VERSION_REFRESH_SECONDS = 60
+
+_bedrock_agent_client = None
+_kb_version = ("none", 0.0)
+
+
+def _get_bedrock_agent_client():
+    global _bedrock_agent_client
+    if _bedrock_agent_client is None:
+        region = BEDROCK_REGION or os.getenv("AWS_REGION", "us-east-2")
+        _bedrock_agent_client = boto3.client("bedrock-agent", region_name=region)
+    return _bedrock_agent_client
+
+
+def latest_ingestion_job() -> str:
+    """Id of the most recent completed ingestion job, refreshed at most once a minute."""
+    global _kb_version
+    version, fetched_at = _kb_version
+    if time.time() - fetched_at < KB_VERSION_REFRESH_SECONDS:
+        return version
+
+    knowledge_base_id = os.environ.get("KNOWLEDGE_BASE_ID") or BEDROCK_KB_ID
+    data_source_id = os.environ.get("KB_DATA_SOURCE_ID") or KB_DATA_SOURCE_ID
+    if knowledge_base_id and data_source_id:
+        try:
+            response = _get_bedrock_agent_client().list_ingestion_jobs(
+                knowledgeBaseId=knowledge_base_id,
+                dataSourceId=data_source_id,
+                filters=[{"attribute": "STATUS", "operator": "EQ", "values": ["COMPLETE"]}],
+                sortBy={"attribute": "STARTED_AT", "order": "DESCENDING"},
+                maxResults=1,
+            )
+            jobs = response.get("ingestionJobSummaries", [])
+            version = jobs[0]["ingestionJobId"] if jobs else "none"
+        except Exception as e:
+            logger.warning(f"Could not read KB ingestion jobs: {e}")
+
+    _kb_version = (version, time.time())
+    return version
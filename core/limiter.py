@@ -0,0 +1,238 @@
+"""Adaptive (AIMD) concurrency limits for Bedrock model and retrieve calls.
+
+Each limiter admits up to ``limit`` calls at a time. A throttling error halves
+the limit (at most once per ``cooldown`` seconds, so one burst of throttles
+counts once); every success adds ``1 / limit``, i.e. about one slot per full
+window of successful calls. Callers over the limit wait in per-actor queues
+served round-robin, so one busy actor cannot starve the others.
+
+Limits are per process: in the runtime they cover the requests served by the
+same session microVM, in scripts every call the script makes. Metrics are
+exported as ``limiter.<name>.*`` gauges and counters.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from botocore.exceptions import ClientError
+from strands.hooks import (
+    AfterInvocationEvent,
+    AfterModelCallEvent,
+    BeforeModelCallEvent,
+    HookProvider,
+    HookRegistry,
+)
+from strands.types.exceptions import ModelThrottledException
+
+from core import metrics
+from core.config import LIMITER_ENABLED, LIMITER_KB_MAX, LIMITER_MODEL_MAX
+from core.request_context import current_request, remaining_seconds
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException"}
+
+
+class LimiterTimeout(Exception):
+    """No slot became free before the caller's deadline."""
+
+
+def is_throttle(exc: BaseException) -> bool:
+    if isinstance(exc, ModelThrottledException):
+        return True
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in THROTTLING_CODES
+    return False
+
+
+@dataclass
+class _Waiter:
+    granted: bool = False
+
+
+@dataclass
+class Ticket:
+    actor: str
+    waited_ms: float
+
+
+class AdaptiveLimiter:
+    def __init__(self, name: str, max_limit: int, min_limit: int = 1, initial: Optional[int] = None,
+                 backoff: float = 0.5, cooldown: float = 1.0, enabled: bool = LIMITER_ENABLED):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self._limit = float(initial or max(min_limit, max_limit // 2))
+        self._in_flight = 0
+        self._waiting: OrderedDict[str, deque] = OrderedDict()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self, actor: str = "anonymous", timeout: Optional[float] = None) -> Ticket:
+        started = time.monotonic()
+        with self._cond:
+            if self._in_flight < self.limit and not self._waiting:
+                self._in_flight += 1
+            else:
+                waiter = _Waiter()
+                self._waiting.setdefault(actor, deque()).append(waiter)
+                self._publish()
+                while not waiter.granted:
+                    left = None if timeout is None else timeout - (time.monotonic() - started)
+                    if left is not None and left <= 0:
+                        self._remove(actor, waiter)
+                        metrics.incr(f"limiter.{self.name}.timeouts")
+                        raise LimiterTimeout(f"{self.name}: no slot within {timeout:.1f}s")
+                    self._cond.wait(left)
+            self._publish()
+        waited_ms = (time.monotonic() - started) * 1000
+        metrics.set_gauge(f"limiter.{self.name}.queue_wait_ms", waited_ms)
+        return Ticket(actor, waited_ms)
+
+    async def acquire_async(self, actor: str = "anonymous", timeout: Optional[float] = None) -> Ticket:
+        future = asyncio.ensure_future(asyncio.to_thread(self.acquire, actor, timeout))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # Hand back a slot granted after the caller went away
+            future.add_done_callback(
+                lambda f: f.cancelled() or f.exception() is not None
+                or self.release(f.result(), asyncio.CancelledError())
+            )
+            raise
+
+    def release(self, ticket: Ticket, exc: Optional[BaseException]) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if exc is not None and is_throttle(exc):
+                self._decrease()
+            elif exc is None:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._grant()
+            self._publish()
+            self._cond.notify_all()
+
+    def record_throttle(self) -> None:
+        """Count a throttle the caller recovered from without releasing its slot (e.g. by failing over)."""
+        with self._cond:
+            self._decrease()
+            self._publish()
+
+    @contextmanager
+    def slot(self, actor: Optional[str] = None):
+        """Hold a slot for the enclosed call, bounded by the request deadline."""
+        if not self.enabled:
+            yield
+            return
+        ticket = self.acquire(actor or _current_actor(), remaining_seconds())
+        try:
+            yield
+        except BaseException as e:
+            self.release(ticket, e)
+            raise
+        self.release(ticket, None)
+
+    def call(self, fn: Callable[[], Any], actor: Optional[str] = None, attempts: int = 1,
+             base_delay: float = 1.0) -> Any:
+        """Run ``fn`` in a slot, retrying throttled calls up to ``attempts`` times in total.
+
+        Retries back off exponentially from ``base_delay`` (at most 10s), and
+        not past the request deadline: the throttle is raised instead.
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                with self.slot(actor):
+                    return fn()
+            except Exception as e:
+                if attempt == attempts or not is_throttle(e):
+                    raise
+                delay = min(base_delay * 2 ** attempt, 10)
+                left = remaining_seconds()
+                if left is not None and left <= delay:
+                    raise
+                metrics.incr(f"limiter.{self.name}.retries")
+                time.sleep(delay)
+
+    def _decrease(self) -> None:
+        metrics.incr(f"limiter.{self.name}.throttled")
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self._limit = max(self.min_limit, self._limit * self.backoff)
+            self._last_decrease = now
+            logger.warning("%s throttled, concurrency limit now %d", self.name, self.limit)
+
+    def _grant(self) -> None:
+        # Round-robin over actors: the served actor goes to the back of the line
+        while self._waiting and self._in_flight < self.limit:
+            actor, queue = next(iter(self._waiting.items()))
+            del self._waiting[actor]
+            queue.popleft().granted = True
+            self._in_flight += 1
+            if queue:
+                self._waiting[actor] = queue
+
+    def _remove(self, actor: str, waiter: _Waiter) -> None:
+        queue = self._waiting.get(actor)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._waiting[actor]
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"limiter.{self.name}.limit", self.limit)
+        metrics.set_gauge(f"limiter.{self.name}.in_flight", self._in_flight)
+        metrics.set_gauge(f"limiter.{self.name}.queued", sum(len(q) for q in self._waiting.values()))
+
+
+def _current_actor() -> str:
+    ctx = current_request()
+    return ctx.actor_id if ctx else "anonymous"
+
+
+model_limiter = AdaptiveLimiter("bedrock_model", LIMITER_MODEL_MAX)
+kb_limiter = AdaptiveLimiter("kb_retrieve", LIMITER_KB_MAX)
+
+
+class ModelConcurrencyHook(HookProvider):
+    """Holds a ``model_limiter`` slot around each model call of an agent."""
+
+    def __init__(self, limiter: AdaptiveLimiter = model_limiter):
+        self.limiter = limiter
+
+    def register_hooks(self, registry: HookRegistry, **kwargs: Any) -> None:
+        if not self.limiter.enabled:
+            return
+        registry.add_callback(BeforeModelCallEvent, self._before)
+        registry.add_callback(AfterModelCallEvent, self._after)
+        registry.add_callback(AfterInvocationEvent, self._after_invocation)
+
+    async def _before(self, event: BeforeModelCallEvent) -> None:
+        event.invocation_state["limiter_ticket"] = await self.limiter.acquire_async(
+            _current_actor(), remaining_seconds()
+        )
+
+    def _after(self, event: AfterModelCallEvent) -> None:
+        ticket = event.invocation_state.pop("limiter_ticket", None)
+        if ticket is not None:
+            self.limiter.release(ticket, event.exception)
+
+    def _after_invocation(self, event: AfterInvocationEvent) -> None:
+        # A cancelled invocation (e.g. at its deadline) never reaches AfterModelCallEvent
+        ticket = event.invocation_state.pop("limiter_ticket", None)
+        if ticket is not None:
+            self.limiter.release(ticket, asyncio.CancelledError())
@@ -0,0 +1,261 @@
+"""AgentCore Memory session manager with bounded, cached long-term retrieval.
+
+Both entrypoints retrieve the actor's semantic and preference namespaces on
+every user turn before the model sees the prompt. The stock session manager
+already fans the namespaces out to threads but then waits for all of them
+with no limit. Here each namespace gets ``LTM_TIMEOUT_SECONDS``; a namespace
+that misses it is skipped and the request proceeds without it. Results are
+kept for ``LTM_CACHE_TTL_SECONDS`` per actor, namespace and query, and the
+actor's entries are dropped once new events for it have been written (after
+a write-behind flush, or after an inline write of a non-prompt message), not
+while the prompt that is about to be looked up is being appended. A fetch
+that started before such an invalidation is not cached. Since the query is
+part of the key, hits come from repeated prompts (client retries, a question
+sent again after a timeout) rather than from follow-up turns.
+
+With ``MEMORY_WRITE_BEHIND`` (the default), conversation events are handed to
+``core.memory_writer`` instead of being written inline during the turn. It
+stores several messages per event, oldest first; ``list_messages`` reads
+them back in that order, where the stock reader assumes one per event.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Optional
+
+from bedrock_agentcore.memory.integrations.strands.bedrock_converter import (
+    AgentCoreMemoryConverter,
+)
+from bedrock_agentcore.memory.integrations.strands.config import (
+    AgentCoreMemoryConfig,
+    RetrievalConfig,
+)
+from bedrock_agentcore.memory.integrations.strands.session_manager import (
+    MAX_FETCH_ALL_RESULTS,
+    AgentCoreMemorySessionManager,
+)
+from strands.hooks import MessageAddedEvent
+from strands.types.exceptions import SessionException
+
+from core import memory_writer, metrics
+from core.config import LTM_CACHE_TTL_SECONDS, LTM_TIMEOUT_SECONDS, MEMORY_WRITE_BEHIND
+from core.request_context import stage_timeout
+from core.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_CONFIG = {
+    "support/customer/{actorId}/semantic/": RetrievalConfig(top_k=3, relevance_score=0.2),
+    "support/customer/{actorId}/preferences/": RetrievalConfig(top_k=3, relevance_score=0.2),
+}
+
+_ltm_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ltm-retrieve")
+_ltm_cache: dict = {}  # (memory_id, actor_id, namespace, query) -> (expires_at, items)
+_ltm_generations: dict = {}  # (memory_id, actor_id) -> invalidation count
+_ltm_cache_lock = threading.Lock()
+
+
+def invalidate_actor(memory_id: str, actor_id: str) -> None:
+    with _ltm_cache_lock:
+        _ltm_generations[(memory_id, actor_id)] = _ltm_generations.get((memory_id, actor_id), 0) + 1
+        for key in [k for k in _ltm_cache if k[0] == memory_id and k[1] == actor_id]:
+            del _ltm_cache[key]
+
+
+def _generation(memory_id: str, actor_id: str) -> int:
+    with _ltm_cache_lock:
+        return _ltm_generations.get((memory_id, actor_id), 0)
+
+
+# Written events feed long-term extraction, so the actor's cached records may be stale
+memory_writer.buffer.on_written.append(lambda key: invalidate_actor(key[0], key[1]))
+
+
+def events_to_messages(events: list) -> list:
+    """Session messages of ``events`` (newest event first), oldest first, keeping each event's own order."""
+    messages = []
+    for event in reversed(events):
+        # The stock converter reverses everything it is given, so undo it per event
+        messages.extend(reversed(AgentCoreMemoryConverter.events_to_messages([event])))
+    return messages
+
+
+def _cached(key: tuple) -> Optional[list]:
+    with _ltm_cache_lock:
+        entry = _ltm_cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+    return None
+
+
+def _store(key: tuple, items: list, generation: int) -> None:
+    """Cache ``items`` unless the actor was invalidated after the fetch started (``generation``)."""
+    with _ltm_cache_lock:
+        if _ltm_generations.get((key[0], key[1]), 0) != generation:
+            metrics.incr("memory.ltm_cache_stale_stores")
+            return
+        _ltm_cache[key] = (time.monotonic() + LTM_CACHE_TTL_SECONDS, items)
+
+
+class LegalMemorySessionManager(AgentCoreMemorySessionManager):
+    def _retrieve_namespace(self, namespace: str, retrieval_config: RetrievalConfig, query: str) -> list:
+        memories = self.memory_client.retrieve_memories(
+            memory_id=self.config.memory_id,
+            namespace=namespace,
+            query=query,
+            top_k=retrieval_config.top_k,
+        )
+        items = []
+        for memory in memories:
+            if not isinstance(memory, dict):
+                continue
+            if memory.get("relevanceScore", retrieval_config.relevance_score) < retrieval_config.relevance_score:
+                continue
+            content = memory.get("content", {})
+            text = content.get("text", "").strip() if isinstance(content, dict) else ""
+            if text:
+                items.append(text)
+        return items
+
+    def retrieve_long_term_context(self, query: str, timeout: float = LTM_TIMEOUT_SECONDS) -> list:
+        """Retrieve all configured namespaces concurrently within ``timeout`` seconds."""
+        started = time.perf_counter()
+        cache_query = normalize_text(query)
+        generation = _generation(self.config.memory_id, self.config.actor_id)
+        context, pending = [], {}
+        for namespace, retrieval_config in (self.config.retrieval_config or {}).items():
+            resolved = namespace.format(
+                actorId=self.config.actor_id,
+                sessionId=self.config.session_id,
+                memoryStrategyId=retrieval_config.strategy_id or "",
+            )
+            key = (self.config.memory_id, self.config.actor_id, resolved, cache_query)
+            items = _cached(key)
+            if items is not None:
+                metrics.incr("memory.ltm_cache_hits")
+                context.extend(items)
+                continue
+            metrics.incr("memory.ltm_cache_misses")
+            future = _ltm_pool.submit(self._retrieve_namespace, resolved, retrieval_config, query)
+            pending[future] = (resolved, key)
+
+        if pending:
+            done, not_done = wait(pending, timeout=timeout)
+            for future in not_done:
+                metrics.incr("memory.ltm_timeouts")
+                logger.warning("LTM retrieval for %s exceeded %.1fs, continuing without it", pending[future][0], timeout)
+                # Keep the late result for a retry of this prompt
+                future.add_done_callback(
+                    lambda f, key=pending[future][1]: f.exception() is None and _store(key, f.result(), generation)
+                )
+            for future in done:
+                namespace, key = pending[future]
+                try:
+                    items = future.result()
+                except Exception as e:
+                    logger.error("Failed to retrieve memories for namespace %s: %s", namespace, e)
+                    continue
+                _store(key, items, generation)
+                context.extend(items)
+
+        metrics.set_gauge("memory.ltm_latency_ms", (time.perf_counter() - started) * 1000)
+        return context
+
+    def retrieve_customer_context(self, event: MessageAddedEvent) -> None:
+        messages = event.agent.messages
+        if not messages or messages[-1].get("role") != "user" or "toolResult" in messages[-1].get("content")[0]:
+            return None
+        if not self.config.retrieval_config:
+            return None
+
+        timeout = stage_timeout(LTM_TIMEOUT_SECONDS)
+        if timeout <= 0:
+            metrics.incr("deadline.ltm_skipped")
+            logger.warning("Skipping LTM retrieval: request deadline leaves no budget for it")
+            return None
+
+        try:
+            context = self.retrieve_long_term_context(messages[-1]["content"][0]["text"], timeout)
+            if context:
+                event.agent.messages.append(
+                    {
+                        "role": "assistant",
+                        "content": [{"text": f"<user_context>{chr(10).join(context)}</user_context>"}],
+                    }
+                )
+                logger.info("Retrieved %s customer context items", len(context))
+        except Exception as e:
+            logger.error("Failed to retrieve customer context: %s", e)
+
+    def create_message(self, session_id: str, agent_id: str, session_message, **kwargs: Any):
+        if MEMORY_WRITE_BEHIND:
+            # The buffer invalidates the actor's cache once the events are written
+            return self._enqueue_message(session_id, session_message)
+        event = super().create_message(session_id, agent_id, session_message, **kwargs)
+        # The prompt is looked up right after this write, so only later messages invalidate
+        if session_message.message.get("role") != "user":
+            invalidate_actor(self.config.memory_id, self.config.actor_id)
+        return event
+
+    def _enqueue_message(self, session_id: str, session_message) -> Optional[dict]:
+        if session_id != self.config.session_id:
+            raise SessionException(f"Session ID mismatch: expected {self.config.session_id}, got {session_id}")
+
+        messages = AgentCoreMemoryConverter.message_to_payload(session_message)
+        if not messages:
+            return None
+        # Stamp now so events keep the order they were produced in
+        original_timestamp = datetime.fromisoformat(session_message.created_at.replace("Z", "+00:00"))
+        memory_writer.buffer.enqueue(
+            memory_writer.MemoryEvent(
+                memory_id=self.config.memory_id,
+                actor_id=self.config.actor_id,
+                session_id=session_id,
+                messages=messages,
+                timestamp=self._get_monotonic_timestamp(original_timestamp),
+                blob=AgentCoreMemoryConverter.exceeds_conversational_limit(messages[0]),
+                client=self.memory_client,
+            )
+        )
+        # append_message only needs an eventId; the real one is assigned on write
+        return {
+            "memoryId": self.config.memory_id,
+            "actorId": self.config.actor_id,
+            "sessionId": session_id,
+            "eventId": f"pending#{uuid.uuid4().hex[:8]}",
+        }
+
+    def list_messages(self, session_id: str, agent_id: str, limit: Optional[int] = None,
+                      offset: int = 0, **kwargs: Any) -> list:
+        if session_id != self.config.session_id:
+            raise SessionException(f"Session ID mismatch: expected {self.config.session_id}, got {session_id}")
+        # A follow-up turn must see the events still waiting in the buffer
+        memory_writer.buffer.flush_session(self.config.memory_id, self.config.actor_id, session_id)
+        try:
+            events = self.memory_client.list_events(
+                memory_id=self.config.memory_id,
+                actor_id=self.config.actor_id,
+                session_id=session_id,
+                max_results=(limit + offset) if limit else MAX_FETCH_ALL_RESULTS,
+            )
+        except Exception as e:
+            logger.error("Failed to list messages from AgentCore Memory: %s", e)
+            return []
+        messages = events_to_messages(events)
+        return messages[offset:offset + limit] if limit is not None else messages[offset:]
+
+
+def build_session_manager(
+    memory_id: str, session_id: str, actor_id: str, region: Optional[str]
+) -> LegalMemorySessionManager:
+    config = AgentCoreMemoryConfig(
+        memory_id=memory_id,
+        session_id=str(session_id),
+        actor_id=actor_id,
+        retrieval_config=RETRIEVAL_CONFIG,
+    )
+    return LegalMemorySessionManager(config, region)
@@ -0,0 +1,269 @@
+"""Write-behind buffer for AgentCore Memory conversation events.
+
+The stock session manager calls ``create_event`` inline for every message the
+agent appends, so each turn pays two or more Memory round trips before the
+response is returned. ``LegalMemorySessionManager`` instead enqueues the
+converted payload here and a background thread writes it.
+
+Events are queued per session. A flush combines the session's pending
+messages into one ``create_event`` call (up to ``MAX_EVENT_MESSAGES``
+payload items; oversized messages still go as one blob event each), so a
+turn's prompt, tool calls and answer cost one Memory write instead of one
+per message. Flushes run on ``MEMORY_WRITE_FLUSH_SECONDS`` ticks or as soon
+as the runtime calls ``request_flush()`` after sending a response.
+Reads for a session (``list_messages``) first flush that session
+synchronously, so a follow-up turn always sees the previous one. Pending
+events are flushed at interpreter exit. Callbacks in ``on_written`` get the
+session key after each batch is written.
+
+``MEMORY_WRITE_BACKEND=local`` swaps the AgentCore API for an in-process
+store, optionally mirrored to ``MEMORY_WRITE_LOCAL_PATH`` as JSONL, for
+offline runs.
+"""
+
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Optional
+
+from core import metrics
+from core.config import (
+    MEMORY_WRITE_BACKEND,
+    MEMORY_WRITE_FLUSH_SECONDS,
+    MEMORY_WRITE_LOCAL_PATH,
+    MEMORY_WRITE_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_FLUSH_SECONDS = 10.0
+MAX_EVENT_MESSAGES = 100  # CreateEvent payload limit
+
+
+@dataclass
+class MemoryEvent:
+    memory_id: str
+    actor_id: str
+    session_id: str
+    messages: list  # (text, role) tuples from AgentCoreMemoryConverter
+    timestamp: datetime
+    blob: bool = False  # payload exceeds the conversational size limit
+    client: Any = None  # MemoryClient of the session manager that produced it
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+class AgentCoreBackend:
+    """Writes events with the same calls the stock session manager uses."""
+
+    def write(self, event: MemoryEvent) -> None:
+        if not event.blob:
+            event.client.create_event(
+                memory_id=event.memory_id,
+                actor_id=event.actor_id,
+                session_id=event.session_id,
+                messages=event.messages,
+                event_timestamp=event.timestamp,
+            )
+        else:
+            event.client.gmdp_client.create_event(
+                memoryId=event.memory_id,
+                actorId=event.actor_id,
+                sessionId=event.session_id,
+                payload=[{"blob": json.dumps(event.messages[0])}],
+                eventTimestamp=event.timestamp,
+            )
+
+
+class LocalBackend:
+    """In-process event store for offline runs, optionally mirrored to JSONL."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.events: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def write(self, event: MemoryEvent) -> None:
+        record = {
+            "memoryId": event.memory_id,
+            "actorId": event.actor_id,
+            "sessionId": event.session_id,
+            "eventTimestamp": event.timestamp.isoformat(),
+            "messages": [list(m) for m in event.messages],
+            "blob": event.blob,
+        }
+        with self._lock:
+            self.events.setdefault((event.memory_id, event.actor_id, event.session_id), []).append(record)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+
+def _build_backend():
+    if MEMORY_WRITE_BACKEND == "local":
+        return LocalBackend(MEMORY_WRITE_LOCAL_PATH)
+    return AgentCoreBackend()
+
+
+class WriteBehindBuffer:
+    def __init__(self, backend, flush_seconds: float = MEMORY_WRITE_FLUSH_SECONDS,
+                 max_retries: int = MEMORY_WRITE_MAX_RETRIES):
+        self.backend = backend
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self._queues: OrderedDict[tuple, deque] = OrderedDict()
+        self._session_locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.on_written: list = []  # callables taking the (memory_id, actor_id, session_id) key
+
+    @staticmethod
+    def session_key(memory_id: str, actor_id: str, session_id: str) -> tuple:
+        return (memory_id, actor_id, session_id)
+
+    def enqueue(self, event: MemoryEvent) -> None:
+        key = self.session_key(event.memory_id, event.actor_id, event.session_id)
+        with self._lock:
+            self._queues.setdefault(key, deque()).append(event)
+            self._session_locks.setdefault(key, threading.Lock())
+            pending = sum(len(q) for q in self._queues.values())
+        metrics.incr("memory.write.enqueued")
+        metrics.set_gauge("memory.write.pending", pending)
+        self._ensure_worker()
+
+    def request_flush(self) -> None:
+        """Wake the worker now instead of waiting for the next tick."""
+        self._wakeup.set()
+
+    def flush_session(self, memory_id: str, actor_id: str, session_id: str) -> bool:
+        """Synchronously write everything pending for one session."""
+        return self._flush_key(self.session_key(memory_id, actor_id, session_id))
+
+    def flush_all(self, deadline: Optional[float] = None) -> bool:
+        """Write every pending session; returns False if something is left."""
+        with self._lock:
+            keys = list(self._queues)
+        ok = True
+        for key in keys:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            ok = self._flush_key(key) and ok
+        return ok
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
+
+    @staticmethod
+    def _next_batch(queue: deque) -> list:
+        """Events at the head of ``queue`` to write as one: a blob alone, else consecutive conversational ones."""
+        if queue[0].blob:
+            return [queue[0]]
+        batch, size = [], 0
+        for event in queue:
+            if event.blob or size + len(event.messages) > MAX_EVENT_MESSAGES:
+                break
+            batch.append(event)
+            size += len(event.messages)
+        return batch
+
+    @staticmethod
+    def _combine(batch: list) -> MemoryEvent:
+        first = batch[0]
+        if len(batch) == 1:
+            return first
+        return MemoryEvent(
+            memory_id=first.memory_id,
+            actor_id=first.actor_id,
+            session_id=first.session_id,
+            messages=[message for event in batch for message in event.messages],
+            timestamp=first.timestamp,
+            client=first.client,
+        )
+
+    def _flush_key(self, key: tuple) -> bool:
+        with self._lock:
+            session_lock = self._session_locks.get(key)
+        if session_lock is None:
+            return True
+        # One writer per session keeps events in timestamp order
+        with session_lock:
+            batch_started = time.monotonic()
+            written = writes = 0
+            while True:
+                with self._lock:
+                    if self._session_locks.get(key) is not session_lock:
+                        break  # drained and pruned while we waited; a new lock owns later events
+                    queue = self._queues.get(key)
+                    if not queue:
+                        # Drop the drained session so the dicts do not grow with every session
+                        self._queues.pop(key, None)
+                        self._session_locks.pop(key, None)
+                        break
+                    batch = self._next_batch(queue)
+                attempts = max(event.attempts for event in batch) + 1
+                try:
+                    self.backend.write(self._combine(batch))
+                except Exception as e:
+                    for event in batch:
+                        event.attempts = attempts
+                    metrics.incr("memory.write.failures")
+                    if attempts <= self.max_retries:
+                        logger.warning("Memory event write failed for session %s (attempt %d): %s",
+                                       key[2], attempts, e)
+                        return False
+                    logger.error("Dropping %d memory events for session %s after %d attempts: %s",
+                                 len(batch), key[2], attempts, e)
+                    metrics.incr("memory.write.dropped", len(batch))
+                with self._lock:
+                    for _ in batch:
+                        queue.popleft()
+                if batch[0].attempts <= self.max_retries:
+                    written += len(batch)
+                    writes += 1
+                    metrics.set_gauge("memory.write.lag_ms", (time.monotonic() - batch[0].enqueued_at) * 1000)
+            if written:
+                metrics.incr("memory.write.events", written)
+                metrics.incr("memory.write.calls", writes)
+                metrics.incr("memory.write.batches")
+                metrics.set_gauge("memory.write.batch_ms", (time.monotonic() - batch_started) * 1000)
+                for callback in self.on_written:
+                    callback(key)
+            metrics.set_gauge("memory.write.pending", self.pending())
+            return True
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(timeout=self.flush_seconds)
+            self._wakeup.clear()
+            try:
+                self.flush_all()
+            except Exception as e:
+                logger.error("Memory write-behind flush failed: %s", e)
+
+
+buffer = WriteBehindBuffer(_build_backend())
+
+
+@atexit.register
+def _flush_on_shutdown() -> None:
+    pending = buffer.pending()
+    if not pending:
+        return
+    logger.info("Flushing %d pending memory events before shutdown", pending)
+    if not buffer.flush_all(deadline=time.monotonic() + SHUTDOWN_FLUSH_SECONDS):
+        logger.error("%d memory events were not written before shutdown", buffer.pending())
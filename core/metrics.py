@@ -0,0 +1,31 @@
+"""In-process counters and gauges for the agent and runtime.
+
+Values live for the lifetime of the process (one AgentCore microVM or the
+Streamlit container) and are read back with ``snapshot()``.
+"""
+
+import threading
+
+_lock = threading.Lock()
+_counters: dict[str, float] = {}
+_gauges: dict[str, float] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def counter(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
@@ -0,0 +1,91 @@
+"""Bedrock model and system prompt construction shared by the local agent and
+the AgentCore runtime."""
+
+from typing import Optional
+
+from botocore.config import Config as BotocoreConfig
+from strands.models import BedrockModel
+
+from core.config import BEDROCK_FAILOVER_TARGETS, BEDROCK_HEDGE_DELAY_MS, BEDROCK_PROMPT_CACHING
+from core.failover import FailoverModel, Target, parse_targets
+
+# Model families that accept Converse cachePoint blocks. Nova caches the
+# system prompt only; Claude also caches the tool definitions.
+_SYSTEM_CACHE_MODELS = (
+    "anthropic.claude-3-5-haiku",
+    "anthropic.claude-3-7-sonnet",
+    "anthropic.claude-sonnet-4",
+    "anthropic.claude-opus-4",
+    "anthropic.claude-haiku-4-5",
+    "amazon.nova-",
+)
+_TOOL_CACHE_MODELS = tuple(m for m in _SYSTEM_CACHE_MODELS if m.startswith("anthropic."))
+
+
+def _matches(model_id: str, families: tuple) -> bool:
+    return any(family in (model_id or "") for family in families)
+
+
+def supports_prompt_caching(model_id: str) -> bool:
+    if BEDROCK_PROMPT_CACHING in ("true", "1", "on"):
+        return True
+    if BEDROCK_PROMPT_CACHING in ("false", "0", "off"):
+        return False
+    return _matches(model_id, _SYSTEM_CACHE_MODELS)
+
+
+def supports_tool_caching(model_id: str) -> bool:
+    return supports_prompt_caching(model_id) and (
+        BEDROCK_PROMPT_CACHING in ("true", "1", "on") or _matches(model_id, _TOOL_CACHE_MODELS)
+    )
+
+
+def build_bedrock_model(
+    model_id: str,
+    region: str,
+    temperature: float = 0.3,
+    read_timeout: Optional[float] = None,
+    failover: bool = False,
+):
+    """Create the Bedrock model, marking tool specs as a cacheable prefix when supported.
+
+    ``read_timeout`` bounds each wait on the Bedrock stream, e.g. to a request
+    deadline. With ``failover`` and ``BEDROCK_FAILOVER_TARGETS`` configured, the
+    model is wrapped in a ``FailoverModel`` over this model and the targets.
+    """
+    alternatives = parse_targets(BEDROCK_FAILOVER_TARGETS) if failover else []
+    if alternatives:
+        targets = [
+            Target(f"{target_region}/{target_model_id}",
+                   build_bedrock_model(target_model_id, target_region, temperature, read_timeout))
+            for target_region, target_model_id in [(region, model_id)] + alternatives
+        ]
+        return FailoverModel(targets, hedge_delay=BEDROCK_HEDGE_DELAY_MS / 1000)
+
+    kwargs = {}
+    if supports_tool_caching(model_id):
+        kwargs["cache_tools"] = "default"
+    if read_timeout is not None:
+        kwargs["boto_client_config"] = BotocoreConfig(
+            read_timeout=max(1, int(read_timeout)),
+            connect_timeout=min(10, max(1, int(read_timeout))),
+            retries={"mode": "standard", "max_attempts": 2},
+        )
+
+    return BedrockModel(
+        model_id=model_id,
+        temperature=temperature,
+        region_name=region,
+        **kwargs,
+    )
+
+
+def build_system_prompt(text: str, model_id: str):
+    """Return the system prompt, followed by a cache point when the model supports it.
+
+    Bedrock silently skips cache points whose prefix is below the model's
+    minimum cacheable length, so this is safe for short prompts too.
+    """
+    if not supports_prompt_caching(model_id):
+        return text
+    return [{"text": text}, {"cachePoint": {"type": "default"}}]
@@ -1,8 +1,23 @@
 import base64
+import json
+import logging
 import os
 
+from opentelemetry import trace as otel_trace
+
+from core import metrics
 from core.config import LANGFUSE_HOST, LANGFUSE_PUBLIC_KEY, LANGFUSE_SECRET_KEY
 
+logger = logging.getLogger(__name__)
+
+# Strands accumulated_usage keys -> names used in logs, metrics and span attributes
+_USAGE_FIELDS = {
+    "inputTokens": "input_tokens",
+    "outputTokens": "output_tokens",
+    "cacheReadInputTokens": "cache_read_input_tokens",
+    "cacheWriteInputTokens": "cache_write_input_tokens",
+}
+
 
 def configure_langfuse_otel() -> bool:
     """Configure OTEL exporter env vars for Langfuse if keys are present.
@@ -21,3 +36,25 @@ def configure_langfuse_otel() -> bool:
     os.environ.setdefault("OTEL_EXPORTER_OTLP_HEADERS", f"Authorization=Basic {auth_token}")
     os.environ.setdefault("DISABLE_ADOT_OBSERVABILITY", "true")
     return True
+
+
+def record_usage(result) -> dict:
+    """Record token usage of one agent invocation, including prompt cache reads/writes.
+
+    Usage is logged, added to the process counters and set on the current
+    OTEL span so it shows up on the request's Langfuse trace.
+    """
+    usage = getattr(getattr(result, "metrics", None), "accumulated_usage", None) or {}
+    fields = {name: int(usage.get(key, 0) or 0) for key, name in _USAGE_FIELDS.items()}
+
+    metrics.incr("bedrock.requests")
+    for name, value in fields.items():
+        metrics.incr(f"bedrock.{name}", value)
+
+    span = otel_trace.get_current_span()
+    if span and span.is_recording():
+        for name, value in fields.items():
+            span.set_attribute(f"bedrock.usage.{name}", value)
+
+    logger.info("Bedrock usage: %s", json.dumps(fields))
+    return fields
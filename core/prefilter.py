@@ -0,0 +1,226 @@
+"""Local out-of-domain prefilter that answers trivial prompts without the LLM.
+
+A multinomial Naive Bayes model over normalized unigrams and bigrams labels
+each prompt as ``legal``, ``greeting``, ``thanks`` or ``off_topic``. Prompts
+with a non-legal label above ``PREFILTER_THRESHOLD`` are answered from
+templates before any agent, memory or KB work happens. Prompts using any
+term of the legal lexicon (``core.domains``: domain, notarial and drafting
+terms) or citing an article are always treated as legal, and a greeting or
+thanks is answered from its template only when the prompt contains nothing
+but small talk.
+
+``PREFILTER_MODE`` is ``off``, ``shadow`` (classify and log only) or
+``enforce``. The model is read from ``PREFILTER_MODEL_PATH`` when present
+(see ``scripts/train_prefilter.py``); otherwise it is trained at import time
+from the seed examples below, which takes a few milliseconds. No trained
+model ships with the repo and the seeds are too few to block users on, so
+``enforce`` needs a model trained with the script at
+``PREFILTER_MODEL_PATH``; without one it runs as ``shadow``.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from core import domains, metrics
+from core.config import PREFILTER_MODE, PREFILTER_MODEL_PATH, PREFILTER_THRESHOLD
+from core.router import query_features
+from core.text import tokenize
+
+logger = logging.getLogger(__name__)
+
+LEGAL = "legal"
+SMALLTALK_LABELS = ("greeting", "thanks")
+
+TEMPLATES = {
+    "greeting": (
+        "Buongiorno! Sono un assistente giuridico specializzato in diritto notarile "
+        "italiano. Posso aiutarla su regime patrimoniale della famiglia, successioni e "
+        "donazioni, contratti e obbligazioni. Qual è la sua domanda?"
+    ),
+    "thanks": (
+        "Prego! Se ha altre domande su diritto notarile, successioni, regime "
+        "patrimoniale della famiglia o contratti, sono a disposizione."
+    ),
+    "off_topic": (
+        "Mi dispiace, posso rispondere solo a domande di diritto notarile italiano: "
+        "regime patrimoniale della famiglia, successioni e donazioni, contratti e "
+        "obbligazioni. Provi a riformulare la domanda in questo ambito."
+    ),
+}
+
+SEED_EXAMPLES = {
+    LEGAL: [
+        "differenza tra comunione legale e separazione dei beni",
+        "quali beni entrano nella comunione legale",
+        "come si costituisce un fondo patrimoniale",
+        "chi sono i legittimari nella successione",
+        "cos'è la collazione delle donazioni",
+        "quando è nullo un testamento olografo",
+        "come funziona la successione legittima",
+        "quali sono i requisiti di validità del contratto",
+        "differenza tra risoluzione e rescissione del contratto",
+        "cosa succede in caso di inadempimento dell'obbligazione",
+        "la donazione di beni futuri è valida",
+        "si può rinunciare all'eredità",
+        "quali sono gli effetti della separazione personale sul regime patrimoniale",
+        "come si calcola la quota di legittima del coniuge",
+        "il preliminare di vendita deve avere forma scritta",
+        "quanto costa un notaio per un rogito",
+        "quanto costa aprire una successione",
+        "quali sono le spese notarili per comprare casa",
+        "ho una domanda su un mutuo",
+    ],
+    "greeting": [
+        "ciao", "salve", "buongiorno", "buonasera", "ciao come stai",
+        "hello", "hi there", "buongiorno a tutti", "ehi ciao", "salve come va",
+    ],
+    "thanks": [
+        "grazie", "grazie mille", "ok grazie", "perfetto grazie", "ti ringrazio",
+        "thanks", "thank you", "grazie per l'aiuto", "molto chiaro grazie", "va bene grazie",
+    ],
+    "off_topic": [
+        "che tempo fa domani a milano",
+        "dammi una ricetta per la carbonara",
+        "chi ha vinto la partita di ieri",
+        "scrivi una poesia sul mare",
+        "come installo python sul mio computer",
+        "che ore sono",
+        "raccontami una barzelletta",
+        "qual è la capitale della francia",
+        "consigliami un film da vedere stasera",
+        "come si fa a dimagrire velocemente",
+        "traduci questa frase in inglese",
+        "quanto costa un biglietto del treno per roma",
+    ],
+}
+
+
+@dataclass
+class PrefilterDecision:
+    label: str
+    confidence: float
+    elapsed_us: float
+    answer: Optional[str] = None  # template answer when the prompt is short-circuited
+
+
+def _features(text: str) -> list:
+    tokens = tokenize(text)
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def train(examples: dict, alpha: float = 0.1) -> dict:
+    """Fit a multinomial Naive Bayes model; returns a JSON-serializable dict."""
+    total_docs = sum(len(texts) for texts in examples.values())
+    vocab = set()
+    counts = {}
+    for label, texts in examples.items():
+        label_counts = counts.setdefault(label, {})
+        for text in texts:
+            for feature in _features(text):
+                label_counts[feature] = label_counts.get(feature, 0) + 1
+                vocab.add(feature)
+
+    model = {"priors": {}, "likelihoods": {}, "unknown": {}}
+    for label, texts in examples.items():
+        label_counts = counts[label]
+        denominator = sum(label_counts.values()) + alpha * (len(vocab) + 1)
+        model["priors"][label] = math.log(len(texts) / total_docs)
+        model["likelihoods"][label] = {
+            feature: math.log((count + alpha) / denominator)
+            for feature, count in label_counts.items()
+        }
+        model["unknown"][label] = math.log(alpha / denominator)
+    return model
+
+
+def _trained_model_path() -> Optional[str]:
+    if PREFILTER_MODEL_PATH and os.path.exists(PREFILTER_MODEL_PATH):
+        return PREFILTER_MODEL_PATH
+    return None
+
+
+def _load_model() -> dict:
+    path = _trained_model_path()
+    if path:
+        with open(path) as f:
+            return json.load(f)
+    return train(SEED_EXAMPLES)
+
+
+_mode = PREFILTER_MODE
+if _mode == "enforce" and not _trained_model_path():
+    logger.warning("PREFILTER_MODE=enforce needs a trained model at %s; running in shadow mode", PREFILTER_MODEL_PATH)
+    _mode = "shadow"
+_model = _load_model() if _mode != "off" else None
+
+
+def predict(text: str, model: Optional[dict] = None) -> tuple:
+    """Return (label, confidence) for ``text``."""
+    model = model or _model
+    # Features never seen in training carry no evidence; scoring them would
+    # favour the classes with the smallest vocabulary.
+    features = [
+        f for f in _features(text)
+        if any(f in likelihoods for likelihoods in model["likelihoods"].values())
+    ]
+    if not features:
+        return LEGAL, 0.0
+    scores = {}
+    for label, prior in model["priors"].items():
+        likelihoods = model["likelihoods"][label]
+        unknown = model["unknown"][label]
+        scores[label] = prior + sum(likelihoods.get(f, unknown) for f in features)
+    best = max(scores, key=scores.get)
+    norm = sum(math.exp(s - scores[best]) for s in scores.values())
+    return best, 1.0 / norm
+
+
+def _only_smalltalk(prompt: str, label: str, model: Optional[dict] = None) -> bool:
+    """Every word of ``prompt`` is one the model has seen for ``label``."""
+    likelihoods = (model or _model)["likelihoods"][label]
+    return all(token in likelihoods for token in tokenize(prompt))
+
+
+def check(prompt: str) -> Optional[PrefilterDecision]:
+    """Classify ``prompt``; the decision carries a template answer only in enforce mode."""
+    if _model is None:
+        return None
+
+    started = time.perf_counter()
+    features = query_features(prompt)
+    if features["article_refs"] or domains.mentions_legal_terms(prompt):
+        label, confidence = LEGAL, 1.0
+    else:
+        label, confidence = predict(prompt)
+    elapsed_us = (time.perf_counter() - started) * 1_000_000
+
+    short_circuit = label != LEGAL and confidence >= PREFILTER_THRESHOLD
+    if label in SMALLTALK_LABELS and not _only_smalltalk(prompt, label):
+        # "Buongiorno, vorrei sapere se..." is a question, not a greeting
+        short_circuit = False
+    decision = PrefilterDecision(label, round(confidence, 4), round(elapsed_us, 1))
+    if short_circuit and _mode == "enforce":
+        decision.answer = TEMPLATES[label]
+
+    metrics.incr(f"prefilter.{_mode}.{label if short_circuit else LEGAL}")
+    logger.info(
+        json.dumps(
+            {
+                "event": "prefilter_decision",
+                "mode": _mode,
+                "query_sha": hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12],
+                "words": features["words"],
+                "label": label,
+                "confidence": decision.confidence,
+                "short_circuit": short_circuit,
+                "elapsed_us": decision.elapsed_us,
+            }
+        )
+    )
+    return decision
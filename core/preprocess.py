@@ -0,0 +1,350 @@
+"""Local preprocessing of documents before they are uploaded to the KB.
+
+Bedrock parses and embeds whatever lands in the data bucket, including
+running headers and footers, tables of contents and documents uploaded
+twice. Uploads (Streamlit sidebar or ``scripts/preprocess_kb_documents.py``)
+go through ``DocumentIndex.preprocess`` instead, which:
+
+- extracts the text (DOCX with the standard library, PDF with the optional
+  ``pypdf``; other files and PDFs without it are uploaded unchanged);
+- drops page numbers, table-of-contents entries and the lines repeated
+  among the first or last ``EDGE_LINES`` lines of most pages (running headers
+  and footers; article headings are always kept), and re-joins hyphenated
+  words;
+- skips documents whose text is identical, or MinHash-similar above
+  ``KB_NEAR_DUPLICATE_THRESHOLD``, to one already in the bucket (a revised
+  version of a long document is usually near-duplicate: pass
+  ``keep_near_duplicates`` to upload it anyway);
+- drops paragraphs repeated verbatim within the same document.
+
+Paragraphs shared with other documents are kept: a clause stripped from one
+document because another holds it would vanish from the KB when that other
+document is deleted.
+
+The normalized text is uploaded as ``<name>.txt`` (``contratto.pdf`` ->
+``contratto.pdf.txt``), so files differing only in extension do not
+collide. ``bucket_index`` builds the index of documents from the bucket's
+text files, keeps it for the process and rebuilds it every
+``INDEX_REFRESH_SECONDS``. Callers add
+documents as they upload them and remove them as they delete them.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+import zipfile
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Optional
+from xml.etree import ElementTree
+
+from core import metrics
+from core.chunking import ARTICLE_HEADING, estimate_tokens
+from core.config import KB_NEAR_DUPLICATE_THRESHOLD
+from core.domains import is_sidecar
+from core.text import normalize_text, tokenize
+
+try:
+    import pypdf
+except ImportError:  # optional dependency
+    pypdf = None
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs above ~0.5 similarity become candidates
+SHINGLE_WORDS = 5
+MIN_PARAGRAPH_WORDS = 8  # shorter repeated paragraphs (titles, headings) are kept as they are
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_MIN_SHARE = 0.5
+BOILERPLATE_MAX_WORDS = 15
+EDGE_LINES = 3  # lines at the top and bottom of a page that can be headers or footers
+TEXT_SUFFIXES = (".txt", ".md")
+INDEX_REFRESH_SECONDS = 600  # picks up documents uploaded by other processes
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240501)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_indexes: dict[str, tuple] = {}
+_indexes_lock = threading.Lock()
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_PAGE_NUMBER = re.compile(r"^\W*(?:pag(?:ina)?\.?\s*)?\d+(?:\s*(?:di|/|of)\s*\d+)?\W*$", re.IGNORECASE)
+_TOC_ENTRY = re.compile(r"(?:\.{4,}|…{2,}|_{4,})\s*\d+\s*$")
+# Page numbers inside a header line ("Codice civile - pag. 12 di 40", "Manuale 12")
+_PAGE_REFERENCE = re.compile(
+    r"\b(?:pag(?:ina)?|page|p)\.?\s*\d+(?:\s*(?:di|/|of)\s*\d+)?\b|\b\d+\s*(?:di|/|of)\s*\d+\b|^\d+\s|\s\d+$",
+    re.IGNORECASE,
+)
+
+
+def _pdf_pages(data: bytes) -> Optional[list]:
+    if pypdf is None:
+        return None
+    return [page.extract_text() or "" for page in pypdf.PdfReader(io.BytesIO(data)).pages]
+
+
+def _docx_pages(data: bytes) -> list:
+    with zipfile.ZipFile(io.BytesIO(data)) as docx:
+        root = ElementTree.fromstring(docx.read("word/document.xml"))
+    paragraphs = ["".join(t.text or "" for t in p.iter(f"{_WORD_NS}t")) for p in root.iter(f"{_WORD_NS}p")]
+    return ["\n\n".join(paragraphs)]
+
+
+def extract_pages(name: str, data: bytes) -> Optional[list]:
+    """Text of each page (one page for non-paginated formats), or None when not extractable."""
+    suffix = os.path.splitext(name)[1].lower()
+    if suffix in TEXT_SUFFIXES:
+        # Form feeds separate pages in text exported from PDFs
+        return data.decode("utf-8", "replace").split("\f")
+    if suffix == ".docx":
+        return _docx_pages(data)
+    if suffix == ".pdf":
+        return _pdf_pages(data)
+    return None
+
+
+def _line_key(line: str) -> str:
+    # Only page numbers are folded: "Art. 177" and "Art. 179" must stay different lines
+    return normalize_text(_PAGE_REFERENCE.sub(" # ", line.strip()))
+
+
+def _edges(lines: list) -> set:
+    """Indexes of the first and last ``EDGE_LINES`` non-empty lines of a page."""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return set(filled[:EDGE_LINES] + filled[-EDGE_LINES:])
+
+
+def strip_boilerplate(pages: list) -> tuple:
+    """Paragraphs of ``pages`` without running headers/footers, page numbers and TOC lines."""
+    pages = [unicodedata.normalize("NFC", page).replace("\r", "").split("\n") for page in pages]
+    edges = [_edges(lines) for lines in pages]
+    repeated = set()
+    if len(pages) >= BOILERPLATE_MIN_PAGES:
+        seen = Counter(key for lines, edge in zip(pages, edges) for key in {_line_key(lines[i]) for i in edge})
+        repeated = {k for k, n in seen.items() if k and n / len(pages) >= BOILERPLATE_MIN_SHARE}
+
+    removed = 0
+    kept = []
+    for lines, edge in zip(pages, edges):
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped and not ARTICLE_HEADING.match(stripped) and (
+                _TOC_ENTRY.search(stripped)
+                or (i in edge and _PAGE_NUMBER.match(stripped))
+                or (
+                    i in edge
+                    and _line_key(stripped) in repeated
+                    and len(stripped.split()) <= BOILERPLATE_MAX_WORDS
+                )
+            ):
+                removed += 1
+                continue
+            kept.append(stripped)
+        kept.append("")
+
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", "\n".join(kept))
+    paragraphs = [" ".join(p.split()) for p in re.split(r"\n\s*\n", text)]
+    return [p for p in paragraphs if p], removed
+
+
+def shingles(text: str) -> set:
+    words = tokenize(text)
+    grams = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))]
+    return {int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams}
+
+
+def minhash(text: str) -> tuple:
+    values = shingles(text)
+    return tuple(min((a * x + b) % _PRIME for x in values) for a, b in _PERMUTATIONS)
+
+
+def similarity(a: tuple, b: tuple) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class _LSH:
+    """Exact-hash and MinHash band lookup of signatures by key."""
+
+    def __init__(self):
+        self.hashes: dict[str, object] = {}
+        self.key_hashes: dict[object, str] = {}
+        self.signatures: dict[object, tuple] = {}
+        self.buckets: dict[tuple, set] = defaultdict(set)
+
+    def _bands(self, signature: tuple) -> list:
+        rows = NUM_PERM // BANDS
+        return [(i, signature[i * rows:(i + 1) * rows]) for i in range(BANDS)]
+
+    def add(self, key, content_hash: str, signature: tuple) -> None:
+        self.hashes.setdefault(content_hash, key)
+        self.key_hashes[key] = content_hash
+        self.signatures[key] = signature
+        for band in self._bands(signature):
+            self.buckets[band].add(key)
+
+    def remove(self, key) -> None:
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band in self._bands(signature):
+            self.buckets[band].discard(key)
+        content_hash = self.key_hashes.pop(key)
+        if self.hashes.get(content_hash) == key:
+            del self.hashes[content_hash]
+
+    def match(self, content_hash: str, signature: tuple, threshold: float) -> tuple:
+        """(key, similarity) of an exact or near duplicate, else (None, 0.0)."""
+        if content_hash in self.hashes:
+            return self.hashes[content_hash], 1.0
+        candidates = set().union(*(self.buckets.get(band, ()) for band in self._bands(signature)))
+        best, best_similarity = None, 0.0
+        for key in candidates:
+            value = similarity(signature, self.signatures[key])
+            if value >= threshold and value > best_similarity:
+                best, best_similarity = key, value
+        return best, best_similarity
+
+
+@dataclass
+class PreprocessResult:
+    name: str
+    key: str  # object key to upload to
+    body: bytes  # what to upload (the original file when passed through)
+    text: str = ""
+    status: str = "new"  # new | duplicate | near_duplicate | passthrough
+    duplicate_of: Optional[str] = None
+    similarity: float = 0.0
+    original_bytes: int = 0
+    raw_tokens: int = 0  # estimated tokens Bedrock would have embedded
+    tokens: int = 0
+    boilerplate_lines: int = 0
+    duplicate_paragraphs: int = 0
+
+    @property
+    def skipped(self) -> bool:
+        return self.status in ("duplicate", "near_duplicate")
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.raw_tokens if self.skipped else self.raw_tokens - self.tokens
+
+    def summary(self) -> str:
+        if self.status == "passthrough":
+            return f"{self.name}: uploaded unchanged (no text extraction for this format)"
+        if self.skipped:
+            kind = "duplicate" if self.status == "duplicate" else "near-duplicate"
+            return f"{self.name}: skipped, {kind} of {self.duplicate_of} (similarity {self.similarity:.2f})"
+        share = self.tokens_saved / self.raw_tokens if self.raw_tokens else 0.0
+        text = (
+            f"{self.name} -> {self.key}: ~{self.raw_tokens} -> ~{self.tokens} tokens ({share:.0%} less), "
+            f"{self.boilerplate_lines} boilerplate lines and {self.duplicate_paragraphs} repeated paragraphs removed"
+        )
+        if self.duplicate_of:
+            text += f", kept although similar to {self.duplicate_of} ({self.similarity:.2f})"
+        return text
+
+
+def output_key(name: str) -> str:
+    """Object key of the normalized text of ``name``; keeps the original extension."""
+    return name if name.lower().endswith(TEXT_SUFFIXES) else f"{name}.txt"
+
+
+class DocumentIndex:
+    """Documents already in the bucket, for duplicate detection."""
+
+    def __init__(self, threshold: float = KB_NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.documents = _LSH()
+
+    def add(self, key: str, text: str) -> None:
+        self.remove(key)
+        self.documents.add(key, _content_hash(text), minhash(text))
+
+    def remove(self, key: str) -> None:
+        self.documents.remove(key)
+
+    def preprocess(self, name: str, data: bytes, keep_near_duplicates: bool = False) -> PreprocessResult:
+        """Normalized text of ``name`` for upload; does not index it (call ``add`` once uploaded).
+
+        With ``keep_near_duplicates`` only exact duplicates are skipped; a
+        near-duplicate is processed as new and keeps ``duplicate_of``.
+        """
+        key = output_key(name)
+        result = PreprocessResult(name=name, key=key, body=data, original_bytes=len(data))
+        try:
+            pages = extract_pages(name, data)
+        except Exception as e:
+            logger.warning("Could not extract text from %s: %s", name, e)
+            pages = None
+        if pages is None:
+            result.key, result.status = name, "passthrough"
+            metrics.incr("kb_preprocess.passthrough")
+            return result
+
+        result.raw_tokens = estimate_tokens("\n".join(pages))
+        paragraphs, result.boilerplate_lines = strip_boilerplate(pages)
+        text = "\n\n".join(paragraphs)
+        metrics.incr("kb_preprocess.documents")
+
+        # A re-upload under the same key replaces that document, so it is not its own duplicate
+        duplicate, value = self.documents.match(_content_hash(text), minhash(text), self.threshold)
+        if duplicate is not None and duplicate != key:
+            result.duplicate_of, result.similarity = duplicate, value
+            if value == 1.0 or not keep_near_duplicates:
+                result.status = "duplicate" if value == 1.0 else "near_duplicate"
+                metrics.incr(f"kb_preprocess.{result.status}s")
+                metrics.incr("kb_preprocess.tokens_saved", result.tokens_saved)
+                return result
+
+        kept, seen = [], set()
+        for paragraph in paragraphs:
+            if len(paragraph.split()) >= MIN_PARAGRAPH_WORDS:
+                content_hash = _content_hash(paragraph)
+                if content_hash in seen:
+                    result.duplicate_paragraphs += 1
+                    continue
+                seen.add(content_hash)
+            kept.append(paragraph)
+
+        result.text = "\n\n".join(kept)
+        result.body = result.text.encode("utf-8")
+        result.tokens = estimate_tokens(result.text)
+        metrics.incr("kb_preprocess.duplicate_paragraphs", result.duplicate_paragraphs)
+        metrics.incr("kb_preprocess.tokens_saved", result.tokens_saved)
+        return result
+
+
+def index_bucket(s3, bucket: str, threshold: float = KB_NEAR_DUPLICATE_THRESHOLD) -> DocumentIndex:
+    """Index the text documents already in ``bucket``."""
+    index = DocumentIndex(threshold)
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            if is_sidecar(key) or not key.lower().endswith(TEXT_SUFFIXES):
+                continue
+            body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+            # Normalized like new uploads, so older unprocessed documents still compare
+            paragraphs, _ = strip_boilerplate(extract_pages(key, body))
+            index.add(key, "\n\n".join(paragraphs))
+    return index
+
+
+def bucket_index(s3, bucket: str) -> DocumentIndex:
+    """The process-wide index of ``bucket``, rebuilt when older than ``INDEX_REFRESH_SECONDS``."""
+    with _indexes_lock:
+        built_at, index = _indexes.get(bucket, (None, None))
+        if index is None or time.monotonic() - built_at > INDEX_REFRESH_SECONDS:
+            index = index_bucket(s3, bucket)
+            _indexes[bucket] = (time.monotonic(), index)
+        return index
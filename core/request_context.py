@@ -0,0 +1,64 @@
+"""Request-scoped state shared between the agent entrypoints and tools.
+
+Strands copies the caller's context into the threads and tasks that execute
+tools, so a context started in ``invoke``/``run_agent`` is visible inside
+``search_knowledge_base``.
+"""
+
+import contextvars
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from core.config import DEADLINE_MODEL_RESERVE_SECONDS
+
+
+@dataclass
+class RequestContext:
+    session_id: str
+    actor_id: str
+    # S3 URIs of the chunks returned by search_knowledge_base in this request
+    sources: list = field(default_factory=list)
+    # Speculative retrieve started on the raw prompt (see core.tools.start_prefetch)
+    prefetch: Any = None
+    # Refs of KB chunks already in the conversation; None disables the memo
+    delivered: Optional[set] = None
+    # time.monotonic() by which the caller stops waiting; None means unbounded
+    deadline: Optional[float] = None
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_context", default=None)
+
+
+def start_request(session_id: str, actor_id: str, deadline: Optional[float] = None) -> RequestContext:
+    """Start a request context; ``deadline`` is a Unix timestamp from the caller."""
+    ctx = RequestContext(session_id=str(session_id), actor_id=actor_id)
+    if deadline is not None:
+        ctx.deadline = time.monotonic() + (float(deadline) - time.time())
+    _current.set(ctx)
+    return ctx
+
+
+def current_request() -> Optional[RequestContext]:
+    return _current.get()
+
+
+def remaining_seconds() -> Optional[float]:
+    """Budget left before the current request's deadline, or None if it has none."""
+    ctx = _current.get()
+    if ctx is None or ctx.deadline is None:
+        return None
+    return ctx.deadline - time.monotonic()
+
+
+def stage_timeout(limit: Optional[float] = None) -> Optional[float]:
+    """Time a lookup ahead of the model may take in the current request.
+
+    ``limit`` is capped so that ``DEADLINE_MODEL_RESERVE_SECONDS`` remain for
+    the model afterwards. A result <= 0 means the stage should be skipped.
+    """
+    remaining = remaining_seconds()
+    if remaining is None:
+        return limit
+    budget = remaining - DEADLINE_MODEL_RESERVE_SECONDS
+    return budget if limit is None else min(limit, budget)
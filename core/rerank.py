@@ -0,0 +1,112 @@
+"""Local hybrid reranking of knowledge base results.
+
+Dense retrieval ranks chunks by meaning and often misses the exact terms a
+legal question hinges on ("fondo patrimoniale", "usufrutto legale", article
+numbers). ``search_knowledge_base`` therefore over-fetches candidates from
+the vector index and reorders them here: a BM25 score over Italian-normalized
+tokens (accents folded, stopwords dropped, light plural/gender stemming) and
+their bigrams is fused with the vector score,
+
+    fused = alpha * vector + (1 - alpha) * bm25
+
+after min-max scaling both over the candidate set. Document frequencies come
+from the candidates themselves, so no corpus statistics are needed and a
+rerank of 20 chunks takes well under a millisecond per chunk.
+"""
+
+import math
+import re
+import time
+
+from core import metrics
+from core.config import KB_RERANK_ALPHA
+from core.text import tokenize
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset(
+    """a ad al all alla alle allo agli ai anche che chi ci come con cui da dal dall dalla dalle
+    dai degli dei del dell della delle dello di e ed gli ha hanno i il in io la le lo loro ma
+    mi ne nei nel nell nella nelle nello non o per piu quale quali quando questa queste questo
+    questi se si sono su sua sue sui sul sull sulla suo suoi tra un una uno essere viene
+    vengono puo possono cosa qual""".split()
+)
+
+_ARTICLE = re.compile(r"^\d+(bis|ter|quater|quinquies|sexies)?$")
+
+
+def stem(token: str) -> str:
+    """Fold Italian plural and gender endings: patrimoniale/patrimoniali -> patrimonial."""
+    if _ARTICLE.match(token) or len(token) <= 4:
+        return token
+    for suffix in ("zioni", "zione", "mente"):
+        if token.endswith(suffix):
+            return token[: -len(suffix)] + ("z" if suffix.startswith("z") else "")
+    return token[:-1] if token[-1] in "aeio" else token
+
+
+def terms(text: str) -> list:
+    """Stemmed unigrams plus adjacent bigrams, so exact phrases score higher."""
+    stems = [stem(t) for t in tokenize(text) if len(t) > 1 and t not in STOPWORDS]
+    return stems + [f"{a}_{b}" for a, b in zip(stems, stems[1:])]
+
+
+def bm25_scores(query: str, documents: list) -> list:
+    query_terms = set(terms(query))
+    doc_terms = [terms(doc) for doc in documents]
+    if not query_terms or not doc_terms:
+        return [0.0] * len(documents)
+
+    n = len(doc_terms)
+    avg_len = sum(len(t) for t in doc_terms) / n or 1.0
+    df = {term: sum(1 for t in doc_terms if term in t) for term in query_terms}
+    scores = []
+    for doc in doc_terms:
+        counts = {}
+        for term in doc:
+            if term in query_terms:
+                counts[term] = counts.get(term, 0) + 1
+        score = 0.0
+        for term, tf in counts.items():
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def _scaled(values: list) -> list:
+    low, high = min(values), max(values)
+    if high == low:
+        return [0.0] * len(values)
+    return [(v - low) / (high - low) for v in values]
+
+
+def relevance(query: str, results: list, alpha: float = KB_RERANK_ALPHA) -> list:
+    """Fused vector + BM25 score of each result, in [0, 1].
+
+    The scaled vector score alone when ``alpha`` is 1.0 or no candidate shares
+    a term with the query.
+    """
+    if not results:
+        return []
+    started = time.perf_counter()
+    vector = _scaled([r.get("score", 0.0) for r in results])
+    if alpha >= 1.0:
+        return vector
+    lexical = bm25_scores(query, [r.get("content", {}).get("text", "") for r in results])
+    if not any(lexical):
+        return vector
+    lexical = _scaled(lexical)
+    fused = [alpha * v + (1 - alpha) * b for v, b in zip(vector, lexical)]
+    metrics.set_gauge("kb_rerank.ms", (time.perf_counter() - started) * 1000)
+    return fused
+
+
+def rerank(query: str, results: list, alpha: float = KB_RERANK_ALPHA) -> list:
+    """KB retrieve results reordered by fused vector + BM25 score."""
+    if len(results) < 2:
+        return list(results)
+    scores = relevance(query, results, alpha)
+    order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)
+    return [results[i] for i in order]
@@ -0,0 +1,83 @@
+"""Offline retrieval metrics against the eval dataset's ``riferimenti``.
+
+Each dataset item lists the normative references the ideal answer relies on
+(e.g. "artt. 177, 178 c.c."). A retrieved chunk counts as relevant when it
+cites one of those article numbers; recall@k is the share of the item's
+articles cited anywhere in the top k chunks.
+"""
+
+import re
+
+_SUFFIX = r"(?:bis|ter|quater|quinquies|sexies)"
+# "ed" before "e", or "456 ed 457" would stop after the "e"
+_ARTICLES = re.compile(
+    rf"\bart(?:icol[oi]|t?\.?)\s*((?:\d+(?:[\s-]*{_SUFFIX})?(?:\s*(?:,|-|–|ed|e)\s*)?)+)",
+    re.IGNORECASE,
+)
+_NUMBER = re.compile(rf"\d+(?:[\s-]*{_SUFFIX}\b)?", re.IGNORECASE)
+_RANGE = re.compile(rf"\b(\d+)\s*[-–]\s*(\d+)\b(?![\s-]*{_SUFFIX})", re.IGNORECASE)
+MAX_RANGE = 100  # wider spans are more likely two separate citations
+
+
+def article_refs(text: str) -> set:
+    """Article numbers cited in ``text``: "artt. 177 e 179-bis c.c." -> {"177", "179bis"}.
+
+    Ranges are expanded: "artt. 565-567" -> {"565", "566", "567"}.
+    """
+    refs = set()
+    for match in _ARTICLES.finditer(text or ""):
+        for number in _NUMBER.findall(match.group(1)):
+            refs.add(re.sub(r"[\s-]", "", number).lower())
+        for first, last in _RANGE.findall(match.group(1)):
+            if 0 < int(last) - int(first) <= MAX_RANGE:
+                refs.update(str(n) for n in range(int(first), int(last) + 1))
+    return refs
+
+
+def load_eval_items(dataset_name: str) -> list:
+    """Active dataset items that cite at least one article, as dicts.
+
+    Raises ``RuntimeError`` when no Langfuse client is configured.
+    """
+    from core.langfuse_client import get_langfuse_client
+
+    langfuse = get_langfuse_client()
+    if not langfuse:
+        raise RuntimeError("Langfuse client not configured.")
+
+    items = []
+    for item in langfuse.get_dataset(dataset_name).items:
+        if getattr(item, "status", "ACTIVE") == "ARCHIVED":
+            continue
+        query = item.input.get("input", "") if isinstance(item.input, dict) else str(item.input)
+        metadata = getattr(item, "metadata", {}) or {}
+        expected = article_refs(metadata.get("riferimenti") or "")
+        if query and expected:
+            items.append({
+                "query": query,
+                "expected": expected,
+                "domain": metadata.get("domain") or "",
+                "tipologia": metadata.get("tipologia") or "",
+            })
+    return items
+
+
+def recall_at_k(expected: set, chunks: list, k: int) -> float:
+    found = set()
+    for text in chunks[:k]:
+        found |= article_refs(text) & expected
+    return len(found) / len(expected)
+
+
+def reciprocal_rank(expected: set, chunks: list) -> float:
+    for rank, text in enumerate(chunks, 1):
+        if article_refs(text) & expected:
+            return 1.0 / rank
+    return 0.0
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
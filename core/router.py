@@ -0,0 +1,134 @@
+"""Route requests between a cheaper Bedrock model and the configured one.
+
+A lexical classifier scores how complex a question is from cheap query
+features. Questions scoring below ``ROUTER_THRESHOLD`` go to the light model
+first; its answer is escalated to the configured inference profile when it
+carries no normative or doctrinal citations (small talk excepted).
+
+Every decision is logged as one JSON line (``router_decision``) with the
+features, latencies and token counts, so the threshold can be tuned offline
+against the eval dataset (see ``scripts/tune_router.py``).
+"""
+
+import hashlib
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass, field
+
+from core import metrics
+from core.config import ROUTER_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+_SMALLTALK = re.compile(
+    r"^\s*(ciao|salve|buongiorno|buonasera|grazie( mille)?|ok(ay)?|perfetto|va bene|"
+    r"hello|hi|thanks?( you)?)\b[\s!.?]*$",
+    re.IGNORECASE,
+)
+_ARTICLE_REF = re.compile(r"\bart(?:icol[oi]|t?\.)\s*\d+", re.IGNORECASE)
+_LEGAL_TERMS = re.compile(
+    r"\b(comunione|separazione|fondo patrimoniale|convenzion\w+|successi\w+|"
+    r"testament\w+|legittim\w+|donazion\w+|collazione|riduzione|usufrutto|"
+    r"contratt\w+|obbligazion\w+|risoluzione|rescissione|nullit\w+|annullabil\w+|"
+    r"inadempimento|prescrizione|decadenza|ipoteca|impresa familiare)\b",
+    re.IGNORECASE,
+)
+_REASONING_MARKERS = re.compile(
+    r"\b(differenz\w+|rapporto tra|confront\w+|nel caso in cui|qualora|se\b|"
+    r"eccezion\w+|orientament\w+|dottrina|giurisprudenza|quando|perch[eé])\b",
+    re.IGNORECASE,
+)
+# Citations the system prompt asks for: Codice Civile articles or doctrine
+_CITATION = re.compile(
+    r"\bart(?:icol[oi]|t?\.)\s*\d+|\bc\.\s?c\.|codice civile|\bcfr\.|dottrin\w+",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class RouteDecision:
+    route: str  # "light" or "default"
+    reason: str
+    score: float
+    features: dict = field(default_factory=dict)
+
+
+def query_features(query: str) -> dict:
+    words = query.split()
+    return {
+        "words": len(words),
+        "questions": query.count("?"),
+        "article_refs": len(_ARTICLE_REF.findall(query)),
+        "legal_terms": len(_LEGAL_TERMS.findall(query)),
+        "reasoning_markers": len(_REASONING_MARKERS.findall(query)),
+        "smalltalk": bool(_SMALLTALK.match(query)),
+    }
+
+
+def complexity_score(features: dict) -> float:
+    """Linear score in [0, 1]; higher means the question needs the stronger model."""
+    if features["smalltalk"]:
+        return 0.0
+    score = (
+        0.15
+        + min(features["words"], 60) / 60 * 0.3
+        + min(features["legal_terms"], 3) * 0.1
+        + min(features["reasoning_markers"], 3) * 0.1
+        + min(features["article_refs"], 2) * 0.1
+        + max(features["questions"] - 1, 0) * 0.1
+    )
+    return round(min(score, 1.0), 3)
+
+
+def classify(query: str, threshold: float = ROUTER_THRESHOLD) -> RouteDecision:
+    features = query_features(query)
+    score = complexity_score(features)
+    if features["smalltalk"]:
+        return RouteDecision("light", "smalltalk", score, features)
+    if score < threshold:
+        return RouteDecision("light", "simple", score, features)
+    return RouteDecision("default", "complex", score, features)
+
+
+def has_citations(answer: str) -> bool:
+    return bool(_CITATION.search(answer or ""))
+
+
+def needs_escalation(decision: RouteDecision, answer: str) -> bool:
+    return decision.reason != "smalltalk" and not has_citations(answer)
+
+
+def log_decision(
+    query: str,
+    decision: RouteDecision,
+    escalated: bool,
+    light_latency_ms: float = 0.0,
+    default_latency_ms: float = 0.0,
+    light_tokens: int = 0,
+    default_tokens: int = 0,
+) -> dict:
+    """Log one routing decision and update router counters."""
+    served_by = "default" if decision.route == "default" or escalated else "light"
+    metrics.incr(f"router.route.{decision.route}")
+    metrics.incr(f"router.served.{served_by}")
+    if escalated:
+        metrics.incr("router.escalated")
+    if served_by == "light":
+        # Tokens the light model handled instead of the configured one
+        metrics.incr("router.light_served_tokens", light_tokens)
+
+    record = {
+        "event": "router_decision",
+        "query_sha": hashlib.sha256(query.encode("utf-8")).hexdigest()[:12],
+        **asdict(decision),
+        "escalated": escalated,
+        "served_by": served_by,
+        "light_latency_ms": round(light_latency_ms, 1),
+        "default_latency_ms": round(default_latency_ms, 1),
+        "light_tokens": light_tokens,
+        "default_tokens": default_tokens,
+        "light_served_tokens": light_tokens if served_by == "light" else 0,
+    }
+    logger.info(json.dumps(record))
+    return record
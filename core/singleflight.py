@@ -0,0 +1,91 @@
+"""Single-flight deduplication of identical concurrent calls.
+
+The first caller for a key (the leader) runs the call; callers arriving with
+the same key while it is in flight wait for and share its result or error.
+Nothing is cached once the call completes. Counts are exported through
+``core.metrics`` as ``singleflight.<name>.leaders`` and
+``singleflight.<name>.coalesced``.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+from core import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates blocking calls made from multiple threads."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.incr(f"singleflight.{self.name}.leaders")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Deduplicates coroutine calls made on one event loop.
+
+    The call runs as its own task, so a caller that stops waiting (e.g. at its
+    deadline) does not cancel it for the others; it is cancelled only once
+    every caller has given up.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict = {}  # key -> [task, number of waiting callers]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is not None:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+        else:
+            metrics.incr(f"singleflight.{self.name}.leaders")
+            task = asyncio.ensure_future(fn())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _, call=call: self._forget(key, call))
+
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                call[0].cancel()
+
+    def _forget(self, key: Hashable, call: list) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,16 @@
+"""Text normalization shared by the local classifiers and caches."""
+
+import re
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def tokenize(text: str) -> list:
+    return normalize_text(text).split()
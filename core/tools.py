@@ -1,15 +1,62 @@
+import contextvars
+import hashlib
 import logging
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Optional
 
 import boto3
 from strands.tools import tool
 
-from core.config import BEDROCK_KB_ID, BEDROCK_REGION
+from core import diversify, domains, metrics
+from core.config import (
+    BEDROCK_KB_ID,
+    BEDROCK_REGION,
+    KB_CHUNK_MEMO_ENABLED,
+    KB_DOMAIN_FILTER_ENABLED,
+    KB_MMR_ENABLED,
+    KB_MMR_LAMBDA,
+    KB_RERANK_CANDIDATES,
+    KB_RERANK_ENABLED,
+    KB_TOP_K,
+    PREFETCH_ENABLED,
+    PREFETCH_MIN_SIMILARITY,
+)
+from core.embeddings import embed_text
+from core.kb_format import Hit, chunk_refs, render
+from core.kb_mirror import get_mirror
+from core.limiter import LimiterTimeout, kb_limiter
+from core.rerank import relevance
+from core.request_context import current_request, stage_timeout
+from core.singleflight import SingleFlight
+from core.text import tokenize
 
 logger = logging.getLogger(__name__)
 
 _bedrock_agent_runtime_client = None
 
+# Throttled retrieves are retried after 0.5s and 1s, within the request deadline
+RETRIEVE_THROTTLE_ATTEMPTS = 3
+RETRIEVE_BACKOFF_SECONDS = 0.25
+
+# Concurrent identical searches (same KB, query and size) share one retrieve
+_retrievals = SingleFlight("kb_retrieve")
+
+# Prefetches and deadline-bounded retrieves run here
+_retrieve_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="kb-retrieve")
+
+
+@dataclass
+class _Prefetch:
+    query_tokens: set
+    max_results: int
+    domain: Optional[str]
+    future: Future
+    used: bool = False
+
 
 def _get_client():
     global _bedrock_agent_runtime_client
@@ -21,8 +68,212 @@ def _get_client():
     return _bedrock_agent_runtime_client
 
 
+def get_knowledge_base_id() -> Optional[str]:
+    return os.environ.get("KNOWLEDGE_BASE_ID") or BEDROCK_KB_ID
+
+
+def retrieve_results(knowledge_base_id: str, query: str, max_results: int, domain: Optional[str] = None) -> list:
+    """Run a KB retrieve (or a mirror search), joining an identical one already in flight."""
+    mirror = get_mirror()
+    if mirror is not None:
+        try:
+            return _search_mirror(mirror, query, max_results, domain)
+        except Exception as e:
+            metrics.incr("kb_mirror.errors")
+            logger.warning(f"KB mirror search failed, using Bedrock: {e}")
+
+    client = _get_client()
+    search_config = {"numberOfResults": max_results}
+    if domain:
+        search_config["filter"] = domains.retrieval_filter(domain)
+
+    def retrieve():
+        return kb_limiter.call(
+            lambda: client.retrieve(
+                knowledgeBaseId=knowledge_base_id,
+                retrievalQuery={"text": query},
+                retrievalConfiguration={"vectorSearchConfiguration": search_config},
+            ),
+            attempts=RETRIEVE_THROTTLE_ATTEMPTS,
+            base_delay=RETRIEVE_BACKOFF_SECONDS,
+        )
+
+    response = _retrievals.do(
+        (knowledge_base_id, " ".join(query.split()).lower(), max_results, domain),
+        retrieve,
+    )
+    return response.get("retrievalResults", [])
+
+
+def _search_mirror(mirror, query: str, max_results: int, domain: Optional[str]) -> list:
+    # Only the query embedding needs the network; repeated queries hit its cache
+    vector = embed_text(" ".join(query.split()), mirror.manifest["dimension"])
+    started = time.perf_counter()
+    results = mirror.search(vector, max_results, domain)
+    metrics.incr("kb_mirror.hits")
+    metrics.set_gauge("kb_mirror.search_ms", (time.perf_counter() - started) * 1000)
+    return results
+
+
+def query_domain(query: str) -> Optional[str]:
+    """Domain to restrict a search to, or None to search the whole KB."""
+    return domains.classify(query).domain if KB_DOMAIN_FILTER_ENABLED else None
+
+
+def _retrieve_in_domain(knowledge_base_id: str, query: str, max_results: int,
+                        domain: Optional[str], min_results: int) -> list:
+    """Retrieve within ``domain``; search everything when the slice is too thin."""
+    results = retrieve_results(knowledge_base_id, query, max_results, domain)
+    if domain is None:
+        return results
+    metrics.incr(f"kb_filter.{domain}")
+    if len(results) >= min_results:
+        return results
+    metrics.incr("kb_filter.fallbacks")
+    return retrieve_results(knowledge_base_id, query, max_results)
+
+
+def _fetch_size(max_results: int) -> int:
+    """Candidates to retrieve for ``max_results`` results after reranking and diversification."""
+    # MMR at lambda 1.0 keeps the relevance order, so it needs no extra candidates
+    if KB_RERANK_ENABLED or (KB_MMR_ENABLED and KB_MMR_LAMBDA < 1.0):
+        return max(max_results, KB_RERANK_CANDIDATES)
+    return max_results
+
+
+def _select(query: str, results: list, max_results: int) -> list:
+    # alpha=1.0 is the scaled vector score alone
+    scores = relevance(query, results) if KB_RERANK_ENABLED else relevance(query, results, alpha=1.0)
+    if KB_MMR_ENABLED:
+        return diversify.select(results, scores, max_results)
+    order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)
+    return [results[i] for i in order[:max_results]]
+
+
+def chunk_ref(source: str, content: str) -> str:
+    return hashlib.sha256(f"{source}\n{content}".encode("utf-8")).hexdigest()[:12]
+
+
+def delivered_chunks(messages: list) -> set:
+    """Refs of the chunks whose full text is in the conversation's tool results."""
+    refs = set()
+    for message in messages:
+        for block in message.get("content", []):
+            for item in block.get("toolResult", {}).get("content", []):
+                refs.update(chunk_refs(item.get("text", "")))
+    return refs
+
+
+def start_chunk_memo(messages: list) -> None:
+    """Seed the current request's chunk memo from the agent's loaded history."""
+    ctx = current_request()
+    if KB_CHUNK_MEMO_ENABLED and ctx:
+        ctx.delivered = delivered_chunks(messages)
+
+
+def start_prefetch(query: str, max_results: int = KB_TOP_K) -> None:
+    """Start a speculative retrieve on the raw user prompt for the current request.
+
+    The system prompt makes the model search on almost every question, usually
+    with a query close to the prompt itself, so the retrieve can overlap the
+    model's first round trip instead of following it.
+    """
+    ctx = current_request()
+    knowledge_base_id = get_knowledge_base_id()
+    if not (PREFETCH_ENABLED and ctx and knowledge_base_id and query.strip()):
+        return
+    fetch_size = _fetch_size(max_results)
+    domain = query_domain(query)
+    ctx.prefetch = _Prefetch(
+        query_tokens=set(tokenize(query)),
+        max_results=fetch_size,
+        domain=domain,
+        # Run in the request's context so the retrieve sees its actor and deadline
+        future=_retrieve_pool.submit(
+            contextvars.copy_context().run,
+            _retrieve_in_domain, knowledge_base_id, query, fetch_size, domain, max_results,
+        ),
+    )
+    metrics.incr("kb_prefetch.started")
+
+
+def settle_prefetch() -> None:
+    """Count the current request's prefetch as used or wasted."""
+    ctx = current_request()
+    prefetch = ctx.prefetch if ctx else None
+    if prefetch is None:
+        return
+    ctx.prefetch = None
+    metrics.incr("kb_prefetch.used" if prefetch.used else "kb_prefetch.wasted")
+    used = metrics.counter("kb_prefetch.used")
+    metrics.set_gauge("kb_prefetch.used_rate", used / (used + metrics.counter("kb_prefetch.wasted")))
+
+
+def _prefetched_results(query: str, fetch_size: int, domain: Optional[str]) -> Optional[list]:
+    """Prefetched candidates when the tool query matches the prompt closely enough."""
+    ctx = current_request()
+    prefetch = ctx.prefetch if ctx else None
+    if prefetch is None or fetch_size > prefetch.max_results or domain != prefetch.domain:
+        return None
+
+    query_tokens = set(tokenize(query))
+    union = query_tokens | prefetch.query_tokens
+    similarity = len(query_tokens & prefetch.query_tokens) / len(union) if union else 0.0
+    if similarity < PREFETCH_MIN_SIMILARITY:
+        return None
+
+    try:
+        results = prefetch.future.result(timeout=stage_timeout())
+    except FutureTimeoutError:
+        raise
+    except Exception as e:
+        logger.warning(f"Prefetched retrieve failed, searching again: {e}")
+        return None
+    prefetch.used = True
+    return results[:fetch_size]
+
+
+def to_hits(results: list) -> list:
+    """Results as rendered hits, recording sources and delivered chunks on the request."""
+    ctx = current_request()
+    hits = []
+    for result in results:
+        content = result.get("content", {}).get("text", "No content")
+        score = result.get("score", 0)
+        location = result.get("location", {})
+        source_type = location.get("type", "UNKNOWN")
+
+        if source_type == "S3":
+            source = location.get("s3Location", {}).get("uri", "Unknown")
+            if ctx:
+                ctx.sources.append(source)
+        else:
+            source = f"Source type: {source_type}"
+
+        ref = chunk_ref(source, content)
+        if ctx and ctx.delivered is not None and ref in ctx.delivered:
+            metrics.incr("kb_memo.backrefs")
+            metrics.incr("kb_memo.chars_saved", min(len(content), 800))
+            hits.append(Hit(source, score, ref, None))
+            continue
+        if ctx and ctx.delivered is not None:
+            ctx.delivered.add(ref)
+        if len(content) > 800:
+            content = content[:800] + "..."
+        hits.append(Hit(source, score, ref, content))
+    return hits
+
+
+def search_results(knowledge_base_id: str, query: str, max_results: int = KB_TOP_K) -> list:
+    """Results the tool would render for ``query``: over-fetched, reranked and diversified.
+
+    Without the tool's prefetch, domain filter and deadline, for scripts.
+    """
+    return _select(query, retrieve_results(knowledge_base_id, query, _fetch_size(max_results)), max_results)
+
+
 @tool
-def search_knowledge_base(query: str, max_results: int = 5) -> str:
+def search_knowledge_base(query: str, max_results: int = KB_TOP_K) -> str:
     """Cerca nella base documentale informazioni rilevanti su diritto notarile italiano,
     regime patrimoniale della famiglia, successioni e donazioni, contratti e obbligazioni.
 
@@ -32,12 +283,12 @@ def search_knowledge_base(query: str, max_results: int = 5) -> str:
 
     Args:
         query: La query di ricerca per trovare documenti rilevanti
-        max_results: Numero massimo di risultati da restituire (default: 5)
+        max_results: Numero massimo di risultati da restituire
 
     Returns:
         Una stringa formattata contenente i risultati della ricerca con citazione delle fonti
     """
-    knowledge_base_id = os.environ.get("KNOWLEDGE_BASE_ID") or BEDROCK_KB_ID
+    knowledge_base_id = get_knowledge_base_id()
 
     if not knowledge_base_id:
         return (
@@ -45,43 +296,37 @@ def search_knowledge_base(query: str, max_results: int = 5) -> str:
             "The KNOWLEDGE_BASE_ID environment variable is not set."
         )
 
-    client = _get_client()
-
-    try:
-        response = client.retrieve(
-            knowledgeBaseId=knowledge_base_id,
-            retrievalQuery={"text": query},
-            retrievalConfiguration={
-                "vectorSearchConfiguration": {"numberOfResults": max_results}
-            },
+    timeout = stage_timeout()
+    if timeout is not None and timeout <= 0:
+        metrics.incr("deadline.kb_skipped")
+        return (
+            "Knowledge base search skipped: the request deadline is too close. "
+            "Answer with what is already in the conversation and say that the sources could not be consulted."
         )
 
-        results = response.get("retrievalResults", [])
+    try:
+        # Over-fetch candidates and keep the best ``max_results`` after reranking and MMR
+        fetch_size = _fetch_size(max_results)
+        domain = query_domain(query)
+        results = _prefetched_results(query, fetch_size, domain)
+        if results is None:
+            args = (knowledge_base_id, query, fetch_size, domain, max_results)
+            if timeout is None:
+                results = _retrieve_in_domain(*args)
+            else:
+                future = _retrieve_pool.submit(contextvars.copy_context().run, _retrieve_in_domain, *args)
+                results = future.result(timeout=timeout)
+        results = _select(query, results, max_results)
 
         if not results:
             return f"No results found for query: {query}"
 
-        formatted_results = []
-        for i, result in enumerate(results, 1):
-            content = result.get("content", {}).get("text", "No content")
-            score = result.get("score", 0)
-            location = result.get("location", {})
-            source_type = location.get("type", "UNKNOWN")
-
-            if source_type == "S3":
-                source = location.get("s3Location", {}).get("uri", "Unknown")
-            else:
-                source = f"Source type: {source_type}"
-
-            text = f"Result {i} (Relevance: {score:.2f})\n"
-            text += f"Source: {source}\n"
-            if len(content) > 800:
-                content = content[:800] + "..."
-            text += f"Content: {content}\n"
-            formatted_results.append(text)
-
-        return "\n---\n".join(formatted_results)
+        return render(to_hits(results))
 
+    except (FutureTimeoutError, LimiterTimeout):
+        metrics.incr("deadline.kb_timeouts")
+        logger.warning("Knowledge base search abandoned at the request deadline")
+        return "Knowledge base search timed out before the request deadline."
     except Exception as e:
         logger.error(f"Error searching knowledge base: {e}")
         return f"Error searching knowledge base: {str(e)}"
@@ -6,6 +6,8 @@ from aws_cdk import aws_s3vectors as s3vectors
 from aws_cdk import aws_ssm as ssm
 from constructs import Construct
 
+TITAN_DEFAULT_DIMENSION = 1024
+
 
 class AwsLegalPocKnowledgeBaseStack(Stack):
     def __init__(
@@ -21,9 +23,8 @@ class AwsLegalPocKnowledgeBaseStack(Stack):
         stack_prefix = config["stackPrefix"]
         kb_config = config.get("knowledgeBase", {})
         embedding_model = kb_config.get("embeddingModel", "amazon.titan-embed-text-v2:0")
-        dimension = kb_config.get("dimension", 1024)
-        chunk_max_tokens = kb_config.get("chunkMaxTokens", 512)
-        chunk_overlap_percent = kb_config.get("chunkOverlapPercent", 20)
+        dimension = kb_config.get("dimension", TITAN_DEFAULT_DIMENSION)
+        chunking_configuration = self._chunking_configuration(kb_config)
 
         # Allow overriding vector bucket name via config (S3 Vectors names are globally unique)
         vector_bucket_name = kb_config.get(
@@ -55,6 +56,7 @@ class AwsLegalPocKnowledgeBaseStack(Stack):
             index_name=f"{stack_prefix}-kb-index",
             dimension=dimension,
             distance_metric="cosine",
+            # S3 Vectors indexes only hold float32; int8 is served through the local KB mirror
             data_type="float32",
             metadata_configuration=s3vectors.CfnIndex.MetadataConfigurationProperty(
                 non_filterable_metadata_keys=[
@@ -115,6 +117,7 @@ class AwsLegalPocKnowledgeBaseStack(Stack):
                 type="VECTOR",
                 vector_knowledge_base_configuration=bedrock.CfnKnowledgeBase.VectorKnowledgeBaseConfigurationProperty(
                     embedding_model_arn=f"arn:aws:bedrock:{Stack.of(self).region}::foundation-model/{embedding_model}",
+                    embedding_model_configuration=self._embedding_model_configuration(dimension),
                 ),
             ),
             storage_configuration=bedrock.CfnKnowledgeBase.StorageConfigurationProperty(
@@ -141,13 +144,7 @@ class AwsLegalPocKnowledgeBaseStack(Stack):
                 ),
             ),
             vector_ingestion_configuration=bedrock.CfnDataSource.VectorIngestionConfigurationProperty(
-                chunking_configuration=bedrock.CfnDataSource.ChunkingConfigurationProperty(
-                    chunking_strategy="FIXED_SIZE",
-                    fixed_size_chunking_configuration=bedrock.CfnDataSource.FixedSizeChunkingConfigurationProperty(
-                        max_tokens=chunk_max_tokens,
-                        overlap_percentage=chunk_overlap_percent,
-                    ),
-                ),
+                chunking_configuration=chunking_configuration,
             ),
         )
 
@@ -183,3 +180,70 @@ class AwsLegalPocKnowledgeBaseStack(Stack):
         # Apply tags
         for key, value in config.get("tags", {}).items():
             Tags.of(self).add(key, value)
+
+    @staticmethod
+    def _embedding_model_configuration(dimension: int):
+        """Embedding size for Titan, or None at its default of 1024 float32.
+
+        The setting is part of the knowledge base configuration, so adding or
+        changing it replaces the knowledge base: the new one has a new ID and
+        is empty. After such a deploy, run a full ingestion job and update
+        ``BEDROCK_KB_ID``. Leaving it out at the default keeps existing
+        knowledge bases in place.
+        """
+        if dimension == TITAN_DEFAULT_DIMENSION:
+            return None
+        return bedrock.CfnKnowledgeBase.EmbeddingModelConfigurationProperty(
+            bedrock_embedding_model_configuration=bedrock.CfnKnowledgeBase.BedrockEmbeddingModelConfigurationProperty(
+                dimensions=dimension,
+                embedding_data_type="FLOAT32",
+            ),
+        )
+
+    @staticmethod
+    def _chunking_configuration(kb_config: dict) -> bedrock.CfnDataSource.ChunkingConfigurationProperty:
+        """Chunking from ``knowledgeBase.chunkingStrategy`` (default FIXED_SIZE).
+
+        Changing the strategy replaces the data source, so a full ingestion
+        job is needed afterwards. ``scripts/bench_chunking.py`` compares the
+        strategies offline on the same settings.
+        """
+        strategy = kb_config.get("chunkingStrategy", "FIXED_SIZE").upper()
+        if strategy == "FIXED_SIZE":
+            return bedrock.CfnDataSource.ChunkingConfigurationProperty(
+                chunking_strategy="FIXED_SIZE",
+                fixed_size_chunking_configuration=bedrock.CfnDataSource.FixedSizeChunkingConfigurationProperty(
+                    max_tokens=kb_config.get("chunkMaxTokens", 512),
+                    overlap_percentage=kb_config.get("chunkOverlapPercent", 20),
+                ),
+            )
+        if strategy == "HIERARCHICAL":
+            hierarchical = kb_config.get("hierarchical", {})
+            return bedrock.CfnDataSource.ChunkingConfigurationProperty(
+                chunking_strategy="HIERARCHICAL",
+                hierarchical_chunking_configuration=bedrock.CfnDataSource.HierarchicalChunkingConfigurationProperty(
+                    level_configurations=[
+                        bedrock.CfnDataSource.HierarchicalChunkingLevelConfigurationProperty(
+                            max_tokens=hierarchical.get("parentMaxTokens", 1500),
+                        ),
+                        bedrock.CfnDataSource.HierarchicalChunkingLevelConfigurationProperty(
+                            max_tokens=hierarchical.get("childMaxTokens", 300),
+                        ),
+                    ],
+                    overlap_tokens=hierarchical.get("overlapTokens", 60),
+                ),
+            )
+        if strategy == "SEMANTIC":
+            semantic = kb_config.get("semantic", {})
+            return bedrock.CfnDataSource.ChunkingConfigurationProperty(
+                chunking_strategy="SEMANTIC",
+                semantic_chunking_configuration=bedrock.CfnDataSource.SemanticChunkingConfigurationProperty(
+                    max_tokens=semantic.get("maxTokens", 300),
+                    buffer_size=semantic.get("bufferSize", 0),
+                    breakpoint_percentile_threshold=semantic.get("breakpointPercentileThreshold", 95),
+                ),
+            )
+        if strategy == "NONE":
+            # Each file is one chunk: for documents already split upstream
+            return bedrock.CfnDataSource.ChunkingConfigurationProperty(chunking_strategy="NONE")
+        raise ValueError(f"Unknown knowledgeBase.chunkingStrategy: {strategy}")
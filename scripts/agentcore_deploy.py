@@ -268,6 +268,7 @@ def create_agentcore_runtime_execution_role() -> str:
                     "bedrock:InvokeModelWithResponseStream",
                     "bedrock:ApplyGuardrail",
                     "bedrock:Retrieve",
+                    "bedrock:ListIngestionJobs",
                 ],
                 "Resource": [
                     "arn:aws:bedrock:*::foundation-model/*",
@@ -303,6 +304,21 @@ def create_agentcore_runtime_execution_role() -> str:
         ],
     }
 
+    answer_cache_uri = os.getenv("ANSWER_CACHE_S3_URI", "")
+    if answer_cache_uri:
+        cache_bucket = answer_cache_uri.removeprefix("s3://").split("/", 1)[0]
+        policy_document["Statement"].append(
+            {
+                "Sid": "AnswerCacheStore",
+                "Effect": "Allow",
+                "Action": ["s3:GetObject", "s3:PutObject", "s3:ListBucket"],
+                "Resource": [
+                    f"arn:aws:s3:::{cache_bucket}",
+                    f"arn:aws:s3:::{cache_bucket}/*",
+                ],
+            }
+        )
+
     try:
         role = iam.get_role(RoleName=role_name)["Role"]
         return role["Arn"]
@@ -378,6 +394,31 @@ def deploy_runtime(memory_id: str, cognito_config: Dict[str, str], wait: bool) -
         "BEDROCK_INFERENCE_PROFILE_ARN": os.getenv("BEDROCK_INFERENCE_PROFILE_ARN", ""),
         "APP_VERSION": os.getenv("APP_VERSION", "local"),
         "KNOWLEDGE_BASE_ID": os.getenv("KNOWLEDGE_BASE_ID", ""),
+        "BEDROCK_PROMPT_CACHING": os.getenv("BEDROCK_PROMPT_CACHING", "auto"),
+        "KB_DATA_SOURCE_ID": os.getenv("KB_DATA_SOURCE_ID", ""),
+        "ANSWER_CACHE_ENABLED": os.getenv("ANSWER_CACHE_ENABLED", "false"),
+        "ANSWER_CACHE_S3_URI": os.getenv("ANSWER_CACHE_S3_URI", ""),
+        "ROUTER_ENABLED": os.getenv("ROUTER_ENABLED", "false"),
+        "ROUTER_LIGHT_MODEL_ID": os.getenv(
+            "ROUTER_LIGHT_MODEL_ID", "global.anthropic.claude-haiku-4-5-20251001-v1:0"
+        ),
+        "ROUTER_THRESHOLD": os.getenv("ROUTER_THRESHOLD", "0.5"),
+        "PREFILTER_MODE": os.getenv("PREFILTER_MODE", "shadow"),
+        "PREFILTER_THRESHOLD": os.getenv("PREFILTER_THRESHOLD", "0.9"),
+        "PREFETCH_ENABLED": os.getenv("PREFETCH_ENABLED", "true"),
+        "LTM_TIMEOUT_SECONDS": os.getenv("LTM_TIMEOUT_SECONDS", "1.5"),
+        "MEMORY_WRITE_BEHIND": os.getenv("MEMORY_WRITE_BEHIND", "true"),
+        "CONVERSATION_WINDOW_TURNS": os.getenv("CONVERSATION_WINDOW_TURNS", "6"),
+        "BEDROCK_FAILOVER_TARGETS": os.getenv("BEDROCK_FAILOVER_TARGETS", ""),
+        "BEDROCK_HEDGE_DELAY_MS": os.getenv("BEDROCK_HEDGE_DELAY_MS", "0"),
+        "KB_RERANK_ENABLED": os.getenv("KB_RERANK_ENABLED", "true"),
+        "KB_TOP_K": os.getenv("KB_TOP_K", "3"),
+        "KB_MMR_ENABLED": os.getenv("KB_MMR_ENABLED", "true"),
+        "KB_MMR_LAMBDA": os.getenv("KB_MMR_LAMBDA", "1.0"),
+        "KB_RESULT_FORMAT": os.getenv("KB_RESULT_FORMAT", "compact"),
+        "KB_DOMAIN_FILTER_ENABLED": os.getenv("KB_DOMAIN_FILTER_ENABLED", "false"),
+        "KB_MIRROR_ENABLED": os.getenv("KB_MIRROR_ENABLED", "false"),
+        "KB_MIRROR_S3_URI": os.getenv("KB_MIRROR_S3_URI", ""),
     }
 
     # Add Langfuse observability configuration if credentials are provided
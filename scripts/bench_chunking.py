@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Compare KB chunking strategies offline on a local copy of the corpus.
+
+Chunks every text document of ``--corpus`` (or, without it, the text files
+in ``KB_DATA_BUCKET_NAME``) with each strategy of ``core/chunking.py``,
+embeds the chunks and the eval questions with ``core/embeddings.py``, and
+searches them with a brute-force cosine scan. For each strategy it reports
+chunk count and mean size, index size (float32 vectors plus chunk text, as
+stored in S3 Vectors), recall@k and MRR of the referenced articles, and the
+tokens the top ``KB_TOP_K`` chunks add to an answer, cut to
+``--max-chunk-chars`` like ``search_knowledge_base`` does.
+
+Embeddings are cached on disk, so re-runs only embed new chunks. With
+``EMBEDDING_BACKEND=local`` the run needs no AWS access beyond Langfuse, but
+recall is then only comparable between strategies, not to production.
+
+Requires numpy (``pip install .[mirror]``).
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/bench_chunking.py --corpus ./kb_docs --dataset italian-legal-eval
+    EMBEDDING_BACKEND=local python3.11 scripts/bench_chunking.py --corpus ./kb_docs --strategies fixed-512 article
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import boto3
+
+from core.chunking import STRATEGIES, TEXT_SUFFIXES, chunk_document, estimate_tokens, read_corpus
+from core.config import KB_DATA_BUCKET_NAME, KB_TOP_K
+from core.embeddings import embed_texts
+from core.kb_mirror import np
+from core.retrieval_eval import load_eval_items, recall_at_k, reciprocal_rank
+
+VARIANTS = {
+    "fixed-512": {"chunkingStrategy": "FIXED_SIZE", "chunkMaxTokens": 512, "chunkOverlapPercent": 20},
+    "fixed-300": {"chunkingStrategy": "FIXED_SIZE", "chunkMaxTokens": 300, "chunkOverlapPercent": 10},
+    "hierarchical": {"chunkingStrategy": "HIERARCHICAL"},
+    "semantic": {"chunkingStrategy": "SEMANTIC"},
+    "article": {"chunkingStrategy": "ARTICLE", "chunkMaxTokens": 512},
+}
+
+
+def _load_corpus(corpus: str, bucket: str) -> dict:
+    if corpus:
+        return read_corpus(corpus)
+    documents = {}
+    s3 = boto3.client("s3")
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        for obj in page.get("Contents", []):
+            if obj["Key"].lower().endswith(TEXT_SUFFIXES):
+                body = s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read()
+                documents[obj["Key"]] = body.decode("utf-8", errors="replace")
+    return documents
+
+
+def _environment_variant(environment: str) -> dict:
+    with open(os.path.join(REPO_ROOT, "config", "environments.json")) as f:
+        return json.load(f)[environment].get("knowledgeBase", {})
+
+
+def _evaluate(name: str, kb_config: dict, documents: dict, items: list, query_matrix, args) -> dict:
+    started = time.perf_counter()
+    chunks = [c for text in documents.values() for c in chunk_document(text, kb_config, args.dimension)]
+    chunk_s = time.perf_counter() - started
+    if not chunks:
+        return {"name": name, "chunks": 0}
+
+    started = time.perf_counter()
+    matrix = np.array(embed_texts([c.text for c in chunks], args.dimension), dtype=np.float32)
+    embed_s = time.perf_counter() - started
+
+    top_n = max(max(args.k), KB_TOP_K)
+    recalls = {k: 0.0 for k in args.k}
+    mrr = tokens = 0.0
+    scores = query_matrix @ matrix.T
+    for item, row in zip(items, scores):
+        contexts = []
+        for i in np.argsort(-row):
+            # Hierarchical children of one parent come back as a single result
+            context = chunks[i].context
+            if context not in contexts:
+                contexts.append(context)
+            if len(contexts) == top_n:
+                break
+        if args.max_chunk_chars:
+            contexts = [c[:args.max_chunk_chars] for c in contexts]
+        for k in args.k:
+            recalls[k] += recall_at_k(item["expected"], contexts, k)
+        mrr += reciprocal_rank(item["expected"], contexts)
+        tokens += sum(estimate_tokens(c) for c in contexts[:KB_TOP_K])
+
+    n = len(items) or 1
+    text_bytes = sum(len(c.text.encode("utf-8")) for c in chunks)
+    return {
+        "name": name,
+        "chunks": len(chunks),
+        "mean_tokens": sum(estimate_tokens(c.text) for c in chunks) / len(chunks),
+        "index_mb": (matrix.nbytes + text_bytes) / 1e6,
+        "recall": {k: v / n for k, v in recalls.items()},
+        "mrr": mrr / n,
+        "answer_tokens": tokens / n,
+        "chunk_s": chunk_s,
+        "embed_s": embed_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KB chunking strategies offline")
+    parser.add_argument("--corpus", help="Local directory of .txt/.md documents (default: the KB bucket)")
+    parser.add_argument("--bucket", default=KB_DATA_BUCKET_NAME)
+    parser.add_argument("--dataset", default="italian-legal-eval")
+    parser.add_argument("--strategies", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--env", help="Also benchmark this environment's configured chunking")
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--max-chunk-chars", type=int, default=800, help="Per-chunk cut in the tool (0: none)")
+    args = parser.parse_args()
+
+    if np is None:
+        print("ERROR: numpy is required (pip install .[mirror]).")
+        sys.exit(1)
+    if not args.corpus and not args.bucket:
+        print("ERROR: pass --corpus or set KB_DATA_BUCKET_NAME.")
+        sys.exit(1)
+    env_variant = _environment_variant(args.env) if args.env else None
+    if env_variant is not None and env_variant.get("chunkingStrategy", "FIXED_SIZE").upper() not in STRATEGIES:
+        print(f"ERROR: {args.env} chunkingStrategy must be one of {', '.join(STRATEGIES)}.")
+        sys.exit(1)
+
+    documents = _load_corpus(args.corpus, args.bucket)
+    if not documents:
+        print("ERROR: no .txt/.md documents found.")
+        sys.exit(1)
+    try:
+        items = load_eval_items(args.dataset)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    print(f"Documents: {len(documents)}, items with article references: {len(items)}, top-k: {KB_TOP_K}")
+
+    query_matrix = np.array(embed_texts([item["query"] for item in items], args.dimension), dtype=np.float32)
+    variants = {name: VARIANTS[name] for name in args.strategies}
+    if env_variant is not None:
+        variants[f"{args.env} (configured)"] = env_variant
+
+    rows = []
+    for name, kb_config in variants.items():
+        row = _evaluate(name, kb_config, documents, items, query_matrix, args)
+        rows.append(row)
+        if row["chunks"]:
+            print(f"  {name}: {row['chunks']} chunks, chunked in {row['chunk_s']:.1f}s, embedded in {row['embed_s']:.1f}s")
+
+    header = f"\n{'strategy':<24}{'chunks':>8}{'tok/chunk':>10}{'index MB':>10}"
+    header += "".join(f"{f'R@{k}':>8}" for k in args.k) + f"{'MRR':>8}{'tok/answer':>12}"
+    print(header)
+    for row in rows:
+        if not row["chunks"]:
+            print(f"{row['name']:<24}{0:>8}")
+            continue
+        recalls = "".join(f"{row['recall'][k]:>8.3f}" for k in args.k)
+        print(
+            f"{row['name']:<24}{row['chunks']:>8}{row['mean_tokens']:>10.0f}{row['index_mb']:>10.1f}"
+            f"{recalls}{row['mrr']:>8.3f}{row['answer_tokens']:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark per-turn latency and input tokens over a long conversation.
+
+Plays a scripted notarial consultation of ``--turns`` user turns against the
+configured Bedrock model, once with the full history and once with the
+rolling-summary window from ``core/conversation.py``, and prints per-turn
+latency and input tokens plus the average of the first and last ten turns.
+With windowing the late turns should cost about the same as the early ones.
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/bench_conversation.py
+    python3.11 scripts/bench_conversation.py --turns 50 --mode windowed --with-kb
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from strands import Agent
+from strands.agent.conversation_manager import NullConversationManager
+
+from core.config import (
+    BEDROCK_INFERENCE_PROFILE_ARN,
+    BEDROCK_MODEL_ID,
+    BEDROCK_REGION,
+    CONVERSATION_WINDOW_TURNS,
+)
+from core.conversation import build_conversation_manager
+from core.langfuse_client import get_system_prompt
+from core.models import build_bedrock_model, build_system_prompt
+from core.tools import search_knowledge_base
+
+QUESTIONS = [
+    "Io e mia moglie ci siamo sposati nel 2015 senza scegliere il regime patrimoniale. Che regime abbiamo?",
+    "Nel 2018 ho ereditato un appartamento da mio padre. Rientra nella comunione?",
+    "E se lo vendessi, il ricavato in che regime ricadrebbe?",
+    "Nel 2020 abbiamo comprato insieme una casa con un mutuo cointestato. Di chi è?",
+    "Possiamo passare alla separazione dei beni adesso? Con quale atto?",
+    "Cosa succede alla casa acquistata nel 2020 se cambiamo regime?",
+    "Mia moglie ha un'attività commerciale avviata prima del matrimonio. Come viene trattata?",
+    "Gli utili dell'attività degli ultimi anni sono in comunione?",
+    "Vorremmo costituire un fondo patrimoniale per i figli. Quali beni possiamo conferire?",
+    "Il fondo patrimoniale protegge la casa dai creditori dell'attività?",
+]
+
+
+def _follow_up(turn: int) -> str:
+    question = QUESTIONS[turn % len(QUESTIONS)]
+    if turn >= len(QUESTIONS):
+        question = f"Riprendendo il punto {turn % len(QUESTIONS) + 1}: {question}"
+    return question
+
+
+def _build_agent(mode: str, with_kb: bool) -> Agent:
+    model_id = BEDROCK_INFERENCE_PROFILE_ARN or BEDROCK_MODEL_ID
+    if mode == "windowed":
+        conversation_manager = build_conversation_manager()
+    else:
+        conversation_manager = NullConversationManager()
+    return Agent(
+        model=build_bedrock_model(model_id, BEDROCK_REGION),
+        tools=[search_knowledge_base] if with_kb else [],
+        system_prompt=build_system_prompt(get_system_prompt(), model_id),
+        conversation_manager=conversation_manager,
+        callback_handler=None,
+    )
+
+
+def run_session(mode: str, turns: int, with_kb: bool) -> list:
+    agent = _build_agent(mode, with_kb)
+    rows = []
+    print(f"\n=== {mode} ===")
+    print(f"{'turn':>5} {'latency s':>10} {'input tok':>10} {'messages':>9}")
+    for turn in range(turns):
+        started = time.perf_counter()
+        result = agent(_follow_up(turn))
+        latency = time.perf_counter() - started
+        # accumulated_usage spans the whole session; take this turn only
+        usage = result.metrics.latest_agent_invocation.usage
+        rows.append((latency, usage.get("inputTokens", 0)))
+        print(f"{turn + 1:>5} {latency:>10.2f} {rows[-1][1]:>10} {len(agent.messages):>9}")
+    return rows
+
+
+def _summary(mode: str, rows: list) -> None:
+    k = min(10, len(rows) // 2)
+    first, last = rows[:k], rows[-k:]
+    avg = lambda values: sum(values) / len(values)
+    print(
+        f"{mode:<10} first {k}: {avg([r[0] for r in first]):.2f}s / {avg([r[1] for r in first]):.0f} tok"
+        f"   last {k}: {avg([r[0] for r in last]):.2f}s / {avg([r[1] for r in last]):.0f} tok"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark conversation windowing over a long session")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--mode", choices=["full", "windowed", "both"], default="both")
+    parser.add_argument("--with-kb", action="store_true",
+                        help="Give the agent the knowledge base tool (adds retrieval variance)")
+    args = parser.parse_args()
+
+    print(f"Turns: {args.turns}, window: {CONVERSATION_WINDOW_TURNS} turns")
+    modes = ["full", "windowed"] if args.mode == "both" else [args.mode]
+    results = {mode: run_session(mode, args.turns, args.with_kb) for mode in modes}
+
+    print("\nAverage latency / input tokens per turn:")
+    for mode, rows in results.items():
+        _summary(mode, rows)
+
+
+if __name__ == "__main__":
+    main()
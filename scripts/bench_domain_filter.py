@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Compare unfiltered and domain-filtered KB retrieval per eval domain.
+
+For every active dataset item with article references, classifies the
+question with ``core/domains.py`` and retrieves ``--k`` chunks once over the
+whole KB and once restricted to the predicted domain (plus ``generale``).
+Prints, per dataset domain (sheet), how often a filter applied, the
+predicted domains, precision@k (share of chunks citing one of the item's
+articles), recall@k and retrieve latency percentiles for both modes.
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/bench_domain_filter.py --dataset italian-legal-eval
+    python3.11 scripts/bench_domain_filter.py --k 5 --min-confidence 0.5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from core import domains
+from core.config import KB_DOMAIN_MIN_CONFIDENCE, KB_TOP_K
+from core.retrieval_eval import article_refs, load_eval_items, percentile, recall_at_k
+from core.tools import get_knowledge_base_id, retrieve_results
+
+
+def _precision(expected: set, texts: list) -> float:
+    if not texts:
+        return 0.0
+    return sum(1 for text in texts if article_refs(text) & expected) / len(texts)
+
+
+def _timed_retrieve(knowledge_base_id: str, query: str, k: int, domain=None) -> tuple:
+    started = time.perf_counter()
+    results = retrieve_results(knowledge_base_id, query, k, domain)
+    texts = [r.get("content", {}).get("text", "") for r in results]
+    return texts, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark domain-filtered KB retrieval")
+    parser.add_argument("--dataset", default="italian-legal-eval")
+    parser.add_argument("--k", type=int, default=KB_TOP_K)
+    parser.add_argument("--min-confidence", type=float, default=KB_DOMAIN_MIN_CONFIDENCE)
+    args = parser.parse_args()
+
+    knowledge_base_id = get_knowledge_base_id()
+    if not knowledge_base_id:
+        print("ERROR: KNOWLEDGE_BASE_ID is not set.")
+        sys.exit(1)
+
+    try:
+        items = load_eval_items(args.dataset)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    print(f"Items with article references: {len(items)}, k={args.k}")
+
+    groups = {}
+    for i, item in enumerate(items, 1):
+        decision = domains.classify(item["query"], args.min_confidence)
+        row = {"predicted": decision.domain or "-"}
+        try:
+            for mode, domain in (("all", None), ("filtered", decision.domain)):
+                if mode == "filtered" and domain is None:
+                    # No filter: the tool would run the same unfiltered search
+                    row["filtered"] = row["all"]
+                    continue
+                texts, ms = _timed_retrieve(knowledge_base_id, item["query"], args.k, domain)
+                row[mode] = (
+                    _precision(item["expected"], texts),
+                    recall_at_k(item["expected"], texts, args.k),
+                    ms,
+                )
+        except Exception as e:
+            print(f"  [{i}] retrieve failed: {e}")
+            continue
+        for group in ("ALL", item["domain"]):
+            groups.setdefault(group, []).append(row)
+
+    print(f"\n{'domain':<28}{'n':>4}{'filtered':>9}  {'P@k all/filt':>14}  {'R@k all/filt':>14}"
+          f"  {'p50 ms all/filt':>16}  {'p95 ms all/filt':>16}")
+    for group, rows in groups.items():
+        n = len(rows)
+        applied = sum(1 for r in rows if r["predicted"] != "-") / n
+        avg = lambda mode, i: sum(r[mode][i] for r in rows) / n
+        p = lambda mode, q: percentile([r[mode][2] for r in rows], q)
+        print(
+            f"{group[:27]:<28}{n:>4}{applied:>9.0%}"
+            f"  {avg('all', 0):>6.2f}/{avg('filtered', 0):<6.2f}  {avg('all', 1):>6.2f}/{avg('filtered', 1):<6.2f}"
+            f"  {p('all', 50):>7.0f}/{p('filtered', 50):<7.0f}  {p('all', 95):>7.0f}/{p('filtered', 95):<7.0f}"
+        )
+
+    print("\nPredicted domains per dataset domain:")
+    for group, rows in groups.items():
+        if group == "ALL":
+            continue
+        predicted = {}
+        for r in rows:
+            predicted[r["predicted"]] = predicted.get(r["predicted"], 0) + 1
+        print(f"  {group[:27]:<28}" + ", ".join(f"{d}={c}" for d, c in sorted(predicted.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Compare embedding dimensions and vector quantizations for the KB index.
+
+Takes the KB chunks, either the production ones from a mirror export
+(``chunks.jsonl`` under ``--mirror``, see ``scripts/export_kb_mirror.py``)
+or a local ``--corpus`` chunked with an environment's chunking config. It
+embeds them at every ``--dimensions`` with ``core/embeddings.py``, and
+builds each ``--dtypes`` index from the same vectors:
+
+    float32  what S3 Vectors stores today
+    int8     per-row-scaled int8, as in the int8 KB mirror
+    binary   one sign bit per dimension, searched by Hamming distance
+
+It then runs the eval questions against every index and prints vector
+bytes, scan latency per query, recall@k and MRR of the referenced
+articles. Only float32 at 256, 512 or 1024 dimensions can be deployed as the
+S3 Vectors index (``knowledgeBase.dimension`` in
+``config/environments.json``; the index type is fixed to float32). A
+dimension other than 1024 replaces the knowledge base, see
+``infra/knowledge_base_stack.py``. int8 is served through the local mirror.
+
+Requires numpy (``pip install .[mirror]``).
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/bench_embeddings.py --mirror /tmp/kb_mirror --dataset italian-legal-eval
+    python3.11 scripts/bench_embeddings.py --corpus ./kb_docs --env beta --dimensions 1024 512 256
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from core import kb_mirror
+from core.chunking import STRATEGIES, chunk_document, read_corpus
+from core.config import KB_MIRROR_PATH
+from core.embeddings import embed_texts
+from core.retrieval_eval import load_eval_items, percentile, recall_at_k, reciprocal_rank
+
+np = kb_mirror.np
+
+DTYPES = ("float32", "int8", "binary")
+TITAN_DIMENSIONS = (1024, 512, 256)
+
+
+def _load_chunks(args) -> list:
+    if args.corpus:
+        with open(os.path.join(REPO_ROOT, "config", "environments.json")) as f:
+            kb_config = json.load(f)[args.env].get("knowledgeBase", {})
+        if kb_config.get("chunkingStrategy", "FIXED_SIZE").upper() not in STRATEGIES:
+            print(f"ERROR: {args.env} chunkingStrategy must be one of {', '.join(STRATEGIES)}.")
+            sys.exit(1)
+        documents = read_corpus(args.corpus)
+        return [c.text for text in documents.values() for c in chunk_document(text, kb_config)]
+    path = os.path.join(args.mirror, kb_mirror.CHUNKS)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line)["text"] for line in f]
+
+
+class _Index:
+    """One dimension/dtype combination, searched by brute force."""
+
+    def __init__(self, matrix, dtype: str):
+        self.dtype = dtype
+        self.scales = None
+        if dtype == "int8":
+            self.vectors, self.scales = kb_mirror.quantize_int8(matrix)
+        elif dtype == "binary":
+            self.vectors = np.packbits(matrix > 0, axis=1)
+        else:
+            self.vectors = matrix
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, query):
+        if self.dtype == "binary":
+            # Fewer differing sign bits ranks higher
+            differing = np.unpackbits(self.vectors ^ np.packbits(query > 0), axis=1).sum(axis=1)
+            return -differing.astype(np.float32)
+        if self.dtype == "int8":
+            return (self.vectors.astype(np.float32) @ query) * self.scales
+        return self.vectors @ query
+
+    def search(self, query, k: int) -> list:
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return list(top[np.argsort(-scores[top])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KB embedding dimensions and quantization")
+    parser.add_argument("--mirror", default=KB_MIRROR_PATH, help="KB mirror export to take the chunks from")
+    parser.add_argument("--corpus", help="Local .txt/.md directory to chunk instead of the mirror")
+    parser.add_argument("--env", default="beta", help="Environment whose chunking config --corpus uses")
+    parser.add_argument("--dataset", default="italian-legal-eval")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=list(TITAN_DIMENSIONS))
+    parser.add_argument("--dtypes", nargs="+", default=list(DTYPES), choices=DTYPES)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    args = parser.parse_args()
+
+    if np is None:
+        print("ERROR: numpy is required (pip install .[mirror]).")
+        sys.exit(1)
+    chunks = _load_chunks(args)
+    if not chunks:
+        print("ERROR: no chunks found; pass --corpus or export a mirror first.")
+        sys.exit(1)
+    try:
+        items = load_eval_items(args.dataset)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    print(f"Chunks: {len(chunks)}, items with article references: {len(items)}")
+
+    top_n = max(args.k)
+    rows = []
+    for dimensions in args.dimensions:
+        started = time.perf_counter()
+        matrix = np.array(embed_texts(chunks, dimensions), dtype=np.float32)
+        queries = np.array(embed_texts([item["query"] for item in items], dimensions), dtype=np.float32)
+        print(f"  {dimensions} dimensions embedded in {time.perf_counter() - started:.1f}s")
+
+        for dtype in args.dtypes:
+            index = _Index(matrix, dtype)
+            recalls = {k: 0.0 for k in args.k}
+            mrr, latencies = 0.0, []
+            for item, query in zip(items, queries):
+                started = time.perf_counter()
+                top = index.search(query, top_n)
+                latencies.append((time.perf_counter() - started) * 1000)
+                texts = [chunks[i] for i in top]
+                for k in args.k:
+                    recalls[k] += recall_at_k(item["expected"], texts, k)
+                mrr += reciprocal_rank(item["expected"], texts)
+            n = len(items) or 1
+            rows.append({
+                "name": f"{dtype}-{dimensions}",
+                "mb": index.nbytes / 1e6,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "recall": {k: v / n for k, v in recalls.items()},
+                "mrr": mrr / n,
+            })
+
+    baseline = next((r["mb"] for r in rows if r["name"] == "float32-1024"), None)
+    print(f"\n{'index':<14}{'vector MB':>10}{'size':>7}{'p50 ms':>8}{'p95 ms':>8}" + "".join(f"{f'R@{k}':>8}" for k in args.k) + f"{'MRR':>8}")
+    for row in rows:
+        size = f"{row['mb'] / baseline:.0%}" if baseline else "-"
+        recalls = "".join(f"{row['recall'][k]:>8.3f}" for k in args.k)
+        print(
+            f"{row['name']:<14}{row['mb']:>10.2f}{size:>7}{row['p50']:>8.2f}{row['p95']:>8.2f}"
+            f"{recalls}{row['mrr']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
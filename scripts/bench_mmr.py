@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Measure how MMR diversification trades relevance for coverage on the eval set.
+
+For every active dataset item with article references, retrieves
+``--candidates`` chunks once, scores them like ``search_knowledge_base``
+(hybrid relevance from ``core/rerank.py``) and selects ``--k`` results with
+``core/diversify.py`` at each ``--lambdas`` value (1.0 is plain relevance
+order). Per value it reports unique sources, unique sources per 1000
+delivered tokens (chunks cut at 800 characters like the tool), recall of the
+referenced articles, redundancy (mean highest trigram overlap between a
+selected chunk and the others) and selection latency.
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/bench_mmr.py --dataset italian-legal-eval
+    python3.11 scripts/bench_mmr.py --lambdas 1.0 0.7 0.5 0.3 --similarity embeddings --k 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from core import diversify
+from core.chunking import estimate_tokens
+from core.config import KB_MMR_SIMILARITY, KB_RERANK_CANDIDATES, KB_TOP_K
+from core.rerank import relevance
+from core.retrieval_eval import load_eval_items, percentile, recall_at_k
+from core.tools import get_knowledge_base_id, retrieve_results
+
+MAX_CHUNK_CHARS = 800  # what search_knowledge_base shows per chunk
+
+
+def _source(result: dict) -> str:
+    return result.get("location", {}).get("s3Location", {}).get("uri", "Unknown")
+
+
+def _redundancy(texts: list) -> float:
+    if len(texts) < 2:
+        return 0.0
+    similarity = diversify.similarity_matrix(texts, "shingles")
+    return sum(max(row[j] for j in range(len(texts)) if j != i) for i, row in enumerate(similarity)) / len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MMR diversification of KB results")
+    parser.add_argument("--dataset", default="italian-legal-eval")
+    parser.add_argument("--candidates", type=int, default=KB_RERANK_CANDIDATES)
+    parser.add_argument("--k", type=int, default=KB_TOP_K)
+    parser.add_argument("--lambdas", type=float, nargs="+", default=[1.0, 0.7, 0.5, 0.3])
+    parser.add_argument("--similarity", choices=["shingles", "embeddings"], default=KB_MMR_SIMILARITY)
+    args = parser.parse_args()
+
+    knowledge_base_id = get_knowledge_base_id()
+    if not knowledge_base_id:
+        print("ERROR: KNOWLEDGE_BASE_ID is not set.")
+        sys.exit(1)
+
+    try:
+        items = load_eval_items(args.dataset)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    print(f"Items with article references: {len(items)}")
+    print(f"Candidates: {args.candidates}, k: {args.k}, similarity: {args.similarity}")
+
+    rows = {value: [] for value in args.lambdas}
+    for i, item in enumerate(items, 1):
+        try:
+            candidates = retrieve_results(knowledge_base_id, item["query"], args.candidates)
+        except Exception as e:
+            print(f"  [{i}] retrieve failed: {e}")
+            continue
+        scores = relevance(item["query"], candidates)
+        for value in args.lambdas:
+            started = time.perf_counter()
+            selected = diversify.select(candidates, scores, args.k, lambda_=value, method=args.similarity)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            texts = [r.get("content", {}).get("text", "")[:MAX_CHUNK_CHARS] for r in selected]
+            rows[value].append({
+                "sources": len({_source(r) for r in selected}),
+                "tokens": sum(estimate_tokens(t) for t in texts),
+                "recall": recall_at_k(item["expected"], texts, args.k),
+                "redundancy": _redundancy(texts),
+                "ms": elapsed_ms,
+            })
+
+    if not any(rows.values()):
+        print("No item could be evaluated.")
+        return
+
+    print(f"\n{'lambda':<8}{'sources':>9}{'src/1k tok':>12}{'tokens':>8}{f'R@{args.k}':>8}{'redund.':>9}{'p95 ms':>8}")
+    for value, scored in rows.items():
+        n = len(scored)
+        sources = sum(r["sources"] for r in scored) / n
+        tokens = sum(r["tokens"] for r in scored) / n
+        per_1k = sum(r["sources"] for r in scored) / (sum(r["tokens"] for r in scored) or 1) * 1000
+        recall = sum(r["recall"] for r in scored) / n
+        redundancy = sum(r["redundancy"] for r in scored) / n
+        p95 = percentile([r["ms"] for r in scored], 95)
+        print(f"{value:<8.2f}{sources:>9.2f}{per_1k:>12.2f}{tokens:>8.0f}{recall:>8.3f}{redundancy:>9.3f}{p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Compare dense-only and hybrid (BM25 + vector) KB retrieval on the eval dataset.
+
+For every active dataset item with article references in ``riferimenti``,
+retrieves ``--candidates`` chunks for the question once, then scores the
+dense order and the reranked order from ``core/rerank.py``: recall@k of the
+referenced articles, MRR, characters returned at ``KB_TOP_K`` (a proxy for
+tool-result tokens), and retrieve/rerank latency percentiles.
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/bench_rerank.py --dataset italian-legal-eval
+    python3.11 scripts/bench_rerank.py --candidates 30 --alpha 0.3 --k 1 3 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from core.config import KB_RERANK_ALPHA, KB_RERANK_CANDIDATES, KB_TOP_K
+from core.rerank import rerank
+from core.retrieval_eval import load_eval_items, percentile, recall_at_k, reciprocal_rank
+from core.tools import get_knowledge_base_id, retrieve_results
+
+MAX_CHUNK_CHARS = 800  # what search_knowledge_base shows per chunk
+
+
+def _texts(results: list) -> list:
+    return [r.get("content", {}).get("text", "") for r in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hybrid reranking of KB results")
+    parser.add_argument("--dataset", default="italian-legal-eval")
+    parser.add_argument("--candidates", type=int, default=KB_RERANK_CANDIDATES)
+    parser.add_argument("--alpha", type=float, default=KB_RERANK_ALPHA, help="Vector score weight")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    args = parser.parse_args()
+
+    knowledge_base_id = get_knowledge_base_id()
+    if not knowledge_base_id:
+        print("ERROR: KNOWLEDGE_BASE_ID is not set.")
+        sys.exit(1)
+
+    try:
+        items = load_eval_items(args.dataset)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    print(f"Items with article references: {len(items)}")
+    print(f"Candidates: {args.candidates}, alpha: {args.alpha}, top-k: {KB_TOP_K}")
+
+    rows = {"dense": [], "hybrid": []}
+    retrieve_ms, rerank_ms = [], []
+    for i, item in enumerate(items, 1):
+        query, expected = item["query"], item["expected"]
+        started = time.perf_counter()
+        try:
+            candidates = retrieve_results(knowledge_base_id, query, args.candidates)
+        except Exception as e:
+            print(f"  [{i}] retrieve failed: {e}")
+            continue
+        retrieve_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        reranked = rerank(query, candidates, alpha=args.alpha)
+        rerank_ms.append((time.perf_counter() - started) * 1000)
+
+        for mode, results in (("dense", candidates), ("hybrid", reranked)):
+            texts = _texts(results)
+            rows[mode].append({
+                "recall": {k: recall_at_k(expected, texts, k) for k in args.k},
+                "rr": reciprocal_rank(expected, texts),
+                "chars": sum(min(len(t), MAX_CHUNK_CHARS) for t in texts[:KB_TOP_K]),
+            })
+
+    if not retrieve_ms:
+        print("No item could be evaluated.")
+        return
+
+    print(f"\n{'mode':<8}" + "".join(f"{f'R@{k}':>8}" for k in args.k) + f"{'MRR':>8}{f'chars@{KB_TOP_K}':>10}")
+    for mode, scored in rows.items():
+        n = len(scored)
+        recalls = "".join(f"{sum(r['recall'][k] for r in scored) / n:>8.3f}" for k in args.k)
+        mrr = sum(r["rr"] for r in scored) / n
+        chars = sum(r["chars"] for r in scored) / n
+        print(f"{mode:<8}{recalls}{mrr:>8.3f}{chars:>10.0f}")
+
+    print(f"\nRetrieve ms  p50 {percentile(retrieve_ms, 50):.0f}  p95 {percentile(retrieve_ms, 95):.0f}")
+    print(f"Rerank ms    p50 {percentile(rerank_ms, 50):.2f}  p95 {percentile(rerank_ms, 95):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Compare the token cost of the KB tool result formats on the eval set.
+
+For every active dataset item with article references, runs the tool's
+retrieval (over-fetch, rerank, MMR) once for the question and renders the
+selected chunks in each ``core/kb_format.py`` format. It then counts the
+tokens of each rendering. ``--tokens bedrock`` uses the Bedrock CountTokens
+API for ``--model`` (a foundation model id, not an inference profile), and
+``--tokens chars`` estimates one token per four characters offline.
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/bench_tool_format.py --dataset italian-legal-eval
+    python3.11 scripts/bench_tool_format.py --tokens chars --max-results 5
+"""
+
+import argparse
+import math
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import boto3
+
+from core.config import BEDROCK_MODEL_ID, BEDROCK_REGION, KB_TOP_K
+from core.kb_format import FORMATS, render
+from core.retrieval_eval import load_eval_items, percentile
+from core.tools import get_knowledge_base_id, search_results, to_hits
+
+
+def _token_counter(kind: str, model_id: str):
+    if kind == "chars":
+        return lambda text: math.ceil(len(text) / 4)
+    client = boto3.client("bedrock-runtime", region_name=BEDROCK_REGION or os.getenv("AWS_REGION", "us-east-2"))
+
+    def count(text: str) -> int:
+        response = client.count_tokens(
+            modelId=model_id,
+            input={"converse": {"messages": [{"role": "user", "content": [{"text": text}]}]}},
+        )
+        return response["inputTokens"]
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KB tool result formats by token count")
+    parser.add_argument("--dataset", default="italian-legal-eval")
+    parser.add_argument("--max-results", type=int, default=KB_TOP_K)
+    parser.add_argument("--tokens", choices=["bedrock", "chars"], default="bedrock")
+    parser.add_argument("--model", default=BEDROCK_MODEL_ID, help="Model whose tokenizer CountTokens uses")
+    args = parser.parse_args()
+
+    knowledge_base_id = get_knowledge_base_id()
+    if not knowledge_base_id:
+        print("ERROR: KNOWLEDGE_BASE_ID is not set.")
+        sys.exit(1)
+
+    count = _token_counter(args.tokens, args.model)
+    try:
+        items = load_eval_items(args.dataset)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    print(f"Items with article references: {len(items)}, results per search: {args.max_results}")
+
+    tokens = {fmt: [] for fmt in FORMATS}
+    for i, item in enumerate(items, 1):
+        try:
+            hits = to_hits(search_results(knowledge_base_id, item["query"], args.max_results))
+            counts = {fmt: count(render(hits, fmt)) for fmt in FORMATS}
+        except Exception as e:
+            print(f"  [{i}] failed: {e}")
+            continue
+        for fmt, value in counts.items():
+            tokens[fmt].append(value)
+
+    if not tokens["verbose"]:
+        print("No item could be evaluated.")
+        return
+
+    baseline = sum(tokens["verbose"])
+    print(f"\n{'format':<10}{'mean':>8}{'p50':>8}{'p95':>8}{'vs verbose':>12}")
+    for fmt in FORMATS:
+        values = tokens[fmt]
+        change = sum(values) / baseline - 1
+        print(
+            f"{fmt:<10}{sum(values) / len(values):>8.0f}{percentile(values, 50):>8.0f}"
+            f"{percentile(values, 95):>8.0f}{change:>+12.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -323,6 +323,12 @@ if [[ "${SKIP_AGENTCORE}" == "false" ]]; then
     if [[ -n "${BEDROCK_INFERENCE_PROFILE_ARN}" ]]; then
         log_info "Model: ${BEDROCK_INFERENCE_PROFILE_ARN}"
     fi
+    export ROUTER_ENABLED=$(python3 -c "import json; print(str(json.load(open('${CONFIG_FILE}'))['${ENV}'].get('router', {}).get('enabled', False)).lower())")
+    export ROUTER_LIGHT_MODEL_ID=$(python3 -c "import json; print(json.load(open('${CONFIG_FILE}'))['${ENV}'].get('router', {}).get('lightModel', 'global.anthropic.claude-haiku-4-5-20251001-v1:0'))")
+    export ROUTER_THRESHOLD=$(python3 -c "import json; print(json.load(open('${CONFIG_FILE}'))['${ENV}'].get('router', {}).get('threshold', 0.5))")
+    if [[ "${ROUTER_ENABLED}" == "true" ]]; then
+        log_info "Router: ${ROUTER_LIGHT_MODEL_ID} (threshold ${ROUTER_THRESHOLD})"
+    fi
 
     # Read Knowledge Base ID from SSM (set by KnowledgeBaseStack)
     # Uses /app/ prefix to avoid reserved SSM namespaces
@@ -338,6 +344,15 @@ if [[ "${SKIP_AGENTCORE}" == "false" ]]; then
         log_warn "Knowledge Base ID not found in SSM — KB search will be disabled"
     fi
 
+    KB_DATA_SOURCE_ID=$(aws ssm get-parameter \
+        --name "/app/${STACK_PREFIX}/kb/data-source-id" \
+        --region "${REGION}" \
+        --query "Parameter.Value" \
+        --output text 2>/dev/null || echo "")
+    if [[ -n "${KB_DATA_SOURCE_ID}" ]]; then
+        export KB_DATA_SOURCE_ID
+    fi
+
     log_info "Deploying AgentCore runtime, gateway, and memory..."
     python3.11 -m poetry run python "${PROJECT_ROOT}/scripts/agentcore_deploy.py" --cognito-secret "${STACK_PREFIX}/cognito-config" --wait
     log_success "AgentCore runtime deployed"
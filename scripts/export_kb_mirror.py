@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Snapshot the KB's S3 Vectors index into a local mirror for core/kb_mirror.py.
+
+Lists every vector of the knowledge base's index (in parallel segments) with
+its chunk text and metadata, normalizes the embeddings and writes them as a
+float32 or per-row-scaled int8 matrix, plus the chunk texts and a manifest
+recording the latest completed ingestion job. With ``--upload`` (default
+``KB_MIRROR_S3_URI``) the snapshot is also copied to S3, where runtimes pick
+it up. Re-run after every ingestion job; older snapshots are ignored by the
+tool once a newer ingestion completes.
+
+Requires numpy (``pip install .[mirror]``).
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/export_kb_mirror.py --out /tmp/kb_mirror
+    python3.11 scripts/export_kb_mirror.py --dtype int8 --upload s3://bucket/kb-mirror
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import boto3
+
+from core import kb_mirror
+from core.config import BEDROCK_REGION, KB_MIRROR_PATH, KB_MIRROR_S3_URI
+from core.kb_version import latest_ingestion_job
+from core.tools import get_knowledge_base_id
+
+np = kb_mirror.np
+
+PAGE_SIZE = 1000
+
+
+def _region() -> str:
+    return BEDROCK_REGION or os.getenv("AWS_REGION", "us-east-2")
+
+
+def _index_arn(knowledge_base_id: str) -> str:
+    kb = boto3.client("bedrock-agent", region_name=_region()).get_knowledge_base(
+        knowledgeBaseId=knowledge_base_id
+    )["knowledgeBase"]
+    return kb["storageConfiguration"]["s3VectorsConfiguration"]["indexArn"]
+
+
+def _list_segment(index_arn: str, segment: int, segments: int) -> list:
+    client = boto3.client("s3vectors", region_name=_region())
+    vectors, token = [], None
+    while True:
+        kwargs = {"nextToken": token} if token else {}
+        response = client.list_vectors(
+            indexArn=index_arn,
+            segmentCount=segments,
+            segmentIndex=segment,
+            maxResults=PAGE_SIZE,
+            returnData=True,
+            returnMetadata=True,
+            **kwargs,
+        )
+        vectors.extend(response.get("vectors", []))
+        token = response.get("nextToken")
+        if not token:
+            return vectors
+
+
+def _chunk(vector: dict) -> dict:
+    metadata = vector.get("metadata") or {}
+    bedrock_metadata = metadata.get("AMAZON_BEDROCK_METADATA") or "{}"
+    if isinstance(bedrock_metadata, str):
+        try:
+            bedrock_metadata = json.loads(bedrock_metadata)
+        except ValueError:
+            bedrock_metadata = {}
+    source = (
+        metadata.get("x-amz-bedrock-kb-source-uri")
+        or bedrock_metadata.get("x-amz-bedrock-kb-source-uri")
+        or bedrock_metadata.get("source")
+        or "Unknown"
+    )
+    return {
+        "key": vector["key"],
+        "text": metadata.get("AMAZON_BEDROCK_TEXT", ""),
+        "source": source,
+        "domain": metadata.get("domain") or bedrock_metadata.get("domain"),
+    }
+
+
+def _write(out: str, matrix, chunks: list, dtype: str, manifest: dict) -> None:
+    staging = f"{out}.export"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    if dtype == "int8":
+        quantized, scales = kb_mirror.quantize_int8(matrix)
+        np.save(os.path.join(staging, kb_mirror.VECTORS), quantized)
+        np.save(os.path.join(staging, kb_mirror.SCALES), scales)
+    else:
+        np.save(os.path.join(staging, kb_mirror.VECTORS), matrix)
+    with open(os.path.join(staging, kb_mirror.CHUNKS), "w") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+    with open(os.path.join(staging, kb_mirror.MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(out, ignore_errors=True)
+    os.rename(staging, out)
+
+
+def _upload(out: str, s3_uri: str, dtype: str) -> None:
+    bucket, _, prefix = s3_uri.removeprefix("s3://").partition("/")
+    s3 = boto3.client("s3")
+    # Manifest last: runtimes only see a snapshot once all its files are there
+    for name in (kb_mirror.VECTORS, kb_mirror.SCALES, kb_mirror.CHUNKS, kb_mirror.MANIFEST):
+        if name == kb_mirror.SCALES and dtype != "int8":
+            continue
+        s3.upload_file(os.path.join(out, name), bucket, f"{prefix.rstrip('/')}/{name}")
+    print(f"Uploaded to {s3_uri}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the KB vector index to a local mirror")
+    parser.add_argument("--knowledge-base-id", default=get_knowledge_base_id())
+    parser.add_argument("--out", default=KB_MIRROR_PATH)
+    parser.add_argument("--dtype", choices=["float32", "int8"], default="float32")
+    parser.add_argument("--segments", type=int, default=4, help="Parallel ListVectors segments")
+    parser.add_argument("--upload", default=KB_MIRROR_S3_URI, help="S3 URI to copy the snapshot to")
+    args = parser.parse_args()
+
+    if np is None:
+        print("ERROR: numpy is required (pip install .[mirror]).")
+        sys.exit(1)
+    if not args.knowledge_base_id:
+        print("ERROR: KNOWLEDGE_BASE_ID is not set.")
+        sys.exit(1)
+
+    # Read before listing: an ingestion finishing mid-export leaves the mirror stale, not wrong
+    ingestion_job = latest_ingestion_job()
+    index_arn = _index_arn(args.knowledge_base_id)
+    print(f"Index: {index_arn}\nIngestion job: {ingestion_job}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.segments) as pool:
+        segments = pool.map(lambda i: _list_segment(index_arn, i, args.segments), range(args.segments))
+        vectors = [v for segment in segments for v in segment]
+    if not vectors:
+        print("ERROR: the index is empty.")
+        sys.exit(1)
+    print(f"Listed {len(vectors)} vectors in {time.perf_counter() - started:.1f}s")
+
+    matrix = np.array([v["data"]["float32"] for v in vectors], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1.0, norms)
+    chunks = [_chunk(v) for v in vectors]
+
+    exported_at = time.time()
+    manifest = {
+        "export_id": f"{ingestion_job}-{int(exported_at)}",
+        "ingestion_job": ingestion_job,
+        "exported_at": exported_at,
+        "index_arn": index_arn,
+        "dimension": matrix.shape[1],
+        "dtype": args.dtype,
+        "count": len(chunks),
+    }
+    _write(args.out, matrix, chunks, args.dtype, manifest)
+    size_mb = sum(os.path.getsize(os.path.join(args.out, f)) for f in os.listdir(args.out)) / 1e6
+    print(f"Wrote {len(chunks)} chunks ({args.dtype}, {size_mb:.1f} MB) to {args.out}")
+
+    if args.upload:
+        _upload(args.out, args.upload, args.dtype)
+
+
+if __name__ == "__main__":
+    main()
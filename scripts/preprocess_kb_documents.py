@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Preprocess documents for the KB and report how much they shrink.
+
+Runs every file of ``--source`` (or, without it, the PDF and DOCX originals
+already in ``KB_DATA_BUCKET_NAME``) through ``core/preprocess.py``: text
+extraction, boilerplate stripping, and exact and near-duplicate detection
+against the bucket's text documents and the files processed before it.
+Near-duplicates (often revised versions) are reported and skipped unless
+``--keep-near-duplicates`` is given. It
+prints one line per file and the totals. Bedrock's ingestion time,
+embedding cost and index size all grow with the estimated tokens.
+
+With ``--upload`` the normalized text and its domain sidecar are written to
+the bucket; ``--delete-originals`` then removes bucket originals that were
+replaced or found to be exact duplicates, and ``--sync`` starts an ingestion job.
+Without ``--upload`` nothing is written.
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/preprocess_kb_documents.py --source ./kb_docs
+    python3.11 scripts/preprocess_kb_documents.py --upload --delete-originals --sync
+"""
+
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import boto3
+
+from core import domains, preprocess
+from core.config import BEDROCK_KB_ID, KB_DATA_BUCKET_NAME, KB_DATA_SOURCE_ID, KB_NEAR_DUPLICATE_THRESHOLD
+
+SOURCE_SUFFIXES = (".pdf", ".docx", ".txt", ".md", ".csv")
+BUCKET_SUFFIXES = (".pdf", ".docx")
+
+
+def _local_files(source: str) -> list:
+    files = []
+    for root, _, names in os.walk(source):
+        for name in sorted(names):
+            if name.lower().endswith(SOURCE_SUFFIXES):
+                path = os.path.join(root, name)
+                files.append((os.path.relpath(path, source), path))
+    return files
+
+
+def _bucket_originals(s3, bucket: str) -> list:
+    keys = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []) if obj["Key"].lower().endswith(BUCKET_SUFFIXES))
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocess KB documents before ingestion")
+    parser.add_argument("--source", help="Local directory of documents (default: PDF/DOCX originals in the bucket)")
+    parser.add_argument("--bucket", default=KB_DATA_BUCKET_NAME)
+    parser.add_argument("--threshold", type=float, default=KB_NEAR_DUPLICATE_THRESHOLD)
+    parser.add_argument("--offline", action="store_true", help="Only compare --source files with each other")
+    parser.add_argument("--keep-near-duplicates", action="store_true", help="Process near-duplicates as new documents")
+    parser.add_argument("--upload", action="store_true", help="Write the normalized text and sidecars")
+    parser.add_argument("--delete-originals", action="store_true", help="With --upload, delete replaced bucket originals")
+    parser.add_argument("--sync", action="store_true", help="Start an ingestion job afterwards")
+    args = parser.parse_args()
+
+    if not args.bucket and (args.upload or not args.offline or not args.source):
+        print("ERROR: KB_DATA_BUCKET_NAME is not set.")
+        sys.exit(1)
+    if not args.source and args.offline:
+        print("ERROR: --offline needs --source.")
+        sys.exit(1)
+
+    s3 = boto3.client("s3") if args.bucket else None
+    index = preprocess.DocumentIndex(args.threshold) if args.offline else preprocess.index_bucket(s3, args.bucket, args.threshold)
+    print(f"Indexed {len(index.documents.signatures)} documents already in the bucket")
+
+    if args.source:
+        inputs = [(name, lambda path=path: open(path, "rb").read()) for name, path in _local_files(args.source)]
+    else:
+        inputs = [(key, lambda key=key: s3.get_object(Bucket=args.bucket, Key=key)["Body"].read())
+                  for key in _bucket_originals(s3, args.bucket)]
+
+    totals = {"files": 0, "duplicates": 0, "passthrough": 0, "bytes": 0, "uploaded_bytes": 0, "raw_tokens": 0, "tokens": 0}
+    replaced = []
+    sources = {}  # output key -> file that produced it in this run
+    for name, read in inputs:
+        result = index.preprocess(name, read(), args.keep_near_duplicates)
+        if sources.setdefault(result.key, name) != name:
+            print(f"  {name}: skipped, {result.key} already written from {sources[result.key]}")
+            continue
+        print(f"  {result.summary()}")
+        totals["files"] += 1
+        totals["bytes"] += result.original_bytes
+        totals["raw_tokens"] += result.raw_tokens
+        if result.skipped:
+            totals["duplicates"] += 1
+            if result.status == "duplicate":
+                # A near-duplicate original may be a revision: only exact copies are deleted
+                replaced.append(name)
+            continue
+        totals["uploaded_bytes"] += len(result.body)
+        totals["tokens"] += result.tokens
+        if result.status == "passthrough":
+            totals["passthrough"] += 1
+            continue
+        # Later files are compared with this one too
+        index.add(result.key, result.text)
+        if result.key != name:
+            replaced.append(name)
+        if args.upload:
+            domain = domains.document_domain(name, result.text)
+            s3.put_object(Bucket=args.bucket, Key=result.key, Body=result.body)
+            s3.put_object(Bucket=args.bucket, Key=domains.sidecar_key(result.key), Body=domains.sidecar_body(domain))
+
+    saved = totals["raw_tokens"] - totals["tokens"]
+    share = saved / totals["raw_tokens"] if totals["raw_tokens"] else 0.0
+    print(f"\nFiles: {totals['files']} ({totals['duplicates']} duplicates skipped, {totals['passthrough']} unchanged)")
+    print(f"Bytes: {totals['bytes'] / 1e6:.2f} MB -> {totals['uploaded_bytes'] / 1e6:.2f} MB")
+    print(f"Estimated tokens to embed: {totals['raw_tokens']} -> {totals['tokens']} ({share:.0%} less)")
+
+    if args.upload and args.delete_originals and not args.source and replaced:
+        keys = replaced + [domains.sidecar_key(k) for k in replaced]
+        for start in range(0, len(keys), 1000):
+            s3.delete_objects(Bucket=args.bucket, Delete={"Objects": [{"Key": k} for k in keys[start:start + 1000]]})
+        print(f"Deleted {len(replaced)} replaced original(s)")
+
+    if args.sync and args.upload:
+        job = boto3.client("bedrock-agent").start_ingestion_job(
+            knowledgeBaseId=BEDROCK_KB_ID, dataSourceId=KB_DATA_SOURCE_ID
+        )
+        print(f"Ingestion job started: {job['ingestionJob']['ingestionJobId']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,12 @@ Fetches a Langfuse dataset, invokes the agent for each item, and uses a
 Bedrock LLM judge to score correctness against ground truth. Results are
 recorded back to Langfuse as a dataset run.
 
+``--retrieval-only`` skips the agent and the judge: it sends each question
+straight to the knowledge base ``retrieve`` API (concurrently) and scores
+the chunks against the articles in the item's ``riferimenti``, printing
+recall@k, MRR and latency percentiles per domain. Use it when tuning
+chunking or retrieval settings.
+
 Usage:
     # With .env
     set -a && source .env && set +a
@@ -12,6 +18,9 @@ Usage:
 
     # Custom threshold
     python3.11 scripts/run_eval.py --min-score 0.5 --dataset customer-support-eval
+
+    # Retrieval only, no generation or judge
+    python3.11 scripts/run_eval.py --retrieval-only --k 1 3 5 10 --concurrency 8
 """
 
 import argparse
@@ -19,8 +28,10 @@ import csv
 import json
 import os
 import sys
+import time
 import urllib.parse
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
@@ -39,6 +50,15 @@ from core.config import (
     COGNITO_USERNAME,
 )
 from core.langfuse_client import get_langfuse_client
+from core.limiter import kb_limiter, model_limiter
+from core.retrieval_eval import load_eval_items, percentile, recall_at_k, reciprocal_rank
+from core.tools import get_knowledge_base_id
+
+# Time reserved for the response to travel back before the client timeout fires
+DEADLINE_NETWORK_MARGIN_SECONDS = 5
+# Throttled judge and retrieve calls are retried through the adaptive limiters
+JUDGE_THROTTLE_ATTEMPTS = 4
+RETRIEVE_THROTTLE_ATTEMPTS = 4
 
 JUDGE_PROMPT_TEMPLATE = """\
 You are an expert evaluator for an Italian notarial law AI assistant.
@@ -99,7 +119,9 @@ def _invoke_runtime(
         "X-Amzn-Bedrock-AgentCore-Runtime-Session-Id": session_id,
         "Authorization": f"Bearer {token}",
     }
-    payload = {"prompt": prompt, "actor_id": "eval_runner"}
+    # Tell the runtime when we stop waiting so it does not keep working after that
+    deadline = time.time() + timeout - DEADLINE_NETWORK_MARGIN_SECONDS
+    payload = {"prompt": prompt, "actor_id": "eval_runner", "deadline": deadline}
     response = requests.post(
         url,
         params={"qualifier": "DEFAULT"},
@@ -127,10 +149,14 @@ def _run_correctness_judge(
     prompt = JUDGE_PROMPT_TEMPLATE.format(
         query=query, generation=generation, ground_truth=ground_truth
     )
-    response = bedrock_client.converse(
-        modelId=model_id,
-        messages=[{"role": "user", "content": [{"text": prompt}]}],
-        inferenceConfig={"maxTokens": 512, "temperature": 0.0},
+    response = model_limiter.call(
+        lambda: bedrock_client.converse(
+            modelId=model_id,
+            messages=[{"role": "user", "content": [{"text": prompt}]}],
+            inferenceConfig={"maxTokens": 512, "temperature": 0.0},
+        ),
+        actor="eval_judge",
+        attempts=JUDGE_THROTTLE_ATTEMPTS,
     )
     output_text = response["output"]["message"]["content"][0]["text"]
 
@@ -143,6 +169,87 @@ def _run_correctness_judge(
     return float(result["score"]), str(result.get("reasoning", ""))
 
 
+def _retrieve_item(client, knowledge_base_id: str, item: dict, max_k: int) -> dict:
+    latencies = []
+
+    def retrieve():
+        # Time the call alone: waiting for a limiter slot or a throttle backoff is not retrieve latency
+        started = time.perf_counter()
+        try:
+            return client.retrieve(
+                knowledgeBaseId=knowledge_base_id,
+                retrievalQuery={"text": item["query"]},
+                retrievalConfiguration={"vectorSearchConfiguration": {"numberOfResults": max_k}},
+            )
+        finally:
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    response = kb_limiter.call(retrieve, actor="eval_retrieval", attempts=RETRIEVE_THROTTLE_ATTEMPTS)
+    texts = [r.get("content", {}).get("text", "") for r in response.get("retrievalResults", [])]
+    return {**item, "texts": texts, "latency_ms": latencies[-1]}
+
+
+def run_retrieval_eval(args) -> None:
+    """Score KB retrieval alone against the dataset's ``riferimenti``."""
+    knowledge_base_id = get_knowledge_base_id()
+    if not knowledge_base_id:
+        print("ERROR: KNOWLEDGE_BASE_ID is not set.")
+        sys.exit(1)
+    client = boto3.client("bedrock-agent-runtime", region_name=BEDROCK_REGION or _region())
+
+    try:
+        items = load_eval_items(args.dataset)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    ks = sorted(set(args.k))
+    print(f"Knowledge base: {knowledge_base_id}")
+    print(f"Dataset: {args.dataset} ({len(items)} items with article references)")
+    print(f"k: {ks}, concurrency: {args.concurrency}")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(_retrieve_item, client, knowledge_base_id, item, ks[-1]) for item in items]
+    rows, failures = [], 0
+    for future in futures:
+        try:
+            rows.append(future.result())
+        except Exception as e:
+            failures += 1
+            print(f"  ERROR: {e}")
+    print(f"Retrieved {len(rows)} items in {time.perf_counter() - started:.1f}s ({failures} failed)")
+
+    groups = {}
+    for row in rows:
+        row["recall"] = {k: recall_at_k(row["expected"], row["texts"], k) for k in ks}
+        row["rr"] = reciprocal_rank(row["expected"], row["texts"])
+        groups.setdefault("ALL", []).append(row)
+        groups.setdefault(row["domain"], []).append(row)
+
+    print(f"\n{'domain':<30}{'n':>4}" + "".join(f"{f'R@{k}':>8}" for k in ks) + f"{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for domain, group in sorted(groups.items(), key=lambda g: (g[0] != "ALL", g[0])):
+        n = len(group)
+        recalls = "".join(f"{sum(r['recall'][k] for r in group) / n:>8.3f}" for k in ks)
+        latencies = [r["latency_ms"] for r in group]
+        print(
+            f"{domain[:29]:<30}{n:>4}{recalls}{sum(r['rr'] for r in group) / n:>8.3f}"
+            f"{percentile(latencies, 50):>9.0f}{percentile(latencies, 95):>9.0f}"
+        )
+
+    export_path = args.export or f"retrieval-eval-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv"
+    with open(export_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["query", "domain", "tipologia", "expected"] + [f"recall@{k}" for k in ks] + ["rr", "latency_ms"])
+        for row in rows:
+            writer.writerow(
+                [row["query"], row["domain"], row["tipologia"], " ".join(sorted(row["expected"]))]
+                + [f"{row['recall'][k]:.3f}" for k in ks]
+                + [f"{row['rr']:.3f}", f"{row['latency_ms']:.0f}"]
+            )
+    print(f"\nResults exported to: {export_path}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run LLM-as-judge eval pipeline")
     parser.add_argument("--dataset", default="italian-legal-eval")
@@ -152,8 +259,18 @@ def main():
     parser.add_argument("--timeout", type=int, default=180)
     parser.add_argument("--run-name", default=None)
     parser.add_argument("--export", default=None, help="Export results to CSV file path")
+    parser.add_argument("--retrieval-only", action="store_true",
+                        help="Score KB retrieval against riferimenti, without agent or judge")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10],
+                        help="Cut-offs for recall@k (retrieval-only)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Concurrent retrieve calls (retrieval-only)")
     args = parser.parse_args()
 
+    if args.retrieval_only:
+        run_retrieval_eval(args)
+        return
+
     # 1. Initialize clients
     langfuse = get_langfuse_client()
     if not langfuse:
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Write domain metadata sidecars for the documents already in the KB bucket.
+
+For every object in ``KB_DATA_BUCKET_NAME`` without a ``<key>.metadata.json``
+sidecar, classifies the document with ``core/domains.py`` (file name, plus
+the content of text files) and writes the sidecar. Bedrock picks the
+metadata up on the next ingestion job; ``--sync`` starts one.
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/tag_kb_documents.py --dry-run
+    python3.11 scripts/tag_kb_documents.py --overwrite --sync
+"""
+
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import boto3
+
+from core import domains
+from core.config import BEDROCK_KB_ID, KB_DATA_BUCKET_NAME, KB_DATA_SOURCE_ID
+
+TEXT_SUFFIXES = (".txt", ".md", ".csv")
+
+
+def _list_keys(s3, bucket: str) -> list:
+    keys = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []))
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill KB domain metadata sidecars")
+    parser.add_argument("--bucket", default=KB_DATA_BUCKET_NAME)
+    parser.add_argument("--overwrite", action="store_true", help="Re-tag documents that already have a sidecar")
+    parser.add_argument("--dry-run", action="store_true", help="Print the domains without writing")
+    parser.add_argument("--sync", action="store_true", help="Start an ingestion job afterwards")
+    args = parser.parse_args()
+
+    if not args.bucket:
+        print("ERROR: KB_DATA_BUCKET_NAME is not set.")
+        sys.exit(1)
+
+    s3 = boto3.client("s3")
+    keys = _list_keys(s3, args.bucket)
+    existing = {k for k in keys if domains.is_sidecar(k)}
+    counts = {}
+    for key in keys:
+        if domains.is_sidecar(key):
+            continue
+        if domains.sidecar_key(key) in existing and not args.overwrite:
+            continue
+        text = ""
+        if key.lower().endswith(TEXT_SUFFIXES):
+            body = s3.get_object(Bucket=args.bucket, Key=key)["Body"].read()
+            text = body.decode("utf-8", "ignore")
+        domain = domains.document_domain(os.path.basename(key), text)
+        counts[domain] = counts.get(domain, 0) + 1
+        print(f"  {domain:<20} {key}")
+        if not args.dry_run:
+            s3.put_object(Bucket=args.bucket, Key=domains.sidecar_key(key), Body=domains.sidecar_body(domain))
+
+    print("\nDocuments per domain:")
+    for domain, n in sorted(counts.items()):
+        print(f"  {domain:<20} {n}")
+
+    if args.sync and not args.dry_run:
+        job = boto3.client("bedrock-agent").start_ingestion_job(
+            knowledgeBaseId=BEDROCK_KB_ID, dataSourceId=KB_DATA_SOURCE_ID
+        )
+        print(f"\nIngestion job started (status: {job['ingestionJob']['status']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Train the local out-of-domain prefilter and report on shadow-mode runs.
+
+Builds the Naive Bayes model used by ``core/prefilter.py`` from the eval
+dataset questions (label ``legal``), the built-in seed examples and an
+optional negatives file, prints a cross-validated report at the configured
+threshold and writes the model JSON shipped with the runtime.
+
+With ``--shadow-log``, summarizes ``prefilter_decision`` log lines collected
+while the runtime ran with ``PREFILTER_MODE=shadow``.
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/train_prefilter.py --dataset italian-legal-eval
+    python3.11 scripts/train_prefilter.py --negatives negatives.tsv --no-dataset
+    python3.11 scripts/train_prefilter.py --shadow-log runtime.log
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from core.config import PREFILTER_MODEL_PATH, PREFILTER_THRESHOLD
+from core.langfuse_client import get_langfuse_client
+from core.prefilter import LEGAL, SEED_EXAMPLES, predict, train
+
+
+def _load_dataset_questions(dataset_name: str) -> list:
+    langfuse = get_langfuse_client()
+    if not langfuse:
+        print("ERROR: Langfuse client not configured (use --no-dataset to train on seeds only).")
+        sys.exit(1)
+    dataset = langfuse.get_dataset(dataset_name)
+    questions = []
+    for item in dataset.items:
+        if getattr(item, "status", "ACTIVE") == "ARCHIVED":
+            continue
+        query = item.input.get("input", "") if isinstance(item.input, dict) else str(item.input)
+        if query:
+            questions.append(query)
+    return questions
+
+
+def _load_negatives(path: str) -> dict:
+    """Read ``label<TAB>text`` lines."""
+    examples = {}
+    with open(path) as f:
+        for line in f:
+            label, _, text = line.rstrip("\n").partition("\t")
+            if label and text:
+                examples.setdefault(label, []).append(text)
+    return examples
+
+
+def _cross_validate(examples: dict, folds: int = 5) -> None:
+    rows = [(label, text) for label, texts in examples.items() for text in texts]
+    random.Random(42).shuffle(rows)
+
+    stats = {label: {"tp": 0, "fp": 0, "fn": 0} for label in examples}
+    legal_short_circuited = 0
+    for k in range(folds):
+        train_rows = [r for i, r in enumerate(rows) if i % folds != k]
+        test_rows = [r for i, r in enumerate(rows) if i % folds == k]
+        fold_examples = {}
+        for label, text in train_rows:
+            fold_examples.setdefault(label, []).append(text)
+        model = train(fold_examples)
+        for label, text in test_rows:
+            predicted, confidence = predict(text, model)
+            if predicted != LEGAL and confidence < PREFILTER_THRESHOLD:
+                predicted = LEGAL
+            if label == LEGAL and predicted != LEGAL:
+                legal_short_circuited += 1
+            if predicted == label:
+                stats[label]["tp"] += 1
+            else:
+                stats[label]["fn"] += 1
+                stats.setdefault(predicted, {"tp": 0, "fp": 0, "fn": 0})["fp"] += 1
+
+    print(f"\n{folds}-fold cross-validation at threshold {PREFILTER_THRESHOLD}:")
+    print(f"{'label':<12} {'precision':>10} {'recall':>8}")
+    for label, s in stats.items():
+        precision = s["tp"] / (s["tp"] + s["fp"]) if s["tp"] + s["fp"] else 0.0
+        recall = s["tp"] / (s["tp"] + s["fn"]) if s["tp"] + s["fn"] else 0.0
+        print(f"{label:<12} {precision:>10.1%} {recall:>8.1%}")
+    n_legal = len(examples.get(LEGAL, []))
+    print(f"Legal questions wrongly short-circuited: {legal_short_circuited}/{n_legal}")
+
+
+def _shadow_report(path: str) -> None:
+    decisions = []
+    with open(path) as f:
+        for line in f:
+            start = line.find("{")
+            if start < 0:
+                continue
+            try:
+                record = json.loads(line[start:])
+            except ValueError:
+                continue
+            if record.get("event") == "prefilter_decision":
+                decisions.append(record)
+
+    if not decisions:
+        print("No prefilter_decision records found.")
+        return
+
+    print(f"Shadow decisions: {len(decisions)}")
+    by_label = {}
+    for record in decisions:
+        by_label.setdefault(record["label"], []).append(record)
+    print(f"{'label':<12} {'n':>6} {'would answer':>13} {'avg conf':>9}")
+    for label, records in sorted(by_label.items()):
+        answered = sum(1 for r in records if r["short_circuit"])
+        confidence = sum(r["confidence"] for r in records) / len(records)
+        print(f"{label:<12} {len(records):>6} {answered:>13} {confidence:>9.2f}")
+
+    elapsed = sorted(r["elapsed_us"] for r in decisions)
+    p50 = elapsed[len(elapsed) // 2]
+    p99 = elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.99))]
+    total_answered = sum(1 for r in decisions if r["short_circuit"])
+    print(f"\nWould skip the LLM for {total_answered / len(decisions):.1%} of prompts")
+    print(f"Classifier latency: p50 {p50:.0f}us, p99 {p99:.0f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local out-of-domain prefilter")
+    parser.add_argument("--dataset", default="italian-legal-eval")
+    parser.add_argument("--no-dataset", action="store_true",
+                        help="Train on seed examples and negatives only")
+    parser.add_argument("--negatives", default=None,
+                        help="TSV file of label<TAB>text extra examples")
+    parser.add_argument("--output", default=PREFILTER_MODEL_PATH)
+    parser.add_argument("--shadow-log", default=None,
+                        help="Summarize prefilter_decision log lines instead of training")
+    args = parser.parse_args()
+
+    if args.shadow_log:
+        _shadow_report(args.shadow_log)
+        return
+
+    examples = {label: list(texts) for label, texts in SEED_EXAMPLES.items()}
+    if not args.no_dataset:
+        questions = _load_dataset_questions(args.dataset)
+        examples[LEGAL].extend(questions)
+        print(f"Dataset: {args.dataset} ({len(questions)} legal questions)")
+    if args.negatives:
+        for label, texts in _load_negatives(args.negatives).items():
+            examples.setdefault(label, []).extend(texts)
+
+    for label, texts in examples.items():
+        print(f"  {label}: {len(texts)} examples")
+
+    _cross_validate(examples)
+
+    model = train(examples)
+    with open(args.output, "w") as f:
+        json.dump(model, f)
+    print(f"\nModel written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
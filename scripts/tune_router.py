@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Tune the cheap-model router threshold against the eval dataset.
+
+Scores every active item of a Langfuse dataset with the local router
+classifier and prints, for a range of thresholds, the share of questions that
+would be sent to the light model overall and per domain/tipologia.
+
+If runtime ``router_decision`` log lines are available (the runtime's log
+output, or one JSON object per line), ``--decisions`` adds the observed
+escalation rate, latency and tokens served by the light model per score
+bucket.
+
+Usage:
+    set -a && source .env && set +a
+    python3.11 scripts/tune_router.py --dataset italian-legal-eval
+    python3.11 scripts/tune_router.py --decisions router_decisions.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from core.langfuse_client import get_langfuse_client
+from core.router import complexity_score, query_features
+
+THRESHOLDS = [0.3, 0.4, 0.5, 0.6, 0.7]
+
+
+def _load_scores(dataset_name: str) -> list:
+    langfuse = get_langfuse_client()
+    if not langfuse:
+        print("ERROR: Langfuse client not configured.")
+        sys.exit(1)
+
+    dataset = langfuse.get_dataset(dataset_name)
+    rows = []
+    for item in dataset.items:
+        if getattr(item, "status", "ACTIVE") == "ARCHIVED":
+            continue
+        query = item.input.get("input", "") if isinstance(item.input, dict) else str(item.input)
+        metadata = getattr(item, "metadata", {}) or {}
+        score = complexity_score(query_features(query))
+        rows.append((score, metadata.get("domain", ""), metadata.get("tipologia", "")))
+    return rows
+
+
+def _print_thresholds(rows: list) -> None:
+    print(f"{'group':<40}" + "".join(f"{t:>8}" for t in THRESHOLDS))
+    groups = {"ALL": [s for s, _, _ in rows]}
+    for score, domain, tipologia in rows:
+        groups.setdefault(f"domain={domain}", []).append(score)
+        groups.setdefault(f"tipologia={tipologia}", []).append(score)
+    for name, scores in groups.items():
+        shares = [sum(1 for s in scores if s < t) / len(scores) for t in THRESHOLDS]
+        print(f"{name[:39]:<40}" + "".join(f"{share:>8.0%}" for share in shares))
+
+
+def _print_decisions(path: str) -> None:
+    buckets = {}
+    with open(path) as f:
+        for line in f:
+            # Runtime lines carry a logging prefix ("INFO:core.router:{...}")
+            start = line.find("{")
+            if start < 0:
+                continue
+            try:
+                record = json.loads(line[start:])
+            except ValueError:
+                continue
+            if record.get("event") != "router_decision" or record.get("route") != "light":
+                continue
+            bucket = round(record["score"], 1)
+            buckets.setdefault(bucket, []).append(record)
+
+    print(f"\n{'score':>6} {'n':>5} {'escalated':>10} {'light ms':>10} {'light tokens':>13}")
+    for bucket, records in sorted(buckets.items()):
+        escalated = sum(1 for r in records if r["escalated"]) / len(records)
+        latency = sum(r["light_latency_ms"] for r in records) / len(records)
+        served = sum(r["light_served_tokens"] for r in records)
+        print(f"{bucket:>6.1f} {len(records):>5} {escalated:>10.0%} {latency:>10.0f} {served:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the cheap-model router threshold")
+    parser.add_argument("--dataset", default="italian-legal-eval")
+    parser.add_argument("--decisions", default=None,
+                        help="File with runtime router_decision JSON log lines")
+    args = parser.parse_args()
+
+    rows = _load_scores(args.dataset)
+    if not rows:
+        print(f"ERROR: No active items in dataset '{args.dataset}'.")
+        sys.exit(1)
+    print(f"Dataset: {args.dataset} ({len(rows)} items)")
+    print("Share of questions routed to the light model per threshold:\n")
+    _print_thresholds(rows)
+
+    if args.decisions:
+        _print_decisions(args.decisions)
+
+
+if __name__ == "__main__":
+    main()
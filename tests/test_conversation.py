@@ -0,0 +1,30 @@
+"""Restoring conversation manager state stored with a session."""
+
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+
+from core.conversation import SUMMARY_TAG, RollingSummaryConversationManager
+
+
+def test_restores_its_own_state_with_the_summary():
+    saved = RollingSummaryConversationManager(window_turns=2)
+    saved.summary = "- comunione legale dal 2010"
+    saved.removed_message_count = 6
+
+    manager = RollingSummaryConversationManager(window_turns=2)
+    prepend = manager.restore_from_session(saved.get_state())
+
+    assert manager.removed_message_count == 6
+    assert manager.summary == saved.summary
+    assert prepend[0]["content"][0]["text"].startswith(f"<{SUMMARY_TAG}>")
+
+
+def test_restores_a_sliding_window_session_from_the_start():
+    saved = SlidingWindowConversationManager()
+    saved.removed_message_count = 4
+
+    manager = RollingSummaryConversationManager(window_turns=2)
+    prepend = manager.restore_from_session(saved.get_state())
+
+    assert prepend is None
+    assert manager.removed_message_count == 0
+    assert manager.summary is None
@@ -0,0 +1,148 @@
+"""Embedding caches with the offline ``EMBEDDING_BACKEND=local`` model."""
+
+import os
+import threading
+import time
+
+import pytest
+
+from core import embeddings, metrics
+
+
+@pytest.fixture(autouse=True)
+def local_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "local")
+    monkeypatch.setattr(embeddings, "EMBEDDING_BACKEND", "local")
+    monkeypatch.setattr(embeddings, "EMBEDDING_CACHE_PATH", str(tmp_path))
+    embeddings._memory.clear()
+    embeddings._disk.clear()
+    yield
+    embeddings._memory.clear()
+    embeddings._disk.clear()
+
+
+def _close(a, b) -> bool:
+    return max(abs(x - y) for x, y in zip(a, b)) < 1e-6
+
+
+def test_local_model_is_unit_length_and_deterministic():
+    vector = embeddings.embed_text("fondo patrimoniale e creditori", 64)
+    assert len(vector) == 64
+    assert sum(v * v for v in vector) == pytest.approx(1.0)
+    assert vector == embeddings._local_embedding("fondo patrimoniale e creditori", 64)
+    assert embeddings.model_id() == embeddings.LOCAL_MODEL_ID
+
+
+def test_memory_lru_evicts_the_least_recently_used(monkeypatch):
+    monkeypatch.setattr(embeddings, "MEMORY_CACHE_SIZE", 2)
+    monkeypatch.setattr(embeddings, "EMBEDDING_CACHE_PATH", "")  # memory only
+    for text in ("a", "b"):
+        embeddings.embed_text(text, 32)
+    embeddings.embed_text("a", 32)  # "a" is now the most recent
+    embeddings.embed_text("c", 32)
+
+    assert embeddings._key("b", 32) not in embeddings._memory
+    assert embeddings._key("a", 32) in embeddings._memory
+    computed = metrics.counter("embeddings.computed")
+    hits = metrics.counter("embeddings.memory_hits")
+    embeddings.embed_text("a", 32)
+    embeddings.embed_text("b", 32)
+    assert metrics.counter("embeddings.memory_hits") == hits + 1
+    assert metrics.counter("embeddings.computed") == computed + 1
+
+
+def test_vectors_come_back_from_disk_after_the_memory_cache_is_lost():
+    vector = embeddings.embed_text("caparra confirmatoria", 64)
+    embeddings._memory.clear()
+    embeddings._disk.clear()  # as in a new process
+    computed = metrics.counter("embeddings.computed")
+    disk_hits = metrics.counter("embeddings.disk_hits")
+
+    assert _close(embeddings.embed_text("caparra confirmatoria", 64), vector)
+    assert metrics.counter("embeddings.disk_hits") == disk_hits + 1
+    assert metrics.counter("embeddings.computed") == computed
+
+
+def test_concurrent_identical_requests_share_one_computation(monkeypatch):
+    calls = []
+    original = embeddings._compute
+
+    def slow(text, dimensions):
+        calls.append(text)
+        time.sleep(0.1)
+        return original(text, dimensions)
+
+    monkeypatch.setattr(embeddings, "_compute", slow)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(embeddings.embed_text("stesso testo", 32)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["stesso testo"]
+    assert len(results) == 5 and all(r == results[0] for r in results)
+
+
+def test_batch_keeps_input_order_with_duplicates_and_cached_items():
+    cached = embeddings.embed_text("q3", 32)
+    texts = ["q1", "q2", "q3", "q1", "q4"]
+
+    vectors = embeddings.embed_texts(texts, 32)
+
+    assert len(vectors) == len(texts)
+    assert vectors[2] == cached
+    assert vectors[0] == vectors[3]
+    for text, vector in zip(texts, vectors):
+        assert _close(vector, embeddings._local_embedding(text, 32))
+
+
+def test_torn_record_in_the_middle_does_not_misalign_later_records(tmp_path):
+    cache = embeddings._DiskCache(str(tmp_path), 8)
+    first, second = embeddings._local_embedding("primo", 8), embeddings._local_embedding("secondo", 8)
+    cache.put(b"k" * embeddings.KEY_BYTES, first)
+    with open(cache.path, "ab") as f:
+        f.write(cache._record(b"x" * embeddings.KEY_BYTES, first)[:20])  # write cut short by a crash
+    cache.put(b"z" * embeddings.KEY_BYTES, second)
+
+    reopened = embeddings._DiskCache(str(tmp_path), 8)
+    assert _close(reopened.get(b"k" * embeddings.KEY_BYTES), first)
+    assert _close(reopened.get(b"z" * embeddings.KEY_BYTES), second)
+    assert reopened.get(b"x" * embeddings.KEY_BYTES) is None
+
+
+def test_corrupted_record_is_skipped(tmp_path):
+    cache = embeddings._DiskCache(str(tmp_path), 8)
+    vector = embeddings._local_embedding("testo", 8)
+    cache.put(b"a" * embeddings.KEY_BYTES, vector)
+    cache.put(b"b" * embeddings.KEY_BYTES, vector)
+    with open(cache.path, "r+b") as f:
+        f.seek(len(embeddings.RECORD_MARKER) + embeddings.KEY_BYTES + 2)
+        f.write(b"\xff")  # flip a byte of the first vector
+
+    reopened = embeddings._DiskCache(str(tmp_path), 8)
+    assert reopened.get(b"a" * embeddings.KEY_BYTES) is None
+    assert _close(reopened.get(b"b" * embeddings.KEY_BYTES), vector)
+
+
+def test_disk_cache_starts_over_at_its_size_limit(tmp_path):
+    cache = embeddings._DiskCache(str(tmp_path), 8)
+    cache = embeddings._DiskCache(str(tmp_path), 8, max_bytes=3 * cache.record_size)
+    keys = [bytes([i]) * embeddings.KEY_BYTES for i in range(4)]
+    for key in keys:
+        cache.put(key, embeddings._local_embedding(key.hex(), 8))
+
+    assert os.path.getsize(cache.path) == cache.record_size
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[3]) is not None
+
+    # Another process that indexed the file notices when it is started over
+    other = embeddings._DiskCache(str(tmp_path), 8, max_bytes=3 * cache.record_size)
+    assert other.get(keys[3]) is not None
+    for key in keys[:3]:
+        cache.put(key, embeddings._local_embedding(key.hex(), 8))  # the last put starts over again
+    assert other.get(keys[3]) is None
+    assert _close(other.get(keys[2]), embeddings._local_embedding(keys[2].hex(), 8))
@@ -0,0 +1,164 @@
+"""FailoverModel ordering, failover, hedging and circuit breaking with stub models."""
+
+import asyncio
+import time
+
+import pytest
+from strands.models import Model
+from strands.types.exceptions import ModelThrottledException
+
+from core import failover, metrics
+from core.failover import FailoverModel, Target
+from core.limiter import AdaptiveLimiter
+
+
+class StubModel(Model):
+    """Streams ``events`` after ``delay`` seconds, or raises ``error`` before the first one."""
+
+    def __init__(self, events=("a", "b"), delay: float = 0.0, error: Exception = None):
+        self.events = list(events)
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def update_config(self, **model_config):
+        pass
+
+    def get_config(self):
+        return {}
+
+    def structured_output(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def stream(self, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        for event in self.events:
+            yield event
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    failover._health.clear()
+    yield
+    failover._health.clear()
+
+
+def _collect(model: FailoverModel) -> list:
+    async def run():
+        return [event async for event in model.stream([])]
+
+    return asyncio.run(run())
+
+
+def test_ranked_prefers_measured_then_unmeasured_then_unhealthy():
+    cold, slow, fast, broken = (Target(label, StubModel()) for label in ("cold", "slow", "fast", "broken"))
+    model = FailoverModel([cold, slow, fast, broken])
+    slow.health.observe(0.8)
+    fast.health.observe(0.2)
+    broken.health.observe(0.1)
+    broken.health.record_failure(ModelThrottledException("throttled"))
+
+    assert [t.label for t in model.ranked()] == ["fast", "slow", "cold", "broken"]
+
+
+def test_unmeasured_targets_keep_configured_order():
+    targets = [Target(label, StubModel()) for label in ("primary", "secondary", "tertiary")]
+
+    assert FailoverModel(targets).ranked() == targets
+
+
+def test_throttled_primary_fails_over_to_next_target():
+    primary = Target("primary", StubModel(error=ModelThrottledException("throttled")))
+    secondary = Target("secondary", StubModel(events=("x", "y")))
+    switches = metrics.counter("failover.switches")
+
+    assert _collect(FailoverModel([primary, secondary])) == ["x", "y"]
+    assert not primary.health.healthy
+    assert secondary.health.ttft_ewma is not None
+    assert metrics.counter("failover.switches") == switches + 1
+
+
+def test_throttle_failed_over_shrinks_the_model_limit():
+    limiter = AdaptiveLimiter("test_model", max_limit=8, initial=8, enabled=True)
+    primary = Target("primary", StubModel(error=ModelThrottledException("throttled")))
+    secondary = Target("secondary", StubModel(events=("x",)))
+
+    assert _collect(FailoverModel([primary, secondary], limiter=limiter)) == ["x"]
+    assert limiter.limit == 4
+
+
+def test_error_not_worth_failing_over_is_raised():
+    primary = Target("primary", StubModel(error=ValueError("bad request")))
+    secondary = Target("secondary", StubModel())
+
+    with pytest.raises(ValueError):
+        _collect(FailoverModel([primary, secondary]))
+    assert secondary.model.calls == 0
+
+
+def test_every_target_failing_raises_the_last_error():
+    targets = [Target(label, StubModel(error=ModelThrottledException(label))) for label in ("a", "b")]
+
+    with pytest.raises(ModelThrottledException, match="b"):
+        _collect(FailoverModel(targets))
+
+
+def test_slow_primary_is_hedged_and_the_hedge_wins():
+    primary = Target("primary", StubModel(events=("slow",), delay=0.5))
+    hedge = Target("hedge", StubModel(events=("fast",)))
+    hedges, wins = metrics.counter("failover.hedges"), metrics.counter("failover.hedge_wins")
+
+    started = time.monotonic()
+    assert _collect(FailoverModel([primary, hedge], hedge_delay=0.05)) == ["fast"]
+    assert time.monotonic() - started < 0.4
+    assert metrics.counter("failover.hedges") == hedges + 1
+    assert metrics.counter("failover.hedge_wins") == wins + 1
+    # The losing primary is charged at least the time it was given
+    assert primary.health.ttft_ewma >= 0.05
+
+
+def test_fast_primary_is_not_hedged():
+    primary = Target("primary", StubModel(events=("p",)))
+    hedge = Target("hedge", StubModel())
+
+    assert _collect(FailoverModel([primary, hedge], hedge_delay=0.2)) == ["p"]
+    assert hedge.model.calls == 0
+
+
+def test_circuit_breaker_cooldown_grows_and_resets():
+    target = Target("primary", StubModel())
+    health = target.health
+
+    health.record_failure(ModelThrottledException("throttled"))
+    first = health.unhealthy_until - time.monotonic()
+    health.record_failure(ModelThrottledException("throttled"))
+    second = health.unhealthy_until - time.monotonic()
+    assert not health.healthy
+    assert first == pytest.approx(failover.BASE_COOLDOWN_SECONDS, abs=0.1)
+    assert second == pytest.approx(2 * failover.BASE_COOLDOWN_SECONDS, abs=0.1)
+
+    for _ in range(10):
+        health.record_failure(ModelThrottledException("throttled"))
+    assert health.unhealthy_until - time.monotonic() <= failover.MAX_COOLDOWN_SECONDS
+
+    health.unhealthy_until = time.monotonic() - 1  # cooldown elapsed
+    assert health.healthy
+    health.record_success(0.1)
+    assert health.failures == 0
+
+
+def test_unhealthy_target_is_skipped_until_its_cooldown_ends():
+    primary = Target("primary", StubModel(events=("p",)))
+    secondary = Target("secondary", StubModel(events=("s",)))
+    model = FailoverModel([primary, secondary])
+    primary.health.record_failure(ModelThrottledException("throttled"))
+
+    assert _collect(model) == ["s"]
+    assert primary.model.calls == 0
+
+    primary.health.unhealthy_until = time.monotonic() - 1
+    primary.health.ttft_ewma, secondary.health.ttft_ewma = 0.1, 0.5
+    assert _collect(model) == ["p"]
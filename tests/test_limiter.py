@@ -0,0 +1,67 @@
+"""AdaptiveLimiter retries of throttled calls."""
+
+import contextvars
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from core.limiter import AdaptiveLimiter
+from core.request_context import start_request
+
+
+def _throttle() -> ClientError:
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "Retrieve")
+
+
+class Flaky:
+    def __init__(self, failures: int, error=None):
+        self.failures = failures
+        self.error = error or _throttle()
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+
+def _limiter() -> AdaptiveLimiter:
+    return AdaptiveLimiter("test_kb", max_limit=8, initial=8, enabled=True)
+
+
+def test_throttled_call_is_retried_and_shrinks_the_limit():
+    limiter, fn = _limiter(), Flaky(failures=2)
+
+    assert limiter.call(fn, attempts=3, base_delay=0.01) == "ok"
+    assert fn.calls == 3
+    assert limiter.limit < 8
+
+
+def test_throttle_is_raised_after_the_last_attempt():
+    limiter, fn = _limiter(), Flaky(failures=5)
+
+    with pytest.raises(ClientError):
+        limiter.call(fn, attempts=2, base_delay=0.01)
+    assert fn.calls == 2
+
+
+def test_other_errors_are_not_retried():
+    limiter, fn = _limiter(), Flaky(failures=1, error=ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        limiter.call(fn, attempts=3, base_delay=0.01)
+    assert fn.calls == 1
+
+
+def test_no_retry_past_the_request_deadline():
+    limiter, fn = _limiter(), Flaky(failures=1)
+
+    def call():
+        start_request("session", "actor", deadline=time.time() + 0.5)
+        limiter.call(fn, attempts=3, base_delay=1.0)
+
+    with pytest.raises(ClientError):
+        contextvars.copy_context().run(call)
+    assert fn.calls == 1
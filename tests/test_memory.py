@@ -0,0 +1,71 @@
+"""Long-term memory cache of LegalMemorySessionManager with a stub client."""
+
+import threading
+import time
+
+import pytest
+from bedrock_agentcore.memory.integrations.strands.config import AgentCoreMemoryConfig, RetrievalConfig
+
+from core import memory, metrics
+
+NAMESPACE = "support/customer/{actorId}/semantic/"
+
+
+class StubClient:
+    def __init__(self, release: threading.Event = None):
+        self.release = release
+        self.calls = 0
+
+    def retrieve_memories(self, **kwargs):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        return [{"content": {"text": "preferisce essere contattato via email"}, "relevanceScore": 0.9}]
+
+
+def _manager(client) -> memory.LegalMemorySessionManager:
+    manager = memory.LegalMemorySessionManager.__new__(memory.LegalMemorySessionManager)
+    manager.config = AgentCoreMemoryConfig(
+        memory_id="mem", session_id="s1", actor_id="actor",
+        retrieval_config={NAMESPACE: RetrievalConfig(top_k=3, relevance_score=0.2)},
+    )
+    manager.memory_client = client
+    return manager
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    memory._ltm_cache.clear()
+    yield
+    memory._ltm_cache.clear()
+
+
+def test_repeated_prompt_is_served_from_the_cache_until_invalidated():
+    client = StubClient()
+    manager = _manager(client)
+
+    assert manager.retrieve_long_term_context("Chi eredita?") == ["preferisce essere contattato via email"]
+    manager.retrieve_long_term_context("chi  eredita")
+    assert client.calls == 1
+
+    memory.invalidate_actor("mem", "actor")
+    manager.retrieve_long_term_context("Chi eredita?")
+    assert client.calls == 2
+
+
+def test_late_result_from_before_an_invalidation_is_not_cached():
+    release = threading.Event()
+    client = StubClient(release)
+    manager = _manager(client)
+
+    stale = metrics.counter("memory.ltm_cache_stale_stores")
+    assert manager.retrieve_long_term_context("Chi eredita?", timeout=0.05) == []
+    memory.invalidate_actor("mem", "actor")  # new events written while the fetch was running
+    release.set()
+    deadline = time.monotonic() + 5
+    while metrics.counter("memory.ltm_cache_stale_stores") == stale and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    client.release = None
+    manager.retrieve_long_term_context("Chi eredita?")
+    assert client.calls == 2
@@ -0,0 +1,122 @@
+"""WriteBehindBuffer with the offline LocalBackend."""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+from bedrock_agentcore.memory.integrations.strands.bedrock_converter import AgentCoreMemoryConverter
+from strands.types.session import SessionMessage
+
+from core import memory_writer
+from core.memory import events_to_messages
+from core.memory_writer import LocalBackend, MemoryEvent, WriteBehindBuffer
+
+STARTED = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _event(session_id: str, i: int, blob: bool = False) -> MemoryEvent:
+    return MemoryEvent(
+        memory_id="mem",
+        actor_id="actor",
+        session_id=session_id,
+        messages=[(f"messaggio {i}", "USER")],
+        timestamp=STARTED + timedelta(seconds=i),
+        blob=blob,
+    )
+
+
+class FlakyBackend(LocalBackend):
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def write(self, event: MemoryEvent) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("throttled")
+        super().write(event)
+
+
+def test_flush_session_writes_one_event_in_order_and_mirrors_to_jsonl(tmp_path):
+    path = tmp_path / "events.jsonl"
+    backend = LocalBackend(str(path))
+    buffer = WriteBehindBuffer(backend, flush_seconds=3600)
+    for i in range(3):
+        buffer.enqueue(_event("s1", i))
+    buffer.enqueue(_event("s2", 9))
+
+    assert buffer.pending() == 4
+    assert buffer.flush_session("mem", "actor", "s1")
+
+    written = backend.events[("mem", "actor", "s1")]
+    assert len(written) == 1
+    assert [m[0] for m in written[0]["messages"]] == ["messaggio 0", "messaggio 1", "messaggio 2"]
+    assert written[0]["eventTimestamp"] == STARTED.isoformat()
+    assert ("mem", "actor", "s2") not in backend.events
+    assert buffer.pending() == 1
+    assert [json.loads(line)["sessionId"] for line in path.read_text().splitlines()] == ["s1"]
+
+
+def test_blobs_and_the_payload_limit_split_the_batch(monkeypatch):
+    monkeypatch.setattr(memory_writer, "MAX_EVENT_MESSAGES", 2)
+    backend = LocalBackend()
+    buffer = WriteBehindBuffer(backend, flush_seconds=3600)
+    for i, blob in enumerate([False, False, False, True, False]):
+        buffer.enqueue(_event("s1", i, blob))
+
+    assert buffer.flush_session("mem", "actor", "s1")
+
+    written = backend.events[("mem", "actor", "s1")]
+    assert [[m[0][-1] for m in r["messages"]] for r in written] == [["0", "1"], ["2"], ["3"], ["4"]]
+    assert [r["blob"] for r in written] == [False, False, True, False]
+
+
+def test_batched_messages_read_back_oldest_first():
+    messages = [
+        SessionMessage({"role": role, "content": [{"text": f"{role} {i}"}]}, message_id=i)
+        for i, role in enumerate(["user", "assistant", "user", "assistant"])
+    ]
+
+    def stored(batch):
+        payloads = [AgentCoreMemoryConverter.message_to_payload(m)[0] for m in batch]
+        return {"payload": [{"conversational": {"content": {"text": text}, "role": role}} for text, role in payloads]}
+
+    # list_events returns the newest event first
+    events = [stored(messages[3:]), stored(messages[:3])]
+    assert [m.message["content"][0]["text"] for m in events_to_messages(events)] == [
+        "user 0", "assistant 1", "user 2", "assistant 3"
+    ]
+
+
+def test_flush_all_prunes_drained_sessions_and_notifies():
+    buffer = WriteBehindBuffer(LocalBackend(), flush_seconds=3600)
+    notified = []
+    buffer.on_written.append(notified.append)
+    for session_id in ("s1", "s2", "s3"):
+        buffer.enqueue(_event(session_id, 0))
+
+    assert buffer.flush_all()
+    assert buffer.pending() == 0
+    assert buffer._queues == {} and buffer._session_locks == {}
+    assert sorted(key[2] for key in notified) == ["s1", "s2", "s3"]
+
+    buffer.enqueue(_event("s1", 1))
+    assert buffer.flush_session("mem", "actor", "s1")
+    assert buffer._session_locks == {}
+
+
+def test_failed_write_is_retried_then_dropped():
+    backend = FlakyBackend(failures=1)
+    buffer = WriteBehindBuffer(backend, flush_seconds=3600, max_retries=1)
+    buffer.enqueue(_event("s1", 0))
+
+    assert not buffer.flush_session("mem", "actor", "s1")
+    assert buffer.pending() == 1
+    assert buffer.flush_session("mem", "actor", "s1")
+    assert len(backend.events[("mem", "actor", "s1")]) == 1
+
+    backend.failures = 2
+    buffer.enqueue(_event("s1", 1))
+    assert not buffer.flush_session("mem", "actor", "s1")
+    assert buffer.flush_session("mem", "actor", "s1")  # second failure exceeds max_retries: dropped
+    assert buffer.pending() == 0
+    assert len(backend.events[("mem", "actor", "s1")]) == 1
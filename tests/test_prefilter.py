@@ -0,0 +1,55 @@
+"""Prefilter labels with the seed model, and enforce mode without a trained model."""
+
+import importlib
+import json
+
+import pytest
+
+from core import config, prefilter
+from core.prefilter import LEGAL
+
+
+@pytest.fixture
+def load_prefilter(monkeypatch):
+    def load(mode: str, model_path: str):
+        monkeypatch.setattr(config, "PREFILTER_MODE", mode)
+        monkeypatch.setattr(config, "PREFILTER_MODEL_PATH", model_path)
+        return importlib.reload(prefilter)
+
+    yield load
+    monkeypatch.undo()
+    importlib.reload(prefilter)
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    [
+        "scrivi una lettera di disdetta",
+        "mi prepari una bozza di diffida al mio inquilino",
+        "come redigo una delega per firmare dal notaio",
+        "quanto costa un notaio per un rogito?",
+    ],
+)
+def test_drafting_and_notarial_requests_are_legal(load_prefilter, tmp_path, prompt):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps(prefilter.train(prefilter.SEED_EXAMPLES)))
+    module = load_prefilter("enforce", str(path))
+
+    decision = module.check(prompt)
+    assert decision.label == LEGAL and decision.answer is None
+
+
+def test_enforce_with_a_trained_model_blocks_off_topic(load_prefilter, tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps(prefilter.train(prefilter.SEED_EXAMPLES)))
+    module = load_prefilter("enforce", str(path))
+
+    assert module.check("dammi una ricetta per la carbonara").answer == module.TEMPLATES["off_topic"]
+
+
+def test_enforce_without_a_trained_model_runs_in_shadow(load_prefilter, tmp_path):
+    module = load_prefilter("enforce", str(tmp_path / "missing.json"))
+
+    decision = module.check("dammi una ricetta per la carbonara")
+    assert module._mode == "shadow"
+    assert decision.label == "off_topic" and decision.answer is None
@@ -0,0 +1,62 @@
+"""Duplicate handling of ``DocumentIndex.preprocess`` on plain text documents."""
+
+from core.preprocess import DocumentIndex
+
+CLAUSE = (
+    "Il venditore garantisce che l'immobile è libero da ipoteche, pignoramenti, "
+    "trascrizioni pregiudizievoli e vincoli di qualsiasi natura."
+)
+
+
+def _document(*paragraphs: str) -> bytes:
+    return "\n\n".join(paragraphs).encode("utf-8")
+
+
+def _upload(index: DocumentIndex, name: str, data: bytes, **kwargs):
+    result = index.preprocess(name, data, **kwargs)
+    if not result.skipped:
+        index.add(result.key, result.text)
+    return result
+
+
+def _long_text(seed: str) -> list:
+    return [f"Articolo {i}. {seed} disciplina il caso numero {i} con le relative condizioni e scadenze." for i in range(40)]
+
+
+def test_paragraph_shared_with_another_document_is_kept():
+    index = DocumentIndex()
+    _upload(index, "a.txt", _document("Compravendita tra le parti del primo atto di vendita.", CLAUSE))
+    b = _upload(index, "b.txt", _document("Preliminare di vendita tra parti del tutto diverse.", CLAUSE))
+
+    assert b.status == "new"
+    assert CLAUSE in b.text
+
+
+def test_paragraph_repeated_within_a_document_is_dropped():
+    result = DocumentIndex().preprocess("a.txt", _document(CLAUSE, "Altro paragrafo breve.", CLAUSE))
+
+    assert result.duplicate_paragraphs == 1
+    assert result.text.count(CLAUSE) == 1
+
+
+def test_exact_duplicate_under_another_name_is_skipped():
+    index = DocumentIndex()
+    data = _document(*_long_text("La norma"))
+    _upload(index, "a.txt", data)
+
+    result = index.preprocess("copia.txt", data, keep_near_duplicates=True)
+    assert result.status == "duplicate" and result.duplicate_of == "a.txt"
+
+
+def test_revised_version_is_skipped_unless_near_duplicates_are_kept():
+    index = DocumentIndex()
+    original = _long_text("La norma")
+    _upload(index, "contratto.txt", _document(*original))
+    revised = _document(*original[:-1], "Articolo 39. Clausola aggiunta nella revisione del contratto tra le parti.")
+
+    skipped = index.preprocess("contratto_v2.txt", revised)
+    assert skipped.status == "near_duplicate" and skipped.duplicate_of == "contratto.txt"
+
+    kept = index.preprocess("contratto_v2.txt", revised, keep_near_duplicates=True)
+    assert kept.status == "new" and "Clausola aggiunta" in kept.text
+    assert "similar to contratto.txt" in kept.summary()
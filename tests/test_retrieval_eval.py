@@ -0,0 +1,30 @@
+"""Article references parsed from dataset ``riferimenti`` and chunk text."""
+
+import pytest
+
+from core.retrieval_eval import article_refs, recall_at_k
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("art. 177 c.c.", {"177"}),
+        ("artt. 177, 178 c.c.", {"177", "178"}),
+        ("articoli 456 ed 457", {"456", "457"}),
+        ("articoli 456 e 457", {"456", "457"}),
+        ("artt. 177 e 179-bis c.c.", {"177", "179bis"}),
+        ("art. 2645 ter", {"2645ter"}),
+        ("artt. 565-567 c.c.", {"565", "566", "567"}),
+        ("artt. 565–567", {"565", "566", "567"}),
+        ("articolo 1 - 900", {"1", "900"}),  # too wide to be a range
+        ("l'articolazione del testo", set()),
+    ],
+)
+def test_article_refs(text, expected):
+    assert article_refs(text) == expected
+
+
+def test_range_counts_towards_recall():
+    chunks = ["Si applica l'art. 566 c.c.", "Nessun riferimento"]
+    assert recall_at_k({"565", "566"}, chunks, 2) == 0.5
+    assert recall_at_k(article_refs("artt. 565-566"), chunks, 1) == 0.5
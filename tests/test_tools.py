@@ -0,0 +1,23 @@
+"""Candidate counts of the knowledge base tool."""
+
+import pytest
+
+from core import tools
+
+
+@pytest.mark.parametrize(
+    "rerank, mmr, lambda_, expected",
+    [
+        (True, False, 1.0, 20),
+        (False, True, 0.5, 20),
+        (False, True, 1.0, 3),  # MMR keeps the relevance order: nothing to over-fetch for
+        (False, False, 0.5, 3),
+    ],
+)
+def test_fetch_size_over_fetches_only_when_results_can_be_reordered(monkeypatch, rerank, mmr, lambda_, expected):
+    monkeypatch.setattr(tools, "KB_RERANK_ENABLED", rerank)
+    monkeypatch.setattr(tools, "KB_MMR_ENABLED", mmr)
+    monkeypatch.setattr(tools, "KB_MMR_LAMBDA", lambda_)
+    monkeypatch.setattr(tools, "KB_RERANK_CANDIDATES", 20)
+
+    assert tools._fetch_size(3) == expected